@@ -0,0 +1,523 @@
+"""
+Asyncio orchestration core for the upscale pipeline (upload -> GPU process -> result download).
+
+Replaces the thread-per-worker loops in app/worker.py when ORCHESTRATOR_MODE=async:
+  - ssh/scp run as asyncio subprocesses, GPU API calls go through one shared httpx.AsyncClient
+  - stage hand-off uses asyncio.Queue, so idle stages sleep instead of polling Queue.get(timeout=0.5)
+  - concurrency is the number of stage coroutines (UPSCALE_UPLOAD_CONCURRENCY / UPSCALE_CONCURRENCY /
+    UPSCALE_RESULT_DOWNLOAD_CONCURRENCY), not the number of OS threads
+  - DB writes are short single-row commits executed via asyncio.to_thread on the shared engine
+
+Runs inside FastAPI's event loop (start_workers() schedules it on the running loop) or as its
+own service: python -m app.async_worker. The service does not share memory with the API, so
+it takes work from the DB: QUEUED rows at stage 'queued' are picked up at startup and every
+UPSCALE_DB_POLL_INTERVAL seconds (default 5).
+"""
+import os
+import time
+import shlex
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlmodel import Session, select
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+import requests
+
+if __name__ == "__main__":
+    # Standalone orchestrator uses its own DB pool profile (see app/db.py)
+    os.environ.setdefault("DB_PROCESS_ROLE", "orchestrator")
+
+from .db import engine
+from .models import UpscaleTask, UpscaleStatus
+from .progress import progress_aggregator
+from . import metrics
+from . import timeline
+from . import profiling
+from .upscale_vast import finalize_upload_cmd
+
+
+def _time_utc():
+    from .worker import time_utc
+    return time_utc()
+
+
+def _update_upscale_task(task_id: int, **fields) -> Optional[UpscaleTask]:
+    with Session(engine) as session:
+        ut = session.get(UpscaleTask, task_id)
+        if not ut:
+            return None
+        for k, v in fields.items():
+            setattr(ut, k, v)
+        if "updated_at" not in fields:
+            ut.updated_at = _time_utc()
+        session.add(ut)
+        session.commit()
+        session.refresh(ut)
+        return ut
+
+
+def _queued_task_ids() -> list:
+    with Session(engine) as session:
+        return list(session.exec(
+            select(UpscaleTask.id)
+            .where(UpscaleTask.status == UpscaleStatus.QUEUED, UpscaleTask.stage == "queued")
+            .order_by(UpscaleTask.id)
+        ).all())
+
+
+class AsyncOrchestrator:
+    def __init__(self, db_intake: bool = False):
+        from .worker import get_upload_concurrency, get_result_download_concurrency
+        from .upscale_config import get_upscale_concurrency
+        self.upload_q: "asyncio.Queue[int]" = asyncio.Queue()
+        self.process_q: "asyncio.Queue[int]" = asyncio.Queue()
+        self.download_q: "asyncio.Queue[int]" = asyncio.Queue()
+        self.upload_workers = get_upload_concurrency()
+        self.gpu_workers = max(1, get_upscale_concurrency())
+        self.download_workers = get_result_download_concurrency()
+        try:
+            self.poll_interval = float(os.getenv("UPSCALE_POLL_INTERVAL", "3"))
+        except Exception:
+            self.poll_interval = 3.0
+        self.db_intake = db_intake
+        try:
+            self.db_poll_interval = max(1.0, float(os.getenv("UPSCALE_DB_POLL_INTERVAL", "5")))
+        except Exception:
+            self.db_poll_interval = 5.0
+        # Ids waiting in upload_q, so DB polls and the thread bridge do not enqueue a task twice
+        self._pending: set = set()
+        self.active_gpu = 0
+        self.in_flight = 0
+        self._remote_paths: Dict[int, Tuple[str, str]] = {}
+        self._gpu_queued_at: Dict[int, float] = {}
+        self._http = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---- Intake ----
+
+    def submit(self, task_id: int) -> None:
+        """Thread-safe enqueue into the upload stage."""
+        if self.loop is None:
+            raise RuntimeError("Async orchestrator is not running")
+        self.loop.call_soon_threadsafe(self._accept, task_id)
+
+    def _accept(self, task_id: int) -> None:
+        if task_id in self._pending:
+            return
+        self._pending.add(task_id)
+        self.upload_q.put_nowait(task_id)
+
+    async def _db_intake_loop(self) -> None:
+        """Enqueue QUEUED rows written by other processes (API enqueue, retry, healthcheck resets)."""
+        while True:
+            try:
+                for task_id in await asyncio.to_thread(_queued_task_ids):
+                    self._accept(task_id)
+            except Exception as e:
+                logging.warning(f"[async-upscale] DB intake failed: {e}")
+            await asyncio.sleep(self.db_poll_interval)
+
+    def _bridge_thread_queue(self) -> None:
+        """Forward ids put on worker.upload_upscale_queue (watcher, retry, healthcheck) into the loop.
+        Blocks on get() without a timeout, so it costs no periodic wakeups."""
+        from .worker import upload_upscale_queue, stop_event
+        while not stop_event.is_set():
+            task_id = upload_upscale_queue.get()
+            try:
+                if task_id is not None:
+                    self.submit(task_id)
+            finally:
+                upload_upscale_queue.task_done()
+
+    def queue_sizes(self) -> Dict[str, int]:
+        return {
+            "upload": self.upload_q.qsize(),
+            "process": self.process_q.qsize(),
+            "download": self.download_q.qsize(),
+            "active_gpu": self.active_gpu,
+        }
+
+    def is_idle(self) -> bool:
+        return self.in_flight == 0 and self.upload_q.empty() and self.process_q.empty() and self.download_q.empty()
+
+    # ---- I/O helpers ----
+
+    async def _run(self, argv: list[str], timeout: float = 600.0, label: Optional[str] = None,
+                   inputs: Tuple[str, ...] = (), outputs: Tuple[str, ...] = ()) -> Tuple[int, str, str]:
+        # The event loop reaps the child, so only wall time and file sizes are profiled here
+        with profiling.timed(label or os.path.basename(argv[0]), argv, inputs=inputs, outputs=outputs) as rec:
+            proc = await asyncio.create_subprocess_exec(
+                *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                out, err = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                rec["returncode"] = -1
+                rec["error"] = f"timeout after {timeout:.0f}s"
+                return -1, "", f"timeout after {timeout:.0f}s"
+            rec["returncode"] = proc.returncode
+        return proc.returncode, out.decode(errors="replace"), err.decode(errors="replace")
+
+    async def _http_get_json(self, url: str, timeout: float = 10.0) -> Tuple[int, Dict]:
+        if httpx is None:
+            r = await asyncio.to_thread(requests.get, url, timeout=timeout)
+            return r.status_code, (r.json() if r.status_code == 200 else {})
+        r = await self._http.get(url, timeout=timeout)
+        return r.status_code, (r.json() if r.status_code == 200 else {})
+
+    async def _http_post_json(self, url: str, payload: Dict, timeout: float = 30.0) -> Tuple[int, Dict, str]:
+        if httpx is None:
+            r = await asyncio.to_thread(requests.post, url, json=payload, timeout=timeout)
+        else:
+            r = await self._http.post(url, json=payload, timeout=timeout)
+        try:
+            data = r.json()
+        except Exception:
+            data = {}
+        return r.status_code, data, r.text
+
+    async def _ensure(self, vast) -> Dict:
+        # Cached instance state answers immediately; only cold starts occupy a thread
+        return await asyncio.to_thread(vast.ensure_instance_running)
+
+    async def _wait_for_ssh(self, vast, inst: Dict, timeout: float = 180.0) -> bool:
+        start = time.time()
+        while time.time() - start < timeout:
+            rc, _, _ = await self._run(vast.ssh_argv(inst, "true"), timeout=30, label="ssh_probe")
+            if rc == 0:
+                return True
+            await asyncio.sleep(3)
+        return False
+
+    async def _local_stable(self, path: str, checks: int = 3, interval: float = 1.0, timeout: float = 30.0) -> bool:
+        start = time.time()
+        last = (-1, -1)
+        while checks > 0 and (time.time() - start) <= timeout:
+            try:
+                st = os.stat(path)
+                cur = (st.st_size, int(st.st_mtime))
+            except FileNotFoundError:
+                return False
+            if cur == last:
+                checks -= 1
+            else:
+                checks = 3
+                last = cur
+            await asyncio.sleep(interval)
+        return checks == 0
+
+    async def _upload(self, vast, inst: Dict, local_path: str) -> Tuple[str, str]:
+        """Async counterpart of VastManager.upload_and_plan_paths (temp upload, size + ffprobe check, atomic mv)."""
+        filename = os.path.basename(os.path.normpath(local_path))
+        if not filename:
+            raise RuntimeError(f"Invalid local_path: {local_path}")
+        if vast.is_local:
+            if not await self._local_stable(local_path):
+                raise RuntimeError(f"Local file appears to be still writing: {local_path}")
+            return await asyncio.to_thread(vast.upload_and_plan_paths, inst, local_path)
+        if not await self._wait_for_ssh(vast, inst):
+            raise RuntimeError("SSH not ready on instance")
+        vast._last_activity_ts = time.time()
+        inbox = outbox = None
+        for cand_in, cand_out in vast.remote_upscale_dirs(inst):
+            rc, out, err = await self._run(vast.ssh_argv(inst, f"mkdir -p {cand_in} {cand_out}"), timeout=60, label="ssh_mkdir")
+            if rc == 0:
+                inbox, outbox = cand_in, cand_out
+                break
+            logging.warning(f"[async-upscale] mkdir failed on remote: {err or out}")
+        if not inbox:
+            raise RuntimeError("Failed to create remote inbox/outbox directories")
+        remote_in = f"{inbox}/{filename}"
+        remote_tmp = f"{inbox}/.{filename}.part"
+        remote_out = f"{outbox}/{filename}"
+        if not await self._local_stable(local_path):
+            raise RuntimeError(f"Local file appears to be still writing: {local_path}")
+
+        async def _cleanup():
+            await self._run(vast.ssh_argv(inst, f"rm -f {shlex.quote(remote_tmp)}"), timeout=60, label="ssh_cleanup")
+
+        rc, out, err = await self._run(vast.scp_upload_argv(inst, local_path, remote_tmp), label="scp_upload", inputs=(local_path,))
+        vast._last_activity_ts = time.time()
+        if rc != 0:
+            raise RuntimeError(f"scp upload failed: {err or out}")
+        rc, out, err = await self._run(
+            vast.ssh_argv(inst, f"test -f {shlex.quote(remote_tmp)} && wc -c < {shlex.quote(remote_tmp)}"), timeout=60, label="ssh_stat"
+        )
+        try:
+            remote_size = int(out.strip()) if rc == 0 else -1
+        except Exception:
+            remote_size = -1
+        local_size = os.path.getsize(local_path)
+        if remote_size != local_size:
+            await _cleanup()
+            raise RuntimeError(f"Remote file size mismatch: local={local_size} bytes, remote={remote_size} bytes")
+        rc, out, err = await self._run(vast.ssh_argv(
+            inst,
+            f"ffprobe -v error -hide_banner -select_streams v:0 -show_entries stream=codec_name -of csv=p=0 {shlex.quote(remote_tmp)}",
+        ), timeout=120, label="ssh_ffprobe")
+        if rc != 0:
+            await _cleanup()
+            raise RuntimeError(f"ffprobe failed on uploaded file: {err or out}")
+        rc, out, err = await self._run(
+            vast.ssh_argv(inst, finalize_upload_cmd(remote_tmp, remote_in, local_size)), timeout=60, label="ssh_mv"
+        )
+        if rc != 0:
+            await _cleanup()
+            raise RuntimeError(f"Failed to move uploaded file into inbox: {err or out}")
+        return remote_in, remote_out
+
+    async def _fail(self, task_id: int, e: Exception) -> None:
+        from .worker import get_vast
+        logging.error(f"[async-upscale] task {task_id} failed: {type(e).__name__}: {e}")
+        try:
+            get_vast().invalidate_instance_state()
+        except Exception:
+            pass
+        self._remote_paths.pop(task_id, None)
+        await asyncio.to_thread(progress_aggregator.discard, UpscaleTask, task_id)
+        await asyncio.to_thread(
+            _update_upscale_task, task_id,
+            status=UpscaleStatus.ERROR, stage="error", error=str(e),
+        )
+
+    # ---- Stages ----
+
+    async def _upload_stage(self) -> None:
+        from .worker import get_vast
+        while True:
+            task_id = await self.upload_q.get()
+            profiling.bind_task("upscale", task_id)
+            self.in_flight += 1
+            handed_off = requeue = False
+            try:
+                vast = get_vast()
+                ut = await asyncio.to_thread(_update_upscale_task, task_id, stage="ensuring_instance", progress=5)
+                if not ut:
+                    continue
+                with metrics.stage_timer("ensure_instance", pipeline="upscale"):
+                    inst = await self._ensure(vast)
+                await asyncio.to_thread(_update_upscale_task, task_id, vast_instance_id=str(inst.get("id")), stage="uploading", progress=20)
+                with metrics.stage_timer("upload", pipeline="upscale"):
+                    remote_in, remote_out = await self._upload(vast, inst, ut.file_path)
+                metrics.add_bytes("upload", metrics.file_size(ut.file_path), pipeline="upscale")
+                await asyncio.to_thread(timeline.record_bytes, "upscale", task_id, "uploading", metrics.file_size(ut.file_path))
+                self._remote_paths[task_id] = (remote_in, remote_out)
+                self._gpu_queued_at[task_id] = time.time()
+                await asyncio.to_thread(
+                    _update_upscale_task, task_id,
+                    stage="queued_gpu", progress=35, status=UpscaleStatus.QUEUED,
+                )
+                self.process_q.put_nowait(task_id)
+                handed_off = True
+            except Exception as e:
+                if "still writing" in str(e):
+                    await asyncio.to_thread(
+                        _update_upscale_task, task_id,
+                        stage="queued", status=UpscaleStatus.QUEUED, progress=5, error=None,
+                    )
+                    await asyncio.sleep(1.0)
+                    requeue = True
+                else:
+                    await self._fail(task_id, e)
+            finally:
+                # Out of upload_q: the row has left stage 'queued', is gone, or is re-accepted below
+                self._pending.discard(task_id)
+                if requeue:
+                    self._accept(task_id)
+                if not handed_off:
+                    self.in_flight -= 1
+                self.upload_q.task_done()
+
+    async def _process_stage(self) -> None:
+        from .worker import get_vast
+        while True:
+            task_id = await self.process_q.get()
+            profiling.bind_task("upscale", task_id)
+            self.active_gpu += 1
+            queued_at = self._gpu_queued_at.pop(task_id, None)
+            if queued_at is not None:
+                metrics.observe_stage("queue_wait", time.time() - queued_at, pipeline="upscale")
+            try:
+                vast = get_vast()
+                remote = self._remote_paths.get(task_id)
+                if not remote:
+                    raise RuntimeError("Remote paths not found for task")
+                inst = await self._ensure(vast)
+                await asyncio.to_thread(
+                    _update_upscale_task, task_id,
+                    stage="processing", status=UpscaleStatus.PROCESSING, progress=40,
+                )
+                base = vast.http_base(inst)
+                if not base:
+                    raise RuntimeError("Instance public IP not found")
+                gpu_t0 = time.time()
+                code, data, text = await self._http_post_json(f"{base}/upscale", vast.job_payload(*remote))
+                if code not in (200, 202):
+                    raise RuntimeError(f"Failed to submit job: {text}")
+                job_id = str(data.get("job_id"))
+                await asyncio.to_thread(_update_upscale_task, task_id, vast_job_id=job_id)
+                progress = 40
+                while True:
+                    code, info = await self._http_get_json(f"{base}/job/{job_id}")
+                    status = info.get("status", "failed") if code == 200 else "failed"
+                    if status in ("validating", "processing"):
+                        progress = min(progress + 2, 85)
+                        progress_aggregator.update(UpscaleTask, task_id, progress=progress, updated_at=_time_utc())
+                        await asyncio.sleep(self.poll_interval)
+                    elif status == "completed":
+                        break
+                    else:
+                        raise RuntimeError(f"Upscale job failed: status={status}")
+                metrics.observe_stage("upscale", time.time() - gpu_t0, pipeline="upscale")
+                await asyncio.to_thread(progress_aggregator.discard, UpscaleTask, task_id)
+                await asyncio.to_thread(_update_upscale_task, task_id, stage="queued_result_download", progress=90)
+                self.download_q.put_nowait(task_id)
+            except Exception as e:
+                self.in_flight -= 1
+                await self._fail(task_id, e)
+            finally:
+                self.active_gpu = max(0, self.active_gpu - 1)
+                self.process_q.task_done()
+
+    async def _download_stage(self) -> None:
+        from .worker import get_vast, CLIPS_UPSCALED_DIR
+        while True:
+            task_id = await self.download_q.get()
+            profiling.bind_task("upscale", task_id)
+            try:
+                vast = get_vast()
+                await asyncio.to_thread(_update_upscale_task, task_id, stage="downloading", progress=90)
+                remote = self._remote_paths.get(task_id)
+                if not remote:
+                    raise RuntimeError("Remote paths not found for task (download)")
+                _, remote_out = remote
+                inst = await self._ensure(vast)
+                os.makedirs(CLIPS_UPSCALED_DIR, exist_ok=True)
+                local_path = os.path.join(CLIPS_UPSCALED_DIR, os.path.basename(remote_out))
+                with metrics.stage_timer("result_download", pipeline="upscale"):
+                    if vast.is_local:
+                        rc, out, err = 0, "", ""
+                        await asyncio.to_thread(vast.download_result, inst, remote_out, CLIPS_UPSCALED_DIR)
+                    else:
+                        rc, out, err = await self._run(vast.scp_download_argv(inst, remote_out, local_path), label="scp_download", outputs=(local_path,))
+                vast._last_activity_ts = time.time()
+                if rc != 0:
+                    raise RuntimeError(f"scp download failed: {err or out}")
+                metrics.add_bytes("download", metrics.file_size(local_path), pipeline="upscale")
+                await asyncio.to_thread(timeline.record_bytes, "upscale", task_id, "downloading", metrics.file_size(local_path))
+                await asyncio.to_thread(
+                    _update_upscale_task, task_id,
+                    result_path=os.path.abspath(local_path), stage="done", status=UpscaleStatus.DONE, progress=100,
+                )
+                self._remote_paths.pop(task_id, None)
+            except Exception as e:
+                await self._fail(task_id, e)
+            finally:
+                self.in_flight -= 1
+                self.download_q.task_done()
+
+    async def _idle_stop_loop(self) -> None:
+        from .worker import _stop_instance_if_fully_idle
+        while True:
+            await asyncio.sleep(30)
+            if self.is_idle():
+                await asyncio.to_thread(_stop_instance_if_fully_idle)
+
+    # ---- Lifecycle ----
+
+    async def run(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        if httpx is not None:
+            self._http = httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=20, max_connections=100))
+        threading.Thread(target=self._bridge_thread_queue, name="async_upscale_bridge", daemon=True).start()
+        stages = (
+            [self._upload_stage() for _ in range(self.upload_workers)]
+            + [self._process_stage() for _ in range(self.gpu_workers)]
+            + [self._download_stage() for _ in range(self.download_workers)]
+            + [self._idle_stop_loop()]
+            + ([self._db_intake_loop()] if self.db_intake else [])
+        )
+        logging.info(
+            f"[async-upscale] Orchestrator started: upload={self.upload_workers} gpu={self.gpu_workers} "
+            f"download={self.download_workers} http={'httpx' if httpx is not None else 'requests'}"
+            f"{' db_intake' if self.db_intake else ''}"
+        )
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            if self._http is not None:
+                await self._http.aclose()
+
+
+_core: Optional[AsyncOrchestrator] = None
+
+
+def get_async_core() -> Optional[AsyncOrchestrator]:
+    return _core
+
+
+def start_async_orchestrator() -> AsyncOrchestrator:
+    """Schedule the core on the running event loop (FastAPI) or on a dedicated loop thread."""
+    global _core
+    if _core is not None:
+        return _core
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        _core = AsyncOrchestrator()
+        loop.create_task(_core.run())
+    else:
+        ready = threading.Event()
+
+        def _serve():
+            global _core
+
+            async def _main():
+                global _core
+                _core = AsyncOrchestrator()
+                ready.set()
+                await _core.run()
+
+            asyncio.run(_main())
+
+        threading.Thread(target=_serve, name="async_orchestrator", daemon=True).start()
+        ready.wait(timeout=10)
+    return _core
+
+
+def main() -> None:
+    """Standalone service: watcher + healthcheck threads and the async upscale core."""
+    from threading import Thread
+    from .db import init_db
+    from .worker import upscale_watcher, queue_healthcheck_worker, warm_standby_worker, TO_UPSCALE_DIR, CLIPS_UPSCALED_DIR
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(TO_UPSCALE_DIR, exist_ok=True)
+    os.makedirs(CLIPS_UPSCALED_DIR, exist_ok=True)
+    init_db()
+    Thread(target=upscale_watcher, name="upscale_watcher", daemon=True).start()
+    Thread(target=queue_healthcheck_worker, name="queue_healthcheck_worker", daemon=True).start()
+    Thread(target=warm_standby_worker, name="warm_standby_worker", daemon=True).start()
+
+    async def _main():
+        global _core
+        _core = AsyncOrchestrator(db_intake=True)
+        await _core.run()
+
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    # Run the app.async_worker copy of this module: app.worker looks the core up there
+    # (get_async_core), and under -m this file is a separate __main__ module with its own _core
+    from app import async_worker
+    async_worker.main()
@@ -1,15 +1,16 @@
 import os
 import json
 import ssl
-import subprocess
 import whisper
 import torch
 from openai import OpenAI
 from datetime import datetime
 from typing import Any, Dict, List, Tuple, Optional
-from sqlmodel import Session
+from sqlmodel import Session, select
 from .db import engine
 from .models import Clip, ClipFragment
+from . import profiling
+from . import encoders
 
 
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -32,7 +33,8 @@ class AutoPipeline:
 
     def transcribe_video(self, video_path: str, transcript_path: str) -> List[Dict[str, Any]]:
         """Transcribe video using Whisper and save to JSON"""
-        result = self.model.transcribe(video_path, language="en", fp16=False)
+        with profiling.python_stage("whisper_transcribe", inputs=[video_path]):
+            result = self.model.transcribe(video_path, language="en", fp16=False)
         segments = result["segments"]
         transcript = [
             {"start": s["start"], "end": s["end"], "text": s["text"]}
@@ -212,16 +214,14 @@ Here is the transcript:
                     start_ts = fragment["start"]
                     end_ts = fragment["end"]
                     
-                    cmd = [
+                    result = encoders.encode(lambda v: [
                         "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
                         "-i", video_path,
                         "-ss", start_ts, "-to", end_ts,
-                        "-c:v", "libx264", "-c:a", "aac",
-                        "-crf", "18", "-preset", "medium", "-b:a", "192k",
+                        *v, "-c:a", "aac", "-b:a", "192k",
                         "-avoid_negative_ts", "make_zero", "-fflags", "+genpts",
                         out_file
-                    ]
-                    result = subprocess.run(cmd, capture_output=True, text=True)
+                    ], crf=18, label="ffmpeg_cut", capture_output=True, text=True)
                     if result.returncode == 0:
                         created_clips.append(out_file)
                 else:
@@ -231,16 +231,14 @@ Here is the transcript:
                         temp_file = os.path.join(output_dir, f"temp_clip_{i}_{j}.mp4")
                         temp_files.append(temp_file)
                         
-                        cmd = [
+                        encoders.encode(lambda v: [
                             "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
                             "-i", video_path,
                             "-ss", fragment["start"], "-to", fragment["end"],
-                            "-c:v", "libx264", "-c:a", "aac",
-                            "-crf", "18", "-preset", "medium", "-b:a", "192k",
+                            *v, "-c:a", "aac", "-b:a", "192k",
                             "-avoid_negative_ts", "make_zero", "-fflags", "+genpts",
                             temp_file
-                        ]
-                        subprocess.run(cmd, capture_output=True)
+                        ], crf=18, label="ffmpeg_cut_fragment", capture_output=True)
                     
                     # Concatenate valid temp files
                     valid_temps = [f for f in temp_files if os.path.exists(f)]
@@ -254,16 +252,14 @@ Here is the transcript:
                         
                         filter_complex = f"{''.join(concat_inputs)}concat=n={len(valid_temps)}:v=1:a=1[outv][outa]"
                         
-                        cmd = [
+                        result = encoders.encode(lambda v: [
                             "ffmpeg", "-y"
                         ] + input_args + [
                             "-filter_complex", filter_complex,
                             "-map", "[outv]", "-map", "[outa]",
-                            "-c:v", "libx264", "-c:a", "aac",
-                            "-crf", "18", "-preset", "medium", "-b:a", "192k",
+                            *v, "-c:a", "aac", "-b:a", "192k",
                             out_file
-                        ]
-                        result = subprocess.run(cmd, capture_output=True)
+                        ], crf=18, label="ffmpeg_concat", capture_output=True)
                         if result.returncode == 0:
                             created_clips.append(out_file)
                         if on_progress:
@@ -295,58 +291,67 @@ Here is the transcript:
 
     def save_clips_to_db(self, task_id: int, clips: List[Dict[str, Any]], clip_files: List[str]) -> None:
         """Save clip data with titles/descriptions to database"""
+        # Map clip files by their short_id for easy lookup
+        clip_file_map = {}
+        for file_path in clip_files:
+            # Extract clip number from filename (e.g., "clip_1_Some_Title.mp4" -> 1)
+            filename = os.path.basename(file_path)
+            if filename.startswith("clip_"):
+                try:
+                    clip_num = int(filename.split("_")[1])
+                    clip_file_map[clip_num] = file_path
+                except (IndexError, ValueError):
+                    continue
+        for clip_data in clips:
+            self.save_clip_to_db(task_id, clip_data, clip_file_map.get(clip_data.get("short_id", 0)))
+
+    def save_clip_to_db(self, task_id: int, clip_data: Dict[str, Any], file_path: Optional[str], unique: bool = False) -> int:
+        """Insert one clip with its fragments; returns its id.
+        unique=True: if the task already has this short_id, only refresh its file_path (safe to repeat)."""
+        short_id = clip_data.get("short_id", 0)
         with Session(engine) as session:
-            # Map clip files by their short_id for easy lookup
-            clip_file_map = {}
-            for file_path in clip_files:
-                # Extract clip number from filename (e.g., "clip_1_Some_Title.mp4" -> 1)
-                filename = os.path.basename(file_path)
-                if filename.startswith("clip_"):
-                    try:
-                        clip_num = int(filename.split("_")[1])
-                        clip_file_map[clip_num] = file_path
-                    except (IndexError, ValueError):
-                        continue
-            
-            # Save each clip with its fragments
-            for clip_data in clips:
-                short_id = clip_data.get("short_id", 0)
-                title = clip_data.get("title", f"Clip {short_id}")
-                description = clip_data.get("description", "")
-                duration_estimate = clip_data.get("duration_estimate", None)
-                hook_strength = clip_data.get("hook_strength", None)
-                why_it_works = clip_data.get("why_it_works", None)
-                file_path = clip_file_map.get(short_id)
-                
-                # Create clip record
-                clip = Clip(
-                    task_id=task_id,
-                    short_id=short_id,
-                    title=title,
-                    description=description,
-                    duration_estimate=duration_estimate,
-                    hook_strength=hook_strength,
-                    why_it_works=why_it_works,
-                    file_path=file_path
+            existing = None
+            if unique:
+                existing = session.exec(
+                    select(Clip).where(Clip.task_id == task_id, Clip.short_id == short_id)
+                ).first()
+            if existing:
+                if file_path and existing.file_path != file_path:
+                    existing.file_path = file_path
+                    session.add(existing)
+                    session.commit()
+                return existing.id
+
+            # Create clip record
+            clip = Clip(
+                task_id=task_id,
+                short_id=short_id,
+                title=clip_data.get("title", f"Clip {short_id}"),
+                description=clip_data.get("description", ""),
+                duration_estimate=clip_data.get("duration_estimate", None),
+                hook_strength=clip_data.get("hook_strength", None),
+                why_it_works=clip_data.get("why_it_works", None),
+                file_path=file_path
+            )
+            session.add(clip)
+            session.commit()
+            session.refresh(clip)
+
+            # Save fragments
+            fragments = clip_data.get("fragments", [])
+            for order, fragment_data in enumerate(fragments):
+                fragment = ClipFragment(
+                    clip_id=clip.id,
+                    start_time=fragment_data.get("start", ""),
+                    end_time=fragment_data.get("end", ""),
+                    text=fragment_data.get("text", ""),
+                    visual_suggestion=fragment_data.get("visual_suggestion"),
+                    order=order
                 )
-                session.add(clip)
-                session.commit()
-                session.refresh(clip)
-                
-                # Save fragments
-                fragments = clip_data.get("fragments", [])
-                for order, fragment_data in enumerate(fragments):
-                    fragment = ClipFragment(
-                        clip_id=clip.id,
-                        start_time=fragment_data.get("start", ""),
-                        end_time=fragment_data.get("end", ""),
-                        text=fragment_data.get("text", ""),
-                        visual_suggestion=fragment_data.get("visual_suggestion"),
-                        order=order
-                    )
-                    session.add(fragment)
-                
-                session.commit()
+                session.add(fragment)
+
+            session.commit()
+            return clip.id
 
     def process_auto_task(
         self, 
@@ -1,15 +1,141 @@
 from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+from typing import Dict, Generator
 import os
+import time
 import logging
+import threading
+
+# Process role selects the pool profile: api (uvicorn + in-process workers) | orchestrator (python -m app.async_worker)
+DB_PROCESS_ROLE = (os.getenv("DB_PROCESS_ROLE") or "api").strip().lower()
+
+# Defaults per role; every value can be overridden with DB_<NAME> or DB_<NAME>_<ROLE>
+_POOL_DEFAULTS = {
+    "api": {"POOL_SIZE": 10, "MAX_OVERFLOW": 20, "POOL_TIMEOUT": 30, "POOL_RECYCLE": 300},
+    "orchestrator": {"POOL_SIZE": 5, "MAX_OVERFLOW": 5, "POOL_TIMEOUT": 30, "POOL_RECYCLE": 300},
+}
+
+
+def _pool_setting(name: str) -> int:
+    defaults = _POOL_DEFAULTS.get(DB_PROCESS_ROLE, _POOL_DEFAULTS["api"])
+    raw = os.getenv(f"DB_{name}_{DB_PROCESS_ROLE.upper()}") or os.getenv(f"DB_{name}")
+    try:
+        return int(raw) if raw not in (None, "") else defaults[name]
+    except ValueError:
+        return defaults[name]
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in ("1", "true", "yes")
+
+
+class _PoolStats:
+    """Checkout wait times and connection counts for /api/db/pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checked_out = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent = []  # last waits, for percentiles
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._recent.append(seconds)
+            if len(self._recent) > 1000:
+                del self._recent[:500]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            pct = lambda q: round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 2) if recent else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "checked_out": self.checked_out,
+                "connects": self.connects,
+                "checkout_timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_total / self.waits * 1000, 2) if self.waits else 0.0,
+                "wait_ms_p50": pct(0.5),
+                "wait_ms_p95": pct(0.95),
+                "wait_ms_max": round(self.wait_max * 1000, 2),
+            }
+
+
+pool_stats = _PoolStats()
+
+
+_checkout_local = threading.local()
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a free connection.
+    Time spent opening a new connection inside the checkout is not waiting and is left out;
+    only the pool's own TimeoutError counts as a checkout timeout.
+    """
+
+    def _create_connection(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            _checkout_local.connect_seconds = getattr(_checkout_local, "connect_seconds", 0.0) + time.perf_counter() - t0
+
+    def _do_get(self):
+        _checkout_local.connect_seconds = 0.0
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.observe_wait(time.perf_counter() - t0, timed_out=True)
+            raise
+        pool_stats.observe_wait(max(0.0, time.perf_counter() - t0 - _checkout_local.connect_seconds))
+        return conn
+
+
+def _build_postgres_engine(url: str):
+    if _env_flag("DB_PGBOUNCER", False):
+        # PgBouncer (transaction pooling) owns the pool: open/close per checkout. Server-side
+        # prepared statements break when transactions land on different backends: psycopg 3
+        # prepares repeated queries automatically, so turn that off (psycopg2 never prepares)
+        connect_args = {"prepare_threshold": None} if make_url(url).get_driver_name() == "psycopg" else {}
+        return create_engine(url, echo=False, poolclass=NullPool, connect_args=connect_args)
+    return create_engine(
+        url,
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=_pool_setting("POOL_SIZE"),
+        max_overflow=_pool_setting("MAX_OVERFLOW"),
+        pool_timeout=_pool_setting("POOL_TIMEOUT"),
+        # Neon/managed Postgres drop idle connections; recycle and ping before use
+        pool_recycle=_pool_setting("POOL_RECYCLE"),
+        pool_pre_ping=_env_flag("DB_POOL_PRE_PING", True),
+    )
+
 
 # Use PostgreSQL URL from environment or fallback to SQLite for development
 POSTGRES_URL = os.getenv("POSTGRES_URL")
 if POSTGRES_URL:
-    engine = create_engine(POSTGRES_URL, echo=False)
+    engine = _build_postgres_engine(POSTGRES_URL)
 else:
     # Fallback to SQLite for development
-    DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app.db")
+    DB_PATH = os.getenv("SQLITE_PATH") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "app.db")
     engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
 
 
@@ -27,6 +153,41 @@ def _mask_dsn(dsn: str) -> str:
     return dsn
 
 
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_conn, conn_record):
+    with pool_stats._lock:
+        pool_stats.connects += 1
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+    with pool_stats._lock:
+        pool_stats.checkouts += 1
+        pool_stats.checked_out += 1
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_conn, conn_record):
+    with pool_stats._lock:
+        pool_stats.checked_out = max(0, pool_stats.checked_out - 1)
+
+
+def pool_metrics() -> Dict:
+    """Pool configuration, current usage and checkout wait statistics."""
+    pool = engine.pool
+    data = {"role": DB_PROCESS_ROLE, "pool_class": type(pool).__name__, **pool_stats.snapshot()}
+    if isinstance(pool, QueuePool):
+        data.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "timeout": pool.timeout(),
+        })
+    return data
+
+
 def init_db():
     try:
         masked = _mask_dsn(POSTGRES_URL) if POSTGRES_URL else f"sqlite:///{DB_PATH}"
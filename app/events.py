@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session as OrmSession
+
+from .models import Task, UpscaleTask, Clip
+from .schemas import TaskOut, UpscaleTaskOut
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class EventBus:
+    """
+    In-process pub/sub for task/upscale/clip deltas.
+
+    Events get monotonically increasing ids and are kept in a ring buffer of
+    EVENTS_BUFFER entries (default 2000) so a reconnecting client can resume from
+    its Last-Event-ID. Ids start at the boot time in milliseconds, so an id from
+    before a restart is older than anything buffered (or, with a skewed clock,
+    newer than the last id) and gets a reset instead of a silent gap. Publishing
+    is thread-safe; subscribers are asyncio queues fed via call_soon_threadsafe
+    on their own loop.
+    """
+
+    def __init__(self):
+        self.buffer_size = max(100, _env_int("EVENTS_BUFFER", 2000))
+        self.queue_size = max(100, _env_int("EVENTS_SUBSCRIBER_QUEUE", 1000))
+        self._buffer: Deque[Dict] = deque(maxlen=self.buffer_size)
+        self._last_id = int(time.time() * 1000)
+        self._lock = threading.Lock()
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, kind: str, op: str, data: Dict) -> Dict:
+        with self._lock:
+            self._last_id += 1
+            ev = {"id": self._last_id, "type": kind, "op": op, "data": data}
+            self._buffer.append(ev)
+            subscribers = list(self._subscribers)
+        for loop, q in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, q, ev)
+            except RuntimeError:
+                # Loop already closed; the subscriber is going away
+                pass
+        return ev
+
+    @staticmethod
+    def _deliver(q: asyncio.Queue, ev: Dict) -> None:
+        try:
+            q.put_nowait(ev)
+        except asyncio.QueueFull:
+            # Slow consumer: tell it to resync from REST instead of growing without bound
+            try:
+                while True:
+                    q.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            q.put_nowait({"id": None, "type": "reset", "op": "overflow", "data": {}})
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.append((loop, q))
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [(l, s) for l, s in self._subscribers if s is not q]
+
+    def since(self, last_id: int) -> Optional[List[Dict]]:
+        """Events after last_id, or None when last_id is not from this buffer (evicted, or another boot)."""
+        with self._lock:
+            if last_id > self._last_id:
+                return None
+            if last_id == self._last_id:
+                return []
+            if not self._buffer or self._buffer[0]["id"] > last_id + 1:
+                return None
+            return [ev for ev in self._buffer if ev["id"] > last_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+bus = EventBus()
+
+
+def format_sse(ev: Dict) -> str:
+    lines = []
+    if ev.get("id") is not None:
+        lines.append(f"id: {ev['id']}")
+    lines.append("data: " + json.dumps(ev, default=str, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+
+# ---- ORM hooks: publish committed changes ----
+
+def clip_to_dict(c: Clip) -> Dict:
+    return {
+        "id": c.id,
+        "task_id": c.task_id,
+        "short_id": c.short_id,
+        "title": c.title,
+        "description": c.description,
+        "duration_estimate": c.duration_estimate,
+        "hook_strength": c.hook_strength,
+        "why_it_works": c.why_it_works,
+        "file_path": c.file_path,
+        "status": c.status,
+        "channel": c.channel,
+        "created_at": c.created_at.isoformat() if c.created_at else None,
+        # No "fragments": deltas are merged into the row the client has, which keeps its
+        # eager-loaded fragments; a new clip's fragments come with the next REST fetch
+    }
+
+
+def _serialize(obj) -> Optional[Tuple[str, Dict]]:
+    if isinstance(obj, Task):
+        return "task", TaskOut.model_validate(obj).model_dump()
+    if isinstance(obj, UpscaleTask):
+        return "upscale", UpscaleTaskOut.model_validate(obj).model_dump()
+    if isinstance(obj, Clip):
+        return "clip", clip_to_dict(obj)
+    return None
+
+
+@sa_event.listens_for(OrmSession, "after_flush")
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault("_events_pending", [])
+    try:
+        for op, objs in (("upsert", list(session.new) + list(session.dirty)), ("deleted", list(session.deleted))):
+            for obj in objs:
+                if op == "upsert" and not session.is_modified(obj) and obj not in session.new:
+                    continue
+                ser = _serialize(obj)
+                if ser is None:
+                    continue
+                kind, data = ser
+                pending.append((kind, op, {"id": data["id"]} if op == "deleted" else data))
+    except Exception as e:
+        logging.debug(f"[events] Failed to collect changes: {e}")
+
+
+@sa_event.listens_for(OrmSession, "after_commit")
+def _publish_changes(session):
+    pending = session.info.pop("_events_pending", None)
+    if not pending:
+        return
+    # Keep only the last state per row within one transaction
+    latest: Dict[Tuple[str, int], Tuple[str, str, Dict]] = {}
+    for kind, op, data in pending:
+        latest[(kind, data.get("id"))] = (kind, op, data)
+    for kind, op, data in latest.values():
+        bus.publish(kind, op, data)
+
+
+@sa_event.listens_for(OrmSession, "after_rollback")
+def _drop_changes(session):
+    session.info.pop("_events_pending", None)
@@ -1,7 +1,9 @@
-import subprocess
 import os
 from typing import Optional
 
+from . import profiling
+from . import encoders
+
 
 def timemark(seconds: Optional[float]) -> Optional[str]:
     if seconds is None:
@@ -24,12 +26,12 @@ def process_video(input_path: str, output_dir: str, start: Optional[float], end:
         cmd.extend(["-to", timemark(end)])
 
     if start is not None or end is not None:
-        cmd.extend(["-c:v", "libx264", "-c:a", "aac"])
+        # crf 23 = libx264's default, which this path always used
+        result = encoders.encode(lambda v: cmd + [*v, "-c:a", "aac", output_path],
+                                 crf=23, label="ffmpeg_trim", capture_output=True, text=True)
     else:
-        cmd.extend(["-c", "copy"])
-
-    cmd.append(output_path)
-    result = subprocess.run(cmd, capture_output=True, text=True)
+        cmd.extend(["-c", "copy", output_path])
+        result = profiling.run(cmd, label="ffmpeg_copy", capture_output=True, text=True)
     if result.returncode != 0:
         raise RuntimeError(result.stderr.strip() or "ffmpeg failed")
     return os.path.abspath(output_path)
@@ -0,0 +1,252 @@
+"""
+Event-driven ingest of a drop directory (to_upscale/).
+
+Files are discovered through inotify (IN_CLOSE_WRITE / IN_MOVED_TO) when the platform has it,
+otherwise through an incremental os.scandir poll that only looks at names it has not seen.
+Discovered files are not waited on one by one: every pending file is re-stat'ed on each tick
+and promoted once its (size, mtime) has been unchanged for INGEST_STABLE_SECONDS (a file
+reported by IN_CLOSE_WRITE/IN_MOVED_TO only needs one unchanged re-stat). Files that became
+stable in the same tick are handed over together, so the caller can create their rows in one
+transaction.
+
+  INGEST_MODE=auto            auto | inotify | poll
+  INGEST_POLL_SECONDS=2       scan interval in poll mode
+  INGEST_RESCAN_SECONDS=60    safety full rescan in inotify mode (missed events, overflow)
+  INGEST_STABLE_SECONDS=3     unchanged time before a polled file is considered complete
+"""
+import os
+import time
+import errno
+import ctypes
+import select
+import struct
+import logging
+import threading
+import ctypes.util
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+INGEST_MODE = (os.getenv("INGEST_MODE") or "auto").strip().lower()
+POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+RESCAN_SECONDS = float(os.getenv("INGEST_RESCAN_SECONDS", "60"))
+STABLE_SECONDS = float(os.getenv("INGEST_STABLE_SECONDS", "3"))
+TICK_SECONDS = 0.5
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal inotify binding (libc via ctypes) watching a single directory."""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout: float) -> List[Tuple[int, str]]:
+        """(mask, name) events that arrive within timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        events, pos = [], 0
+        while pos + _EVENT.size <= len(buf):
+            _wd, mask, _cookie, length = _EVENT.unpack_from(buf, pos)
+            pos += _EVENT.size
+            name = buf[pos:pos + length].rstrip(b"\0").decode(errors="surrogateescape")
+            pos += length
+            events.append((mask, name))
+        return events
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class DirectoryIngest:
+    """
+    Watch `directory` for complete files accepted by `accept(name)` and call
+    `on_ready(paths)` with every batch that became stable in the same tick.
+    """
+
+    def __init__(self, directory: str, accept: Callable[[str], bool], on_ready: Callable[[List[str]], None]):
+        self.directory = directory
+        self.accept = accept
+        self.on_ready = on_ready
+        self.mode = "poll"
+        self._lock = threading.Lock()
+        self._known: Set[str] = set()
+        # path -> [size, mtime, unchanged_since, closed]
+        self._pending: Dict[str, list] = {}
+        self._rescan_requested = True
+
+    # ---- bookkeeping ----
+
+    def present_count(self) -> int:
+        """Accepted files currently in the directory (pending or handed over)."""
+        with self._lock:
+            return len(self._known)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def rescan(self) -> None:
+        """Ask the loop for a full directory scan on its next tick (thread-safe)."""
+        with self._lock:
+            self._rescan_requested = True
+
+    def _track(self, name: str, closed: bool = False) -> None:
+        if not self.accept(name):
+            return
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if path in self._pending:
+                if closed:
+                    self._pending[path][3] = True
+                return
+            if path in self._known and not closed:
+                return
+            self._known.add(path)
+            self._pending[path] = [-1, -1, 0.0, closed]
+
+    def _forget(self, name: str) -> None:
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            self._known.discard(path)
+            self._pending.pop(path, None)
+
+    def _scan(self) -> None:
+        """Incremental: only names not seen before are tracked; vanished names are forgotten."""
+        try:
+            with os.scandir(self.directory) as it:
+                names = {e.name for e in it if e.is_file(follow_symlinks=False)}
+        except FileNotFoundError:
+            os.makedirs(self.directory, exist_ok=True)
+            names = set()
+        for name in names:
+            self._track(name)
+        with self._lock:
+            for path in [p for p in self._known if os.path.basename(p) not in names]:
+                self._known.discard(path)
+                self._pending.pop(path, None)
+
+    def _check_pending(self) -> List[str]:
+        """Re-stat every pending file once; return those that are now stable."""
+        now = time.time()
+        with self._lock:
+            items = list(self._pending.items())
+        ready, gone = [], []
+        for path, state in items:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                gone.append(path)
+                continue
+            cur = (st.st_size, int(st.st_mtime))
+            if (state[0], state[1]) != cur:
+                state[0], state[1], state[2] = cur[0], cur[1], now
+                continue
+            if state[3] or now - state[2] >= STABLE_SECONDS:
+                ready.append(path)
+        with self._lock:
+            for path in gone:
+                self._pending.pop(path, None)
+                self._known.discard(path)
+            for path in ready:
+                self._pending.pop(path, None)
+        return ready
+
+    # ---- loop ----
+
+    def _open_inotify(self) -> Optional[_Inotify]:
+        if INGEST_MODE == "poll":
+            return None
+        try:
+            return _Inotify(self.directory)
+        except Exception as e:
+            if INGEST_MODE == "inotify":
+                logging.warning(f"[ingest] inotify unavailable ({e}); polling {self.directory}")
+            return None
+
+    def run(self, stop_event: threading.Event, on_tick: Optional[Callable[["DirectoryIngest"], None]] = None) -> None:
+        """Blocking loop; run it in a daemon thread."""
+        os.makedirs(self.directory, exist_ok=True)
+        notify = self._open_inotify()
+        self.mode = "inotify" if notify else "poll"
+        logging.info(f"[ingest] Watching {self.directory} ({self.mode})")
+        last_scan = 0.0
+        try:
+            while not stop_event.is_set():
+                now = time.time()
+                with self._lock:
+                    forced, self._rescan_requested = self._rescan_requested, False
+                interval = RESCAN_SECONDS if notify else POLL_SECONDS
+                if forced or now - last_scan >= interval:
+                    self._scan()
+                    last_scan = now
+                if notify:
+                    try:
+                        events = notify.read(TICK_SECONDS)
+                    except OSError as e:
+                        logging.warning(f"[ingest] inotify read failed ({e}); switching to polling")
+                        notify.close()
+                        notify, self.mode = None, "poll"
+                        continue
+                    for mask, name in events:
+                        if mask & IN_Q_OVERFLOW:
+                            self.rescan()
+                        elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                            # Directory itself went away: recreate and re-arm the watch
+                            notify.close()
+                            os.makedirs(self.directory, exist_ok=True)
+                            notify = self._open_inotify()
+                            self.mode = "inotify" if notify else "poll"
+                            self.rescan()
+                            break
+                        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                            self._track(name, closed=True)
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            self._forget(name)
+                else:
+                    stop_event.wait(TICK_SECONDS)
+                ready = self._check_pending()
+                if ready:
+                    try:
+                        self.on_ready(sorted(ready))
+                    except Exception as e:
+                        # Hand them back so the next tick retries
+                        logging.error(f"[ingest] Failed to ingest {len(ready)} file(s): {e}")
+                        with self._lock:
+                            for path in ready:
+                                self._pending.setdefault(path, [-1, -1, 0.0, True])
+                if on_tick is not None:
+                    on_tick(self)
+        finally:
+            if notify:
+                notify.close()
@@ -1,10 +1,14 @@
-from fastapi import FastAPI, Depends, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Depends, Request, HTTPException, Response
+from fastapi.responses import HTMLResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 import os
+import asyncio
+from typing import Optional
 import requests
 
 # Try to load environment variables from .env file
@@ -14,9 +18,15 @@ try:
 except ImportError:
     pass  # dotenv is optional
 
-from .db import init_db, get_session
+from .db import init_db, get_session, pool_metrics
 from .models import Task, TaskStatus, UpscaleTask, UpscaleStatus, DownloadedVideo, Clip, ClipFragment
 from .schemas import CreateTask, TaskOut, UpscaleTaskOut
+from .events import bus as event_bus, format_sse, clip_to_dict
+from .stats import queue_stats
+from . import metrics
+from . import timeline
+from . import profiling
+from . import encoders
 from .worker import start_workers, add_task_to_download, VIDEOS_DIR, CLIPS_UPSCALED_DIR, TO_UPSCALE_DIR, trigger_upscale_scan, list_upscale_tasks, retry_upscale_task, delete_upscale_task, clear_all_upscale_tasks, delete_task as delete_cut_task, clear_all_tasks as clear_all_cut_tasks
 
 app = FastAPI(title="Video Cutter Task Manager")
@@ -37,6 +47,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-After-Id"],
 )
 
 app.mount("/videos", StaticFiles(directory=os.path.join(BASE_DIR, "videos")), name="videos")
@@ -50,18 +61,93 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR)
 @app.on_event("startup")
 def startup_event():
     init_db()
+    encoders.warm_up()
     start_workers()
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# Keyset pagination: rows are returned newest first (id desc); pass the last id of a page
+# as ?after_id= to get the next one. X-Next-After-Id is set when more rows may follow.
+DEFAULT_PAGE_LIMIT = max(1, _env_int("API_PAGE_LIMIT", 200))
+MAX_PAGE_LIMIT = 1000
+
+
+def _page_limit(limit: Optional[int]) -> int:
+    if limit is None or limit <= 0:
+        return DEFAULT_PAGE_LIMIT
+    return min(limit, MAX_PAGE_LIMIT)
+
+
+def _csv_filter(column, value: Optional[str]):
+    """'a,b,Empty' -> column IN (a, b) OR column IS NULL; None/'all' -> no filter."""
+    if not value:
+        return None
+    items = [v.strip() for v in value.split(",") if v.strip()]
+    if not items or "all" in items:
+        return None
+    values = [v for v in items if v != "Empty"]
+    conds = []
+    if values:
+        conds.append(column.in_(values))
+    if "Empty" in items:
+        conds.append(column.is_(None))
+    return or_(*conds)
+
+
+def _paginate(stmt, model, after_id: Optional[int], limit: Optional[int]):
+    limit = _page_limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(model.id < after_id)
+    stmt = stmt.order_by(model.id.desc()).limit(limit)
+    return stmt, limit
+
+
+def _set_next_page(response: Response, rows, limit: int) -> None:
+    if len(rows) == limit and rows:
+        response.headers["X-Next-After-Id"] = str(rows[-1].id)
+
+
+def _fragment_to_dict(frag: ClipFragment) -> dict:
+    return {
+        "id": frag.id,
+        "start_time": frag.start_time,
+        "end_time": frag.end_time,
+        "text": frag.text,
+        "visual_suggestion": frag.visual_suggestion,
+        "order": frag.order
+    }
+
+
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request, session: Session = Depends(get_session)):
-    tasks = session.exec(select(Task).order_by(Task.id.desc())).all()
+    tasks = session.exec(select(Task).order_by(Task.id.desc()).limit(DEFAULT_PAGE_LIMIT)).all()
     return templates.TemplateResponse("index.html", {"request": request, "tasks": tasks, "videos_dir": VIDEOS_DIR})
 
 
 @app.get("/api/tasks", response_model=list[TaskOut])
-def list_tasks(session: Session = Depends(get_session)):
-    tasks = session.exec(select(Task).order_by(Task.id.desc())).all()
+def list_tasks(
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    status: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """All tasks, newest first; paged only when limit or after_id is given (the dashboard loads the full list)."""
+    stmt = select(Task)
+    cond = _csv_filter(Task.status, status)
+    if cond is not None:
+        stmt = stmt.where(cond)
+    if after_id is None and limit is None:
+        return session.exec(stmt.order_by(Task.id.desc())).all()
+    stmt, limit = _paginate(stmt, Task, after_id, limit)
+    tasks = session.exec(stmt).all()
+    _set_next_page(response, tasks, limit)
     return tasks
 
 
@@ -125,18 +211,16 @@ def get_task_clips(task_id: int, session: Session = Depends(get_session)):
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Get clips with fragments
+    # Get clips with fragments (one extra IN query for all fragments)
     clips = session.exec(
-        select(Clip).where(Clip.task_id == task_id).order_by(Clip.short_id)
+        select(Clip)
+        .where(Clip.task_id == task_id)
+        .options(selectinload(Clip.fragments))
+        .order_by(Clip.short_id)
     ).all()
     
     result = []
     for clip in clips:
-        # Get fragments for this clip
-        fragments = session.exec(
-            select(ClipFragment).where(ClipFragment.clip_id == clip.id).order_by(ClipFragment.order)
-        ).all()
-        
         clip_data = {
             "id": clip.id,
             "short_id": clip.short_id,
@@ -147,17 +231,7 @@ def get_task_clips(task_id: int, session: Session = Depends(get_session)):
             "why_it_works": clip.why_it_works,
             "file_path": clip.file_path,
             "created_at": clip.created_at.isoformat(),
-            "fragments": [
-                {
-                    "id": frag.id,
-                    "start_time": frag.start_time,
-                    "end_time": frag.end_time,
-                    "text": frag.text,
-                    "visual_suggestion": frag.visual_suggestion,
-                    "order": frag.order
-                }
-                for frag in fragments
-            ]
+            "fragments": [_fragment_to_dict(frag) for frag in clip.fragments]
         }
         result.append(clip_data)
     
@@ -171,11 +245,6 @@ def get_clip(clip_id: int, session: Session = Depends(get_session)):
     if not clip:
         raise HTTPException(status_code=404, detail="Clip not found")
     
-    # Get fragments for this clip
-    fragments = session.exec(
-        select(ClipFragment).where(ClipFragment.clip_id == clip.id).order_by(ClipFragment.order)
-    ).all()
-    
     return {
         "id": clip.id,
         "task_id": clip.task_id,
@@ -187,17 +256,7 @@ def get_clip(clip_id: int, session: Session = Depends(get_session)):
         "why_it_works": clip.why_it_works,
         "file_path": clip.file_path,
         "created_at": clip.created_at.isoformat(),
-        "fragments": [
-            {
-                "id": frag.id,
-                "start_time": frag.start_time,
-                "end_time": frag.end_time,
-                "text": frag.text,
-                "visual_suggestion": frag.visual_suggestion,
-                "order": frag.order
-            }
-            for frag in fragments
-        ]
+        "fragments": [_fragment_to_dict(frag) for frag in clip.fragments]
     }
 
 
@@ -245,7 +304,7 @@ def api_clear_upscale():
 
 # Upscale settings and status
 from .upscale_config import get_upscale_settings, save_upscale_settings
-from .upscale_vast import VastManager
+from .worker import get_vast
 
 @app.get("/api/upscale/settings")
 def api_get_upscale_settings():
@@ -285,23 +344,27 @@ def api_get_upscale_status():
         except Exception:
             # GPU API not reachable
             return {"state": "stopped"}
-    # Fallback to VastManager status (legacy flow)
+    # Fallback to VastManager status (legacy flow); shared manager reuses the cached instance state
     try:
-        vm = VastManager()
+        vm = get_vast()
         state = vm.get_status()
     except Exception:
         state = "unknown"
     return {"state": state}
 
+@app.get("/api/upscale/autoscale")
+def api_get_upscale_autoscale():
+    """Current keep-warm decision and the cost/latency trade-off behind it."""
+    from .worker import warm_standby
+    return warm_standby.decide()
+
+
 @app.get("/api/queue/stats")
 def api_get_queue_stats():
     """Get current queue statistics from orchestrator workers."""
-    from .worker import (
-        download_queue, process_queue, 
-        upload_upscale_queue, process_upscale_queue, result_download_queue,
-        _active_upscale
-    )
-    
+    from .worker import download_queue, process_queue, get_upscale_queue_sizes
+
+    upscale_sizes = get_upscale_queue_sizes()
     stats = {
         "cut_queues": {
             "download": {
@@ -317,17 +380,17 @@ def api_get_queue_stats():
         },
         "upscale_queues": {
             "upload": {
-                "size": upload_upscale_queue.qsize(),
+                "size": upscale_sizes["upload"],
                 "max_workers": 1,
                 "description": "Upload to GPU queue"
             },
             "process": {
-                "size": process_upscale_queue.qsize(),
-                "active_workers": _active_upscale,
+                "size": upscale_sizes["process"],
+                "active_workers": upscale_sizes["active_gpu"],
                 "description": "GPU processing queue"
             },
             "download": {
-                "size": result_download_queue.qsize(),
+                "size": upscale_sizes["download"],
                 "max_workers": 1,
                 "description": "Download results queue"
             }
@@ -340,65 +403,85 @@ def api_get_queue_stats():
     except Exception:
         stats["upscale_queues"]["process"]["max_workers"] = 2
         
-    # Add healthcheck info
-    from datetime import datetime, timezone, timedelta
+    # Add healthcheck info (grouped counts, cached for QUEUE_STATS_TTL seconds)
     try:
-        from sqlmodel import Session, select
-        from .db import engine
-        from .models import UpscaleTask, UpscaleStatus
-        
-        def time_utc():
-            return datetime.now(timezone.utc).replace(tzinfo=None)
-            
-        with Session(engine) as session:
-            now = time_utc()
-            
-            # Count potentially stuck tasks
-            cutoff_10min = now - timedelta(minutes=10)
-            stuck_queued = len(list(session.exec(
-                select(UpscaleTask).where(
-                    UpscaleTask.status == UpscaleStatus.QUEUED,
-                    UpscaleTask.stage != "queued",
-                    UpscaleTask.updated_at < cutoff_10min
-                )
-            )))
-            
-            cutoff_30min = now - timedelta(minutes=30)
-            stuck_uploading = len(list(session.exec(
-                select(UpscaleTask).where(
-                    UpscaleTask.stage == "uploading",
-                    UpscaleTask.updated_at < cutoff_30min
-                )
-            )))
-            
-            cutoff_60min = now - timedelta(minutes=60)
-            stuck_processing = len(list(session.exec(
-                select(UpscaleTask).where(
-                    UpscaleTask.stage == "processing", 
-                    UpscaleTask.updated_at < cutoff_60min
-                )
-            )))
-            
-            stats["healthcheck"] = {
-                "stuck_tasks": {
-                    "queued_but_not_queued": stuck_queued,
-                    "uploading_too_long": stuck_uploading, 
-                    "processing_too_long": stuck_processing,
-                    "total": stuck_queued + stuck_uploading + stuck_processing
-                },
-                "enabled": True,
-                "check_interval": "5 minutes"
-            }
+        snap = queue_stats.snapshot()
+        stats["healthcheck"] = {
+            "stuck_tasks": queue_stats.stuck_counts(snap),
+            "enabled": True,
+            "check_interval": "5 minutes"
+        }
+        stats["counts"] = {
+            "upscale": queue_stats.by_status(snap["upscale"]),
+            "tasks": queue_stats.by_status(snap["tasks"]),
+            "computed_at": snap["computed_at"],
+        }
     except Exception as e:
         stats["healthcheck"] = {"enabled": False, "error": str(e)}
     
     return stats
 
 
+@app.get("/api/tasks/{task_id}/timeline")
+def api_task_timeline(task_id: int):
+    """Stage waterfall for a Cut task."""
+    return timeline.task_timeline("cut", task_id)
+
+
+@app.get("/api/upscale/tasks/{task_id}/timeline")
+def api_upscale_task_timeline(task_id: int):
+    """Stage waterfall for an Upscale task."""
+    return timeline.task_timeline("upscale", task_id)
+
+
+@app.get("/api/timeline/summary")
+def api_timeline_summary(kind: Optional[str] = None, hours: float = 24.0):
+    """Per-stage duration percentiles (p50/p90/p95/p99) across tasks in the last `hours`."""
+    if kind not in (None, "cut", "upscale"):
+        raise HTTPException(status_code=400, detail="kind must be 'cut' or 'upscale'")
+    return timeline.stage_summary(kind=kind, hours=hours)
+
+
+@app.get("/api/tasks/{task_id}/profile")
+def api_task_profile(task_id: int):
+    """Recorded ffmpeg/ssh/Whisper calls of a Cut task (kept in memory by this process)."""
+    return profiling.task_report("cut", task_id)
+
+
+@app.get("/api/upscale/tasks/{task_id}/profile")
+def api_upscale_task_profile(task_id: int):
+    """Recorded scp/ssh calls of an Upscale task (kept in memory by this process)."""
+    return profiling.task_report("upscale", task_id)
+
+
+@app.get("/api/profile/summary")
+def api_profile_summary():
+    """Per-label call totals (wall/CPU time, peak RSS, bytes) since process start."""
+    return profiling.summary()
+
+
+@app.get("/api/encoders")
+def api_encoders():
+    """Selected H.264 encoder, probe result and per-encoder fps."""
+    return encoders.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition: stage durations, transfer bytes, queue depths."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/db/pool")
+def api_db_pool():
+    """Connection pool usage and checkout wait times for this process."""
+    return pool_metrics()
+
+
 @app.post("/api/upscale/ensure")
 def api_upscale_ensure():
     try:
-        vm = VastManager()
+        vm = get_vast()
         details = vm.ensure_instance_running()
         return {"id": details.get("id"), "state": details.get("actual_status")}
     except Exception as e:
@@ -408,26 +491,26 @@ def api_upscale_ensure():
 
 # Clips list API for frontend Clips tab
 @app.get("/api/clips")
-def api_list_clips(session: Session = Depends(get_session)):
-    clips = session.exec(select(Clip).order_by(Clip.id.desc())).all()
-    result = []
-    for c in clips:
-        result.append({
-            "id": c.id,
-            "task_id": c.task_id,
-            "short_id": c.short_id,
-            "title": c.title,
-            "description": c.description,
-            "duration_estimate": c.duration_estimate,
-            "hook_strength": c.hook_strength,
-            "why_it_works": c.why_it_works,
-            "file_path": c.file_path,
-            "status": c.status,
-            "channel": c.channel,
-            "created_at": c.created_at.isoformat(),
-            "fragments": []  # Empty for list view, populated in detail view
-        })
-    return result
+def api_list_clips(
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    status: Optional[str] = None,
+    channel: Optional[str] = None,
+    task_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+):
+    """List clips newest first. status/channel take comma-separated values ('Empty' = not set)."""
+    stmt = select(Clip)
+    for cond in (_csv_filter(Clip.status, status), _csv_filter(Clip.channel, channel)):
+        if cond is not None:
+            stmt = stmt.where(cond)
+    if task_id is not None:
+        stmt = stmt.where(Clip.task_id == task_id)
+    stmt, limit = _paginate(stmt, Clip, after_id, limit)
+    clips = session.exec(stmt).all()
+    _set_next_page(response, clips, limit)
+    return [clip_to_dict(c) for c in clips]
 
 
 @app.patch("/api/clips/{clip_id}")
@@ -453,3 +536,61 @@ def api_update_clip(clip_id: int, payload: dict, session: Session = Depends(get_
         "channel": clip.channel,
         "message": "Clip updated successfully"
     }
+
+
+# Live updates for the dashboard (Server-Sent Events)
+@app.get("/api/events")
+async def api_events(request: Request, last_event_id: Optional[int] = None):
+    """
+    Stream task/upscale/clip deltas as SSE. Each message is JSON {id, type, op, data}:
+      type: task | upscale | clip | hello | reset
+      op:   upsert (full row) | patch (changed fields) | deleted ({id})
+    Resume with the Last-Event-ID header (sent automatically by EventSource) or ?last_event_id=.
+    A 'reset' event means the requested id is no longer buffered: refetch the lists via REST.
+    """
+    header_id = request.headers.get("last-event-id")
+    if last_event_id is None and header_id:
+        try:
+            last_event_id = int(header_id)
+        except ValueError:
+            last_event_id = None
+    heartbeat = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+    async def stream():
+        q = event_bus.subscribe()
+        try:
+            sent = last_event_id or 0
+            if last_event_id is None:
+                yield format_sse({"id": event_bus.last_id or None, "type": "hello", "op": "snapshot", "data": {}})
+                sent = event_bus.last_id
+            else:
+                backlog = event_bus.since(last_event_id)
+                if backlog is None:
+                    yield format_sse({"id": event_bus.last_id or None, "type": "reset", "op": "expired", "data": {}})
+                    sent = event_bus.last_id
+                else:
+                    for ev in backlog:
+                        yield format_sse(ev)
+                        sent = ev["id"]
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    ev = await asyncio.wait_for(q.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                # Skip events already delivered from the backlog
+                if ev.get("id") is not None and ev["id"] <= sent:
+                    continue
+                yield format_sse(ev)
+                if ev.get("id") is not None:
+                    sent = ev["id"]
+        finally:
+            event_bus.unsubscribe(q)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
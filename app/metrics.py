@@ -0,0 +1,243 @@
+"""
+Minimal Prometheus-compatible metrics (text exposition format 0.0.4), no external dependency.
+
+    STAGE_SECONDS.observe(12.3, stage="upload")
+    with stage_timer("transcribe"):
+        ...
+    render()  # -> text for GET /metrics
+
+The GPU server carries a copy of this module (upscale/vastai_deployment/metrics.py).
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_LabelKey = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict) -> _LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels_str(self, key: _LabelKey, extra: Optional[Dict] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels_str(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelKey, float] = {}
+        self._fn: Optional[Callable[[], Dict]] = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], Dict]) -> None:
+        """Compute values at scrape time: fn() -> {label value or tuple of label values: number}."""
+        self._fn = fn
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = dict(self._values)
+        if self._fn is not None:
+            try:
+                for k, v in (self._fn() or {}).items():
+                    key = k if isinstance(k, tuple) else (k,) if self.labelnames else ()
+                    items[tuple(str(x) for x in key)] = float(v)
+            except Exception:
+                pass
+        return [f"{self.name}{self._labels_str(k)} {_fmt(v)}" for k, v in items.items()]
+
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float("inf"),)
+        self._data: Dict[_LabelKey, List] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._data.items()]
+        out = []
+        for key, data in items:
+            for i, b in enumerate(self.buckets):
+                out.append(f"{self.name}_bucket{self._labels_str(key, {'le': _fmt(b)})} {data[i]}")
+            out.append(f"{self.name}_sum{self._labels_str(key)} {_fmt(data[-2])}")
+            out.append(f"{self.name}_count{self._labels_str(key)} {data[-1]}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---- Pipeline metrics (orchestrator side) ----
+
+STAGE_SECONDS = Histogram(
+    "aporto_stage_duration_seconds",
+    "Wall time per pipeline stage",
+    ["pipeline", "stage", "outcome"],
+)
+BYTES_TOTAL = Counter(
+    "aporto_transfer_bytes_total",
+    "Bytes moved between the orchestrator and the GPU host",
+    ["direction", "pipeline"],
+)
+STAGE_FAILURES = Counter(
+    "aporto_stage_failures_total",
+    "Stage executions that raised",
+    ["pipeline", "stage"],
+)
+QUEUE_DEPTH = Gauge(
+    "aporto_queue_depth",
+    "Items waiting in in-process work queues",
+    ["queue"],
+)
+GPU_SLOTS_ACTIVE = Gauge(
+    "aporto_gpu_slots_active",
+    "Upscale jobs currently holding a GPU slot",
+)
+
+
+@contextmanager
+def stage_timer(stage: str, pipeline: str = "cut"):
+    """Time a stage; outcome label is 'ok' or 'error' depending on whether the block raised."""
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        STAGE_FAILURES.inc(pipeline=pipeline, stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, pipeline=pipeline, stage=stage, outcome=outcome)
+
+
+def observe_stage(stage: str, seconds: float, pipeline: str = "cut", outcome: str = "ok") -> None:
+    if seconds is not None and seconds >= 0:
+        STAGE_SECONDS.observe(seconds, pipeline=pipeline, stage=stage, outcome=outcome)
+
+
+def add_bytes(direction: str, nbytes: int, pipeline: str = "cut") -> None:
+    try:
+        if nbytes:
+            BYTES_TOTAL.inc(float(nbytes), direction=direction, pipeline=pipeline)
+    except Exception:
+        pass
+
+
+def file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path) if path and os.path.isfile(path) else 0
+    except Exception:
+        return 0
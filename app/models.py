@@ -17,7 +17,7 @@ class Task(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     url: str
     mode: str = Field(default="simple")  # "simple" | "auto"
-    status: str = Field(default=TaskStatus.QUEUED_DOWNLOAD)
+    status: str = Field(default=TaskStatus.QUEUED_DOWNLOAD, index=True)
     # Текущая стадия процесса (для UI): downloading | transcribing | gpt | cutting | done | error
     stage: Optional[str] = None
     # Прогресс в процентах (0..100)
@@ -48,8 +48,8 @@ class UpscaleStatus:
 class UpscaleTask(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     file_path: str  # local path under to_upscale/
-    status: str = Field(default=UpscaleStatus.QUEUED)
-    stage: Optional[str] = None  # ensuring_instance|uploading|processing|downloading|done|error
+    status: str = Field(default=UpscaleStatus.QUEUED, index=True)
+    stage: Optional[str] = Field(default=None, index=True)  # ensuring_instance|uploading|processing|downloading|done|error
     progress: Optional[int] = 0
     
     vast_instance_id: Optional[str] = None
@@ -59,7 +59,7 @@ class UpscaleTask(SQLModel, table=True):
     error: Optional[str] = None
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 
 class DownloadedVideo(SQLModel, table=True):
@@ -71,7 +71,7 @@ class DownloadedVideo(SQLModel, table=True):
 
 class Clip(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    task_id: int = Field(foreign_key="task.id")
+    task_id: int = Field(foreign_key="task.id", index=True)
     short_id: int  # The clip number from GPT response
     title: str
     description: str
@@ -84,12 +84,15 @@ class Clip(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     # Relationship to fragments
-    fragments: List["ClipFragment"] = Relationship(back_populates="clip")
+    fragments: List["ClipFragment"] = Relationship(
+        back_populates="clip",
+        sa_relationship_kwargs={"order_by": "ClipFragment.order"},
+    )
 
 
 class ClipFragment(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    clip_id: int = Field(foreign_key="clip.id")
+    clip_id: int = Field(foreign_key="clip.id", index=True)
     start_time: str  # Timestamp like "00:05:23.100"
     end_time: str    # Timestamp like "00:05:28.400"
     text: str        # Exact text from transcript
@@ -98,3 +101,15 @@ class ClipFragment(SQLModel, table=True):
     
     # Relationship back to clip
     clip: Optional[Clip] = Relationship(back_populates="fragments")
+
+
+class TaskEvent(SQLModel, table=True):
+    """One stage interval of a Task (kind="cut") or UpscaleTask (kind="upscale")."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    task_kind: str = Field(index=True)  # cut | upscale
+    task_id: int = Field(index=True)
+    stage: str
+    started_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    ended_at: Optional[datetime] = None  # None while the stage is current
+    bytes: Optional[int] = None  # payload moved during the stage (uploads/downloads)
+    host: Optional[str] = None  # orchestrator hostname or vast:<instance id> for GPU-side stages
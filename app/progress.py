@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Tuple, Type
+
+from sqlalchemy import bindparam, update
+from sqlmodel import SQLModel
+
+from .db import engine
+from .events import bus
+from .models import Task, TaskStatus, UpscaleTask, UpscaleStatus
+
+
+# Rows in these states are owned by synchronous commits; a late coalesced tick must never overwrite them
+_TERMINAL = {
+    Task: (TaskStatus.DONE, TaskStatus.ERROR, TaskStatus.CANCELED),
+    UpscaleTask: (UpscaleStatus.DONE, UpscaleStatus.ERROR),
+}
+_EVENT_KIND = {Task: "task", UpscaleTask: "upscale"}
+
+
+class ProgressAggregator:
+    """
+    Coalesces high-frequency progress ticks (progress/stage/updated_at) in memory and writes them
+    in one transaction every PROGRESS_FLUSH_MS (default 1000 ms), one executemany UPDATE per
+    table and column set. Status transitions and terminal states must still be committed
+    synchronously by the caller, after discard() for that row.
+    """
+
+    def __init__(self):
+        try:
+            self.flush_interval = max(0.05, float(os.getenv("PROGRESS_FLUSH_MS", "1000")) / 1000.0)
+        except Exception:
+            self.flush_interval = 1.0
+        self._pending: Dict[Tuple[Type[SQLModel], int], Dict] = {}
+        self._lock = threading.Lock()
+        # Held for the whole flush so discard() orders terminal commits after any in-flight batch
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.flushed_rows = 0
+        self.flush_count = 0
+
+    def update(self, model: Type[SQLModel], row_id: int, **fields) -> None:
+        if row_id is None or not fields:
+            return
+        with self._lock:
+            self._pending.setdefault((model, int(row_id)), {}).update(fields)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="progress_flusher", daemon=True)
+                self._thread.start()
+
+    def discard(self, model: Type[SQLModel], row_id: int) -> None:
+        """Drop pending ticks for a row before the caller commits a state change synchronously."""
+        with self._flush_lock:
+            with self._lock:
+                self._pending.pop((model, int(row_id)), None)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            groups: Dict[Tuple[Type[SQLModel], frozenset], list] = {}
+            for (model, row_id), fields in batch.items():
+                params = {f"b_{k}": v for k, v in fields.items()}
+                params["b_id"] = row_id
+                groups.setdefault((model, frozenset(fields)), []).append(params)
+            try:
+                with engine.begin() as conn:
+                    for (model, keys), rows in groups.items():
+                        table = model.__table__
+                        stmt = (
+                            update(table)
+                            .where(table.c.id == bindparam("b_id"))
+                            # Plain != per status: an expanding NOT IN (...) cannot be used with executemany
+                            .where(*(table.c.status != st for st in _TERMINAL.get(model, ())))
+                            .values({k: bindparam(f"b_{k}") for k in keys})
+                        )
+                        conn.execute(stmt, rows)
+            except Exception as e:
+                logging.warning(f"[progress] Batched flush of {len(batch)} rows failed: {e}")
+                # Put back what is not superseded by newer ticks; retry on the next interval
+                with self._lock:
+                    for key, fields in batch.items():
+                        merged = dict(fields)
+                        merged.update(self._pending.get(key, {}))
+                        self._pending[key] = merged
+                return 0
+            self.flushed_rows += len(batch)
+            self.flush_count += 1
+            for (model, row_id), fields in batch.items():
+                kind = _EVENT_KIND.get(model)
+                if kind:
+                    bus.publish(kind, "patch", {"id": row_id, **fields})
+            return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"[progress] Flusher error: {e}")
+
+
+progress_aggregator = ProgressAggregator()
@@ -0,0 +1,119 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import Task, UpscaleTask, UpscaleStatus
+
+
+def time_utc():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Age buckets (minutes since updated_at) used by the stuck-task rules
+AGE_BUCKETS = (10, 30, 60)
+
+
+class QueueStats:
+    """
+    Grouped task counts for dashboards and the queue healthcheck.
+
+    One GROUP BY status, stage query per table, with conditional counts for the
+    updated_at age buckets, cached for QUEUE_STATS_TTL seconds (default 5) so
+    polling stays O(groups) instead of O(rows).
+    """
+
+    def __init__(self):
+        try:
+            self.ttl = float(os.getenv("QUEUE_STATS_TTL", "5"))
+        except Exception:
+            self.ttl = 5.0
+        self._lock = threading.Lock()
+        self._cached: Optional[Dict] = None
+        self._cached_ts = 0.0
+
+    def _grouped(self, session: Session, model, now: datetime) -> List[Dict]:
+        ages = [
+            func.sum(case((model.updated_at < now - timedelta(minutes=m), 1), else_=0))
+            for m in AGE_BUCKETS
+        ]
+        rows = session.exec(
+            select(model.status, model.stage, func.count(model.id), *ages)
+            .group_by(model.status, model.stage)
+        ).all()
+        result = []
+        for row in rows:
+            status, stage, count = row[0], row[1], row[2]
+            item = {"status": status, "stage": stage, "count": int(count or 0)}
+            for m, v in zip(AGE_BUCKETS, row[3:]):
+                item[f"older_{m}m"] = int(v or 0)
+            result.append(item)
+        return result
+
+    def _compute(self) -> Dict:
+        now = time_utc()
+        with Session(engine) as session:
+            upscale = self._grouped(session, UpscaleTask, now)
+            tasks = self._grouped(session, Task, now)
+        return {"upscale": upscale, "tasks": tasks, "computed_at": now.isoformat()}
+
+    def snapshot(self, force: bool = False) -> Dict:
+        with self._lock:
+            if not force and self._cached is not None and (time.time() - self._cached_ts) < self.ttl:
+                return self._cached
+            try:
+                self._cached = self._compute()
+                self._cached_ts = time.time()
+            except Exception as e:
+                logging.error(f"[stats] Failed to compute queue stats: {e}")
+                if self._cached is None:
+                    raise
+            return self._cached
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cached = None
+
+    # ---- Derived views ----
+
+    @staticmethod
+    def by_status(groups: List[Dict]) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for g in groups:
+            out[g["status"]] = out.get(g["status"], 0) + g["count"]
+        return out
+
+    def stuck_counts(self, snap: Optional[Dict] = None, gpu_slots_busy: bool = False) -> Dict[str, int]:
+        """
+        Same rules as the healthcheck:
+          1. status queued, stage not 'queued', no update for 10 min
+             (queued_gpu excluded while all GPU slots are busy)
+          2. stage uploading for 30 min
+          3. stage processing for 60 min
+        """
+        snap = snap or self.snapshot()
+        queued = uploading = processing = 0
+        for g in snap["upscale"]:
+            stage = g["stage"]
+            if g["status"] == UpscaleStatus.QUEUED and stage is not None and stage != "queued":
+                if not (gpu_slots_busy and stage == "queued_gpu"):
+                    queued += g["older_10m"]
+            if stage == "uploading":
+                uploading += g["older_30m"]
+            if stage == "processing":
+                processing += g["older_60m"]
+        return {
+            "queued_but_not_queued": queued,
+            "uploading_too_long": uploading,
+            "processing_too_long": processing,
+            "total": queued + uploading + processing,
+        }
+
+
+queue_stats = QueueStats()
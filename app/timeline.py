@@ -0,0 +1,215 @@
+import os
+import socket
+import logging
+from contextlib import nullcontext
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import event as sa_event, inspect, update
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import Task, UpscaleTask, TaskEvent
+
+
+HOST = os.getenv("TIMELINE_HOST") or socket.gethostname()
+
+# Stages that run on the GPU host rather than in this process
+_GPU_STAGES = {"processing", "remote_processing"}
+# Terminal stages are recorded as zero-length markers
+_TERMINAL_STAGES = {"done", "error"}
+
+
+def time_utc():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _kind(obj) -> Optional[str]:
+    if isinstance(obj, Task):
+        return "cut"
+    if isinstance(obj, UpscaleTask):
+        return "upscale"
+    return None
+
+
+def _host_for(obj, stage: str) -> str:
+    if stage in _GPU_STAGES:
+        instance = getattr(obj, "vast_instance_id", None)
+        return f"vast:{instance}" if instance else "gpu"
+    return HOST
+
+
+def _keep_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Load the previous stage when it is assigned on an expired instance (after any commit), so
+# the flush history holds the old value and re-assigning the same stage is not a transition
+for _model in (Task, UpscaleTask):
+    sa_event.listen(_model.stage, "set", _keep_value, active_history=True, retval=True)
+
+
+@sa_event.listens_for(OrmSession, "after_flush")
+def _record_stage_transitions(session, flush_context):
+    """Close the open TaskEvent and open a new one whenever Task/UpscaleTask.stage changes."""
+    transitions = []
+    for obj in list(session.new) + list(session.dirty):
+        kind = _kind(obj)
+        if kind is None or obj.id is None:
+            continue
+        hist = inspect(obj).attrs.stage.history
+        if obj in session.new:
+            changed = obj.stage is not None
+        else:
+            changed = bool(hist.added) and hist.added[0] != (hist.deleted[0] if hist.deleted else None)
+        if changed:
+            transitions.append((kind, obj.id, obj.stage, _host_for(obj, obj.stage or "")))
+    deleted = [(k, o.id) for o in session.deleted for k in [_kind(o)] if k and o.id is not None]
+    if not transitions and not deleted:
+        return
+    now = time_utc()
+    try:
+        conn = session.connection()
+        # SAVEPOINT: on PostgreSQL a failed statement aborts the whole transaction, so the
+        # task's own commit would fail later; rolling back to the savepoint keeps it usable.
+        # SQLite keeps the transaction usable after a failed statement (and pysqlite
+        # savepoints need extra setup), so it writes directly.
+        savepoint = conn.begin_nested() if conn.dialect.name != "sqlite" else nullcontext()
+    except Exception as e:
+        logging.debug(f"[timeline] Failed to open savepoint: {e}")
+        return
+    try:
+        with savepoint:
+            _write_transitions(conn, deleted, transitions, now)
+    except Exception as e:
+        # Timeline is diagnostics only; never fail the task transition because of it
+        logging.debug(f"[timeline] Failed to record transition: {e}")
+
+
+def _write_transitions(conn, deleted, transitions, now) -> None:
+    table = TaskEvent.__table__
+    for kind, task_id in deleted:
+        conn.execute(table.delete().where(table.c.task_kind == kind, table.c.task_id == task_id))
+    for kind, task_id, stage, host in transitions:
+        conn.execute(
+            update(table)
+            .where(table.c.task_kind == kind, table.c.task_id == task_id, table.c.ended_at.is_(None))
+            .values(ended_at=now)
+        )
+        if not stage:
+            continue
+        conn.execute(table.insert().values(
+            task_kind=kind,
+            task_id=task_id,
+            stage=stage,
+            started_at=now,
+            ended_at=now if stage in _TERMINAL_STAGES else None,
+            host=host,
+        ))
+
+
+def record_bytes(kind: str, task_id: int, stage: str, nbytes: int) -> None:
+    """Attach a byte count to the most recent event of a stage (set after the transfer finishes)."""
+    if not nbytes:
+        return
+    try:
+        with Session(engine) as session:
+            ev = session.exec(
+                select(TaskEvent)
+                .where(TaskEvent.task_kind == kind, TaskEvent.task_id == task_id, TaskEvent.stage == stage)
+                .order_by(TaskEvent.id.desc())
+            ).first()
+            if ev:
+                ev.bytes = int(nbytes)
+                session.add(ev)
+                session.commit()
+    except Exception as e:
+        logging.debug(f"[timeline] Failed to record bytes: {e}")
+
+
+def _duration(ev: TaskEvent, now: datetime) -> float:
+    return ((ev.ended_at or now) - ev.started_at).total_seconds()
+
+
+def task_timeline(kind: str, task_id: int) -> Dict:
+    """Waterfall for one task: each stage with its offset from the first event and its duration."""
+    now = time_utc()
+    with Session(engine) as session:
+        events = session.exec(
+            select(TaskEvent)
+            .where(TaskEvent.task_kind == kind, TaskEvent.task_id == task_id)
+            .order_by(TaskEvent.started_at, TaskEvent.id)
+        ).all()
+    if not events:
+        return {"task_kind": kind, "task_id": task_id, "total_seconds": 0.0, "stages": []}
+    t0 = events[0].started_at
+    end = max((ev.ended_at or now) for ev in events)
+    stages = [
+        {
+            "stage": ev.stage,
+            "started_at": ev.started_at.isoformat(),
+            "ended_at": ev.ended_at.isoformat() if ev.ended_at else None,
+            "offset_seconds": round((ev.started_at - t0).total_seconds(), 3),
+            "duration_seconds": round(_duration(ev, now), 3),
+            "open": ev.ended_at is None,
+            "bytes": ev.bytes,
+            "host": ev.host,
+        }
+        for ev in events
+    ]
+    return {
+        "task_kind": kind,
+        "task_id": task_id,
+        "total_seconds": round((end - t0).total_seconds(), 3),
+        "stages": stages,
+    }
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = q * (len(sorted_values) - 1)
+    lo = int(idx)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (idx - lo)
+
+
+def stage_summary(kind: Optional[str] = None, hours: float = 24.0, limit: int = 100000) -> Dict:
+    """Per-stage duration percentiles over closed events that started within the window."""
+    since = time_utc() - timedelta(hours=hours)
+    with Session(engine) as session:
+        stmt = (
+            select(TaskEvent.task_kind, TaskEvent.stage, TaskEvent.started_at, TaskEvent.ended_at, TaskEvent.bytes)
+            .where(TaskEvent.started_at >= since, TaskEvent.ended_at.is_not(None))
+            .limit(limit)
+        )
+        if kind:
+            stmt = stmt.where(TaskEvent.task_kind == kind)
+        rows = session.exec(stmt).all()
+    groups: Dict[tuple, Dict] = {}
+    for task_kind, stage, started_at, ended_at, nbytes in rows:
+        if stage in _TERMINAL_STAGES:
+            continue
+        g = groups.setdefault((task_kind, stage), {"durations": [], "bytes": 0})
+        g["durations"].append((ended_at - started_at).total_seconds())
+        g["bytes"] += nbytes or 0
+    stages = []
+    for (task_kind, stage), g in groups.items():
+        d = sorted(g["durations"])
+        stages.append({
+            "task_kind": task_kind,
+            "stage": stage,
+            "count": len(d),
+            "total_seconds": round(sum(d), 3),
+            "avg_seconds": round(sum(d) / len(d), 3),
+            "p50_seconds": round(_percentile(d, 0.50), 3),
+            "p90_seconds": round(_percentile(d, 0.90), 3),
+            "p95_seconds": round(_percentile(d, 0.95), 3),
+            "p99_seconds": round(_percentile(d, 0.99), 3),
+            "max_seconds": round(d[-1], 3),
+            "bytes": g["bytes"],
+        })
+    # Biggest total time first: that is where the pipeline spends its wall clock
+    stages.sort(key=lambda s: s["total_seconds"], reverse=True)
+    return {"since": since.isoformat(), "hours": hours, "kind": kind, "stages": stages}
@@ -0,0 +1,265 @@
+import os
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import Task, UpscaleTask
+
+
+def time_utc():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class WarmStandbyScheduler:
+    """
+    Predictive keep-warm policy for the Vast instance.
+
+    Learns arrival patterns from Task/UpscaleTask.created_at history:
+      - an hour-of-week rate table (how many jobs usually arrive in this hour)
+      - the inter-arrival gap distribution (how likely a burst continues)
+    and keeps the instance warm for the next window when that is cheaper than paying
+    a cold start (boot + SSH readiness) on the next file drop:
+
+      P(arrival in window) * boot_seconds * latency value  >=  idle cost of the window
+
+    The same rule starts a stopped instance ahead of a predicted arrival (run_prestart_loop).
+
+    Env:
+      VAST_AUTOSCALE (default 1)            - enable predictive keep-warm / pre-start
+      VAST_HOURLY_COST (default 0.5)        - instance price, $/hour
+      VAST_LATENCY_VALUE (default 4.0)      - what an hour of waiting for a cold start costs, $/hour
+      VAST_BOOT_SECONDS (default 240)       - cold start estimate until a measurement exists
+      VAST_WARM_WINDOW (default 900)        - look-ahead window, seconds
+      VAST_PREDICTIVE_PRESTART (default 1)  - start a stopped instance when an arrival is predicted
+      VAST_AUTOSCALE_HISTORY_DAYS (default 14)
+      VAST_AUTOSCALE_REFRESH (default 600)  - seconds between model rebuilds
+      VAST_AUTOSCALE_DECISION_TTL (default 30) - seconds a decision is reused by the idle-stop path
+    """
+
+    def __init__(self):
+        self.enabled = str(os.getenv("VAST_AUTOSCALE", "1")).lower() in ("1", "true", "yes")
+        self.hourly_cost = _env_float("VAST_HOURLY_COST", 0.5)
+        self.boot_seconds = _env_float("VAST_BOOT_SECONDS", 240.0)
+        self.window = max(60.0, _env_float("VAST_WARM_WINDOW", 900.0))
+        self.latency_value = _env_float("VAST_LATENCY_VALUE", 4.0)
+        self.predictive_prestart = str(os.getenv("VAST_PREDICTIVE_PRESTART", "1")).lower() in ("1", "true", "yes")
+        self.decision_ttl = _env_float("VAST_AUTOSCALE_DECISION_TTL", 30.0)
+        self.history_days = max(1.0, _env_float("VAST_AUTOSCALE_HISTORY_DAYS", 14.0))
+        self.refresh_interval = _env_float("VAST_AUTOSCALE_REFRESH", 600.0)
+
+        self._lock = threading.Lock()
+        self._hourly_rate: List[float] = [0.0] * (7 * 24)
+        self._gaps: List[float] = []
+        self._last_arrival: Optional[datetime] = None
+        self._built_ts = 0.0
+        self._rebuild_lock = threading.Lock()
+        self._last_decision: Dict = {}
+        self._decided_ts = 0.0
+        self._prestart_thread: Optional[threading.Thread] = None
+
+    # ---- Model ----
+
+    def _load_arrivals(self) -> List[datetime]:
+        since = time_utc() - timedelta(days=self.history_days)
+        arrivals: List[datetime] = []
+        with Session(engine) as session:
+            for model in (UpscaleTask, Task):
+                rows = session.exec(select(model.created_at).where(model.created_at >= since)).all()
+                arrivals.extend(r for r in rows if r is not None)
+        arrivals.sort()
+        return arrivals
+
+    def rebuild(self) -> None:
+        try:
+            arrivals = self._load_arrivals()
+        except Exception as e:
+            logging.warning(f"[autoscale] Failed to load arrival history: {e}")
+            return
+        counts = [0] * (7 * 24)
+        for ts in arrivals:
+            counts[ts.weekday() * 24 + ts.hour] += 1
+        weeks = max(1.0, self.history_days / 7.0)
+        gaps = [
+            (b - a).total_seconds()
+            for a, b in zip(arrivals, arrivals[1:])
+        ]
+        with self._lock:
+            self._hourly_rate = [c / weeks for c in counts]
+            self._gaps = gaps
+            if arrivals and (self._last_arrival is None or arrivals[-1] > self._last_arrival):
+                self._last_arrival = arrivals[-1]
+            self._built_ts = time.time()
+        logging.info(f"[autoscale] Model rebuilt from {len(arrivals)} arrivals over {self.history_days:.0f} days")
+
+    def _maybe_rebuild(self) -> None:
+        if (time.time() - self._built_ts) < self.refresh_interval:
+            return
+        # One thread rebuilds; the others keep deciding on the current model
+        if not self._rebuild_lock.acquire(blocking=False):
+            return
+        try:
+            if (time.time() - self._built_ts) >= self.refresh_interval:
+                self.rebuild()
+                self._built_ts = time.time()  # also after a failed load: retry next interval
+        finally:
+            self._rebuild_lock.release()
+
+    def note_arrival(self, ts: Optional[datetime] = None) -> None:
+        """Record an arrival without waiting for the next model rebuild."""
+        ts = ts or time_utc()
+        with self._lock:
+            if self._last_arrival is not None and ts > self._last_arrival:
+                self._gaps.append((ts - self._last_arrival).total_seconds())
+            if self._last_arrival is None or ts > self._last_arrival:
+                self._last_arrival = ts
+
+    def note_boot(self, seconds: float) -> None:
+        """Blend a measured cold start (start + wait + SSH) into the estimate."""
+        if seconds and seconds > 0:
+            with self._lock:
+                self.boot_seconds = 0.7 * self.boot_seconds + 0.3 * float(seconds)
+
+    def _periodic_probability(self, now: datetime) -> float:
+        # Expected arrivals over [now, now + window] from the hour-of-week table
+        expected = 0.0
+        remaining = self.window
+        cursor = now
+        while remaining > 0:
+            hour_end = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            span = min(remaining, (hour_end - cursor).total_seconds())
+            rate = self._hourly_rate[cursor.weekday() * 24 + cursor.hour]
+            expected += rate * (span / 3600.0)
+            remaining -= span
+            cursor = hour_end
+        return 1.0 - math.exp(-expected)
+
+    def _burst_probability(self, now: datetime) -> float:
+        # P(next gap <= elapsed + window | gap > elapsed), from observed gaps
+        if self._last_arrival is None or not self._gaps:
+            return 0.0
+        elapsed = max(0.0, (now - self._last_arrival).total_seconds())
+        survivors = [g for g in self._gaps if g > elapsed]
+        if not survivors:
+            return 0.0
+        hits = sum(1 for g in survivors if g <= elapsed + self.window)
+        return hits / len(survivors)
+
+    # ---- Decision ----
+
+    def decide(self) -> Dict:
+        """Return keep-warm decision with the cost/latency trade-off behind it."""
+        self._maybe_rebuild()
+        now = time_utc()
+        with self._lock:
+            p_periodic = self._periodic_probability(now)
+            p_burst = self._burst_probability(now)
+            last_arrival = self._last_arrival
+            boot_seconds = self.boot_seconds
+        p_arrival = 1.0 - (1.0 - p_periodic) * (1.0 - p_burst)
+        idle_cost = self.hourly_cost * self.window / 3600.0
+        latency_saved = p_arrival * boot_seconds
+        latency_value = latency_saved / 3600.0 * self.latency_value
+        keep_warm = self.enabled and latency_value >= idle_cost
+        decision = {
+            "enabled": self.enabled,
+            "keep_warm": keep_warm,
+            "window_seconds": self.window,
+            "p_arrival": round(p_arrival, 4),
+            "p_periodic": round(p_periodic, 4),
+            "p_burst": round(p_burst, 4),
+            "idle_cost_usd": round(idle_cost, 4),
+            "boot_seconds": round(boot_seconds, 1),
+            "expected_latency_saved_seconds": round(latency_saved, 1),
+            "expected_latency_value_usd": round(latency_value, 4),
+            "last_arrival": last_arrival.isoformat() if last_arrival else None,
+            "decided_at": now.isoformat(),
+        }
+        with self._lock:
+            changed = keep_warm != self._last_decision.get("keep_warm")
+            self._last_decision = decision
+            self._decided_ts = time.time()
+        if changed:
+            logging.info(
+                f"[autoscale] keep_warm={keep_warm} p_arrival={p_arrival:.2f} "
+                f"saved~{latency_saved:.0f}s (${latency_value:.3f}) vs idle_cost=${idle_cost:.3f}/{self.window:.0f}s"
+            )
+        return decision
+
+    def cached_decision(self) -> Dict:
+        """The last decision while younger than decision_ttl, else a fresh one."""
+        with self._lock:
+            if self._last_decision and (time.time() - self._decided_ts) < self.decision_ttl:
+                return self._last_decision
+        return self.decide()
+
+    def should_keep_warm(self) -> bool:
+        if not self.enabled:
+            return False
+        try:
+            return bool(self.cached_decision().get("keep_warm"))
+        except Exception:
+            return False
+
+    def report(self) -> Dict:
+        return self.cached_decision()
+
+    # ---- Pre-start ----
+
+    def prestart(self, vast, arrival: bool = True) -> None:
+        """Start the instance in the background as soon as work is enqueued (or, with
+        arrival=False, is predicted), so ensure_instance_running finds it booting or running."""
+        if arrival:
+            self.note_arrival()
+        if not self.enabled or vast is None:
+            return
+        with self._lock:
+            if self._prestart_thread is not None and self._prestart_thread.is_alive():
+                return
+
+            def _run():
+                t0 = time.time()
+                try:
+                    vast.ensure_instance_running()
+                    # Consumed once, so a pre-start that found the instance running adds nothing
+                    take = getattr(vast, "take_boot_seconds", None)
+                    if take is not None:
+                        self.note_boot(take())
+                    logging.info(f"[autoscale] Pre-start finished in {time.time() - t0:.1f}s")
+                except Exception as e:
+                    logging.warning(f"[autoscale] Pre-start failed: {e}")
+
+            self._prestart_thread = threading.Thread(target=_run, name="vast_prestart", daemon=True)
+            self._prestart_thread.start()
+
+    def run_prestart_loop(self, get_vast, is_idle, stop_event, interval: float = 60.0) -> None:
+        """
+        Predictive pre-start: while nothing is queued, start a stopped instance when the
+        keep-warm rule says an arrival in the next window is worth a warm instance
+        (e.g. ahead of the usual morning burst). A running instance is left alone.
+        """
+        while not stop_event.wait(interval):
+            if not (self.enabled and self.predictive_prestart):
+                continue
+            try:
+                if not is_idle() or not self.cached_decision().get("keep_warm"):
+                    continue
+                vast = get_vast()
+                if vast.get_status() == "running":
+                    continue
+                logging.info("[autoscale] Arrival predicted; pre-starting the instance")
+                self.prestart(vast, arrival=False)
+            except Exception as e:
+                logging.debug(f"[autoscale] Predictive pre-start check failed: {e}")
@@ -6,8 +6,12 @@ import requests
 import random
 import threading
 import shlex
+import shutil
+import tempfile
 from typing import Tuple, Dict
 
+from . import profiling
+
 VAST_API_URL = "https://console.vast.ai/api/v0"
 
 class TokenBucket:
@@ -36,6 +40,97 @@ class TokenBucket:
             time.sleep(delay)
 
 
+class InstanceStateCache:
+    """Process-wide TTL cache for Vast instance details, shared by all VastManager objects.
+
+    - age <= ttl: served from cache; past the refresh-ahead point a background refresh starts
+    - ttl < age <= ttl + stale: stale entry served while a background refresh runs
+    - older, missing or invalidated: callers block on one in-flight fetch (singleflight)
+    A ttl <= 0 disables caching entirely.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, tuple[float, Dict]] = {}
+        self._inflight: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, fetch, ttl: float, stale: float, force: bool = False) -> Dict:
+        if ttl <= 0:
+            return fetch()
+        now = time.time()
+        with self._lock:
+            entry = None if force else self._entries.get(key)
+            age = (now - entry[0]) if entry else None
+            if entry and age <= ttl + stale:
+                if age > ttl * 0.75 and key not in self._inflight:
+                    self._inflight[key] = threading.Event()
+                    threading.Thread(target=self._refresh, args=(key, fetch), name=f"vast_refresh_{key}", daemon=True).start()
+                return entry[1]
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                self._inflight[key] = threading.Event()
+        if waiter is not None:
+            waiter.wait(timeout=60)
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry:
+                return entry[1]
+            return self.get(key, fetch, ttl, stale, force=force)
+        return self._refresh(key, fetch, raise_errors=True)
+
+    def _refresh(self, key: str, fetch, raise_errors: bool = False) -> Dict | None:
+        try:
+            data = fetch()
+            with self._lock:
+                self._entries[key] = (time.time(), data)
+            return data
+        except Exception:
+            # A failed refresh must not leave a stale "running" state behind
+            self.invalidate(key)
+            if raise_errors:
+                raise
+            return None
+        finally:
+            with self._lock:
+                ev = self._inflight.pop(key, None)
+            if ev is not None:
+                ev.set()
+
+    def invalidate(self, key: str | None = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(key), None)
+
+
+_instance_state = InstanceStateCache()
+
+
+# Upload-complete marker: after the atomic rename into the inbox, <file>.complete holding the
+# byte size is written next to it. The GPU server validates against it instead of waiting
+# for the file's mtime to settle.
+UPLOAD_MARKER_SUFFIX = ".complete"
+
+
+def upload_marker_cmd(remote_path: str, size: int) -> str:
+    """Shell snippet that writes the upload-complete marker for remote_path."""
+    return f"printf %s {int(size)} > {shlex.quote(remote_path + UPLOAD_MARKER_SUFFIX)}"
+
+
+def finalize_upload_cmd(remote_tmp: str, remote_path: str, size: int) -> str:
+    """Drop a stale marker, move the finished temp file into place, then mark it complete."""
+    marker = shlex.quote(remote_path + UPLOAD_MARKER_SUFFIX)
+    return (f"rm -f {marker} && mv -f {shlex.quote(remote_tmp)} {shlex.quote(remote_path)} && "
+            f"{upload_marker_cmd(remote_path, size)}")
+
+
+def write_upload_marker(path: str) -> None:
+    """Local-filesystem variant of upload_marker_cmd (LocalVastManager / local GPU)."""
+    with open(path + UPLOAD_MARKER_SUFFIX, "w") as f:
+        f.write(str(os.path.getsize(path)))
+
+
 def _cmd_to_str(cmd: list[str]) -> str:
     """Return a safely quoted shell string for a command list."""
     try:
@@ -50,9 +145,14 @@ def _cmd_to_str(cmd: list[str]) -> str:
 
 
 class VastManager:
+    # Subclasses that never call the Vast API (LocalVastManager) switch this off
+    requires_api_key = True
+    # True when "remote" paths are on this machine and transfers are plain file copies
+    is_local = False
+
     def __init__(self):
         self.api_key = os.getenv("VAST_API_KEY")
-        if not self.api_key:
+        if not self.api_key and self.requires_api_key:
             raise RuntimeError("VAST_API_KEY is not set in environment")
         # Optional override for upscale API base URL (e.g., http://127.0.0.1:18080)
         self.upscale_url_override = os.getenv("VAST_UPSCALE_URL") or None
@@ -75,6 +175,8 @@ class VastManager:
             self.http_timeout = float(os.getenv("VAST_HTTP_TIMEOUT", "10"))
         except Exception:
             self.http_timeout = 10.0
+        # Keep-alive session for the GPU server (submit + status polls reuse one connection)
+        self._http = requests.Session()
         # Rate limiter (env: VAST_RPS, VAST_BURST)
         try:
             rps = float(os.getenv("VAST_RPS", "0.5"))
@@ -85,18 +187,24 @@ class VastManager:
         except Exception:
             burst = 2
         self._rate_limit = TokenBucket(rate_per_sec=rps, burst=burst)
-        # Cache for instance details (env: VAST_DETAILS_TTL seconds)
+        # Cache for instance details (env: VAST_DETAILS_TTL seconds, shared across managers)
         try:
             self.details_ttl = float(os.getenv("VAST_DETAILS_TTL", "20"))
         except Exception:
             self.details_ttl = 20.0
-        self._details_cache: dict[str, tuple[float, Dict]] = {}
-        self._details_lock = threading.Lock()
+        # How long past the TTL a cached state may be served while it refreshes in background
+        try:
+            self.details_stale = float(os.getenv("VAST_DETAILS_STALE", "60"))
+        except Exception:
+            self.details_stale = 60.0
+        self._state_cache = _instance_state
         # Singleflight for ensure
         self._ensure_lock = threading.Lock()
         self._ensuring = False
         self._ensure_waiters: list[threading.Event] = []
         self._last_ensure_details: Dict | None = None
+        # Duration of the last cold start (start + wait for running), seconds
+        self.last_boot_seconds: float | None = None
         # Cooldown for stopping instance (env: VAST_STOP_COOLDOWN seconds)
         try:
             self.stop_cooldown = float(os.getenv("VAST_STOP_COOLDOWN", "120"))
@@ -198,6 +306,16 @@ class VastManager:
         if self.upscale_url_override or str(os.getenv("VAST_DISABLE_ENSURE", "")).lower() in ("1", "true", "yes"):
             self._last_ensure_details = {}
             return {}
+        # Hot path: a fresh (within TTL, never stale) running state answers without the Vast API
+        configured_id = self._configured_instance_id()
+        if configured_id and not self._ensuring:
+            try:
+                details = self.get_instance_details(configured_id, allow_stale=False)
+                if details.get("actual_status") == "running":
+                    self._last_ensure_details = details
+                    return details
+            except Exception:
+                pass
         # Singleflight gate
         with self._ensure_lock:
             if self._ensuring:
@@ -213,17 +331,18 @@ class VastManager:
             return self._last_ensure_details or {}
 
         try:
-            from .upscale_config import get_upscale_settings
-            settings = get_upscale_settings()
-            configured_id = settings.get("VAST_INSTANCE_ID") or None
+            configured_id = self._configured_instance_id()
             if not configured_id:
                 raise RuntimeError("VAST_INSTANCE_ID is not set in settings. Please set it in the Upscale settings UI.")
 
-            details = self.get_instance_details(configured_id)
+            details = self.get_instance_details(configured_id, allow_stale=False)
             if details.get("actual_status") != "running":
+                boot_started = time.time()
                 self.start_instance(configured_id)
                 self.wait_for_instance(configured_id, target_state="running", timeout=600)
-                details = self.get_instance_details(configured_id)
+                details = self.get_instance_details(configured_id, force=True)
+                with self._ensure_lock:
+                    self.last_boot_seconds = time.time() - boot_started
             # Cache for convenience, but always prefer settings next time
             self._save_cached_instance({"id": configured_id})
             self._last_ensure_details = details
@@ -236,22 +355,38 @@ class VastManager:
                     w.set()
                 self._ensure_waiters.clear()
 
-    def get_instance_details(self, instance_id: str) -> Dict:
-        # Cache lookup
-        now = time.time()
-        with self._details_lock:
-            cached = self._details_cache.get(str(instance_id))
-            if cached and (now - cached[0]) <= self.details_ttl:
-                return cached[1]
-        # Fetch
-        data = self._request_json(
-            "GET",
-            f"{VAST_API_URL}/instances/{instance_id}/",
-        )
-        norm = self._normalize_instance(data)
-        with self._details_lock:
-            self._details_cache[str(instance_id)] = (time.time(), norm)
-        return norm
+    def _configured_instance_id(self) -> str | None:
+        """Instance id from the upscale settings (the id ensure_instance_running manages)."""
+        from .upscale_config import get_upscale_settings
+        return get_upscale_settings().get("VAST_INSTANCE_ID") or None
+
+    def get_instance_details(self, instance_id: str, force: bool = False, allow_stale: bool = True) -> Dict:
+        """
+        Instance details via the shared TTL cache; force=True always hits the Vast API.
+        allow_stale=False refetches past the TTL instead of serving the stale window
+        (for decisions such as whether to start the instance).
+        """
+        def _fetch() -> Dict:
+            data = self._request_json(
+                "GET",
+                f"{VAST_API_URL}/instances/{instance_id}/",
+            )
+            return self._normalize_instance(data)
+        stale = self.details_stale if allow_stale else 0.0
+        return self._state_cache.get(str(instance_id), _fetch, ttl=self.details_ttl, stale=stale, force=force)
+
+    def take_boot_seconds(self) -> float | None:
+        """Duration of the last cold start that ensure_instance_running performed, reported once."""
+        with self._ensure_lock:
+            seconds, self.last_boot_seconds = self.last_boot_seconds, None
+        return seconds
+
+    def invalidate_instance_state(self, instance_id: str | None = None):
+        """Drop cached instance state (e.g. after SSH/HTTP errors) so the next ensure refetches it."""
+        if instance_id is None:
+            instance_id = self._configured_instance_id() or self._load_cached_instance().get("id")
+        self._state_cache.invalidate(str(instance_id) if instance_id else None)
+        self._last_ensure_details = None
 
     def start_instance(self, instance_id: str) -> Dict:
         data = self._request_json(
@@ -259,6 +394,7 @@ class VastManager:
             f"{VAST_API_URL}/instances/{instance_id}/",
             json={"state": "running"},
         )
+        self._state_cache.invalidate(str(instance_id))
         return self._normalize_instance(data)
 
     def stop_instance(self, instance_id: str) -> Dict:
@@ -267,6 +403,7 @@ class VastManager:
             f"{VAST_API_URL}/instances/{instance_id}/",
             json={"state": "stopped"},
         )
+        self._state_cache.invalidate(str(instance_id))
         return self._normalize_instance(data)
 
     def wait_for_instance(self, instance_id: str, target_state: str = "running", timeout: int = 600) -> bool:
@@ -277,7 +414,7 @@ class VastManager:
         start = time.time()
         while time.time() - start < timeout:
             try:
-                d = self.get_instance_details(instance_id)
+                d = self.get_instance_details(instance_id, force=True)
                 if d.get("actual_status") == target_state:
                     return True
             except Exception:
@@ -358,7 +495,7 @@ class VastManager:
             except Exception:
                 pass
             try:
-                r = subprocess.run(cmd, capture_output=True, text=True)
+                r = profiling.run(cmd, label="ssh_probe", capture_output=True, text=True)
                 if r.returncode == 0:
                     return True
             except Exception:
@@ -410,6 +547,36 @@ class VastManager:
             return f"http://{ip}:{mapped}"
         return f"http://{ip}:{internal_port}"
 
+    def http_base(self, inst: Dict) -> str:
+        """Base URL of the GPU HTTP API (override URL or the instance's mapped port 5000)."""
+        if self.upscale_url_override:
+            return self.upscale_url_override.rstrip('/')
+        return self._public_base_for_port(inst, 5000)
+
+    def ssh_argv(self, inst: Dict, remote_cmd: str) -> list[str]:
+        ssh_host, ssh_port, user = self._get_ssh_info(inst)
+        return ["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", remote_cmd]
+
+    def scp_upload_argv(self, inst: Dict, local_path: str, remote_path: str) -> list[str]:
+        ssh_host, ssh_port, user = self._get_ssh_info(inst)
+        return ["scp", "-P", str(ssh_port), *self._ssh_common_opts(), local_path, f"{user}@{ssh_host}:{remote_path}"]
+
+    def scp_download_argv(self, inst: Dict, remote_path: str, local_path: str) -> list[str]:
+        ssh_host, ssh_port, user = self._get_ssh_info(inst)
+        return ["scp", "-P", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}:{remote_path}", local_path]
+
+    def remote_upscale_dirs(self, inst: Dict) -> list[tuple[str, str]]:
+        """Candidate (inbox, outbox) pairs in order of preference."""
+        inbox_override = os.getenv("VAST_REMOTE_INBOX")
+        outbox_override = os.getenv("VAST_REMOTE_OUTBOX")
+        if inbox_override and outbox_override:
+            candidates = [(inbox_override.rstrip("/"), outbox_override.rstrip("/"))]
+        else:
+            upbase = f"{self._remote_base_dir(inst)}/upscale"
+            candidates = [(f"{upbase}/inbox", f"{upbase}/outbox")]
+        candidates += [("/app/upscale/inbox", "/app/upscale/outbox"), ("~/upscale/inbox", "~/upscale/outbox")]
+        return candidates
+
     def upload_and_plan_paths(self, inst: Dict, local_path: str) -> Tuple[str, str]:
         """
         Upload local file to instance inbox and plan output path.
@@ -456,7 +623,7 @@ class VastManager:
                 print(f"[upscale][debug] mkdir cmd: {_cmd_to_str(cmd)}")
             except Exception:
                 pass
-            r = subprocess.run(cmd, capture_output=True, text=True)
+            r = profiling.run(cmd, label="ssh_mkdir", capture_output=True, text=True)
             if r.returncode != 0:
                 print(f"[upscale] mkdir failed on remote: {r.stderr or r.stdout}")
             return r.returncode == 0
@@ -506,7 +673,7 @@ class VastManager:
         except Exception:
             pass
         print(f"[upscale] scp upload to temp: {user}@{ssh_host}:{remote_tmp}")
-        result = subprocess.run(scp_cmd, capture_output=True, text=True)
+        result = profiling.run(scp_cmd, label="scp_upload", inputs=[local_path], capture_output=True, text=True)
         # Mark activity
         self._last_activity_ts = time.time()
         if result.returncode != 0:
@@ -520,10 +687,10 @@ class VastManager:
             print(f"[upscale][debug] remote size cmd: {_cmd_to_str(size_cmd)}")
         except Exception:
             pass
-        sz = subprocess.run(size_cmd, capture_output=True, text=True)
+        sz = profiling.run(size_cmd, label="ssh_stat", capture_output=True, text=True)
         if sz.returncode != 0:
             # Clean up temp on failure
-            subprocess.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], capture_output=True, text=True)
+            profiling.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], label="ssh_cleanup", capture_output=True, text=True)
             raise RuntimeError(f"Remote size check failed for {remote_tmp}: {sz.stderr or sz.stdout}")
         try:
             remote_size = int(sz.stdout.strip())
@@ -537,13 +704,13 @@ class VastManager:
         if remote_size != local_size_after:
             # Small grace: retry reading remote size once after 1s
             time.sleep(1.0)
-            sz2 = subprocess.run(size_cmd, capture_output=True, text=True)
+            sz2 = profiling.run(size_cmd, label="ssh_stat", capture_output=True, text=True)
             try:
                 remote_size2 = int((sz2.stdout or '').strip()) if sz2.returncode == 0 else remote_size
             except Exception:
                 remote_size2 = remote_size
             if remote_size2 != local_size_after:
-                subprocess.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], capture_output=True, text=True)
+                profiling.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], label="ssh_cleanup", capture_output=True, text=True)
                 raise RuntimeError(f"Remote file size mismatch: local={local_size_after} bytes, remote={remote_size2} bytes")
         # Validate video readability via ffprobe on remote
         probe_cmd = [
@@ -554,35 +721,28 @@ class VastManager:
             print(f"[upscale][debug] ffprobe cmd: {_cmd_to_str(probe_cmd)}")
         except Exception:
             pass
-        probe = subprocess.run(probe_cmd, capture_output=True, text=True)
+        probe = profiling.run(probe_cmd, label="ssh_ffprobe", capture_output=True, text=True)
         if probe.returncode != 0:
             # Print detailed probe error (stderr) and cleanup
             err = probe.stderr or probe.stdout
-            subprocess.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], capture_output=True, text=True)
+            profiling.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], label="ssh_cleanup", capture_output=True, text=True)
             raise RuntimeError(f"ffprobe failed on uploaded file: {err}")
-        # Atomically move temp to final inbox path
-        mv_cmd = ["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"mv -f {shlex.quote(remote_tmp)} {shlex.quote(remote_in)}"]
+        # Atomically move temp to final inbox path and leave the upload-complete marker
+        mv_cmd = ["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", finalize_upload_cmd(remote_tmp, remote_in, local_size_after)]
         try:
             print(f"[upscale][debug] move cmd: {_cmd_to_str(mv_cmd)}")
         except Exception:
             pass
-        mv = subprocess.run(mv_cmd, capture_output=True, text=True)
+        mv = profiling.run(mv_cmd, label="ssh_mv", capture_output=True, text=True)
         if mv.returncode != 0:
             # Best-effort cleanup
-            subprocess.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], capture_output=True, text=True)
+            profiling.run(["ssh", "-p", str(ssh_port), *self._ssh_common_opts(), f"{user}@{ssh_host}", f"rm -f {shlex.quote(remote_tmp)}"], label="ssh_cleanup", capture_output=True, text=True)
             raise RuntimeError(f"Failed to move uploaded file into inbox: {mv.stderr or mv.stdout}")
         print(f"[upscale] upload validated and moved into inbox: {remote_in}")
         return remote_in, remote_out
 
-    def submit_job(self, inst: Dict, remote_in: str, remote_out: str) -> str:
-        if self.upscale_url_override:
-            url = self.upscale_url_override.rstrip('/') + "/upscale"
-        else:
-            base = self._public_base_for_port(inst, 5000)
-            if not base:
-                raise RuntimeError("Instance public IP not found")
-            url = f"{base}/upscale"
-        payload = {
+    def job_payload(self, remote_in: str, remote_out: str) -> Dict:
+        return {
             "input_path": remote_in,
             "output_path": remote_out,
             "model_name": self.model_name,
@@ -590,19 +750,22 @@ class VastManager:
             "face_enhance": self.face_enhance,
             "outscale": self.outscale,
         }
-        r = requests.post(url, json=payload, timeout=30)
+
+    def submit_job(self, inst: Dict, remote_in: str, remote_out: str) -> str:
+        base = self.http_base(inst)
+        if not base:
+            raise RuntimeError("Instance public IP not found")
+        url = f"{base}/upscale"
+        payload = self.job_payload(remote_in, remote_out)
+        r = self._http.post(url, json=payload, timeout=30)
         if r.status_code not in (200, 202):
             raise RuntimeError(f"Failed to submit job: {r.text}")
         data = r.json()
         return str(data.get("job_id"))
 
     def job_status(self, inst: Dict, job_id: str) -> str:
-        if self.upscale_url_override:
-            base = self.upscale_url_override.rstrip('/')
-            r = requests.get(f"{base}/job/{job_id}", timeout=10)
-        else:
-            base = self._public_base_for_port(inst, 5000)
-            r = requests.get(f"{base}/job/{job_id}", timeout=10)
+        base = self.http_base(inst)
+        r = self._http.get(f"{base}/job/{job_id}", timeout=10)
         if r.status_code != 200:
             return "failed"
         data = r.json()
@@ -618,7 +781,7 @@ class VastManager:
             print(f"[upscale][debug] scp download cmd: {_cmd_to_str(scp_cmd)}")
         except Exception:
             pass
-        result = subprocess.run(scp_cmd, capture_output=True, text=True)
+        result = profiling.run(scp_cmd, label="scp_download", outputs=[local_path], capture_output=True, text=True)
         # Mark activity
         self._last_activity_ts = time.time()
         if result.returncode != 0:
@@ -646,7 +809,7 @@ class VastManager:
         if resize:
             payload["resize"] = True
             payload["aspect_ratio"] = list(aspect_ratio)
-        r = requests.post(f"{base}/cut_url", json=payload, timeout=30)
+        r = self._http.post(f"{base}/cut_url", json=payload, timeout=30)
         if r.status_code not in (200, 202):
             raise RuntimeError(f"Failed to submit cut job: {r.text}")
         data = r.json()
@@ -657,7 +820,7 @@ class VastManager:
             base = self.upscale_url_override.rstrip('/')
         else:
             base = self._public_base_for_port(inst, 5000)
-        r = requests.get(f"{base}/cut_job/{job_id}", timeout=15)
+        r = self._http.get(f"{base}/cut_job/{job_id}", timeout=15)
         if r.status_code != 200:
             return {"status": "failed"}
         return r.json()
@@ -731,3 +894,100 @@ class VastManager:
             return d.get("actual_status") or "unknown"
         except Exception:
             return "unknown"
+
+
+class LocalVastManager(VastManager):
+    """
+    Backend for a GPU server running on this machine in fake mode
+    (FAKE_GPU=1 python upscale/vastai_deployment/server.py).
+
+    No Vast API and no SSH: the HTTP API lives at LOCAL_GPU_URL and the "remote"
+    inbox/outbox/cut dirs are under LOCAL_GPU_ROOT, so uploads and downloads are file
+    copies (optionally throttled to LOCAL_GPU_LINK_MBPS to mimic the network).
+    """
+    requires_api_key = False
+    is_local = True
+
+    def __init__(self):
+        super().__init__()
+        self.root = os.path.abspath(os.getenv("LOCAL_GPU_ROOT") or os.path.join(tempfile.gettempdir(), "aporto_fake_gpu"))
+        self.upscale_url_override = (os.getenv("LOCAL_GPU_URL") or "http://127.0.0.1:5000").rstrip("/")
+        try:
+            self.link_mbps = float(os.getenv("LOCAL_GPU_LINK_MBPS", "0"))
+        except Exception:
+            self.link_mbps = 0.0
+        self.disable_auto_stop = True
+
+    def _copy(self, src: str, dst: str) -> None:
+        t0 = time.time()
+        tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.part")
+        shutil.copyfile(src, tmp)
+        if os.path.getsize(tmp) != os.path.getsize(src):
+            os.remove(tmp)
+            raise RuntimeError(f"Local copy size mismatch: {src} -> {dst}")
+        if self.link_mbps > 0:
+            remaining = os.path.getsize(src) / (1024 * 1024) / self.link_mbps - (time.time() - t0)
+            if remaining > 0:
+                time.sleep(remaining)
+        os.replace(tmp, dst)
+        self._last_activity_ts = time.time()
+
+    def ensure_instance_running(self) -> Dict:
+        self._last_ensure_details = {"id": "local", "actual_status": "running"}
+        return self._last_ensure_details
+
+    def get_instance_details(self, instance_id: str, force: bool = False, allow_stale: bool = True) -> Dict:
+        return {"id": "local", "actual_status": "running"}
+
+    def invalidate_instance_state(self, instance_id: str | None = None):
+        self._last_ensure_details = None
+
+    def start_instance(self, instance_id: str) -> Dict:
+        return {}
+
+    def stop_instance(self, instance_id: str) -> Dict:
+        return {}
+
+    def stop_instance_if_idle(self):
+        pass
+
+    def get_status(self) -> str:
+        return "running"
+
+    def http_base(self, inst: Dict) -> str:
+        return self.upscale_url_override
+
+    def remote_upscale_dirs(self, inst: Dict) -> list[tuple[str, str]]:
+        return [(os.path.join(self.root, "upscale", "inbox"), os.path.join(self.root, "upscale", "outbox"))]
+
+    def _cut_remote_dirs(self, inst: Dict) -> tuple[str, str]:
+        return os.path.join(self.root, "cut", "to_cut"), os.path.join(self.root, "cut", "cuted")
+
+    def upload_and_plan_paths(self, inst: Dict, local_path: str) -> Tuple[str, str]:
+        filename = os.path.basename(os.path.normpath(local_path))
+        if not filename or not os.path.isfile(local_path):
+            raise RuntimeError(f"Invalid local_path: {local_path}")
+        inbox, outbox = self.remote_upscale_dirs(inst)[0]
+        os.makedirs(inbox, exist_ok=True)
+        os.makedirs(outbox, exist_ok=True)
+        remote_in = os.path.join(inbox, filename)
+        self._copy(local_path, remote_in)
+        write_upload_marker(remote_in)
+        return remote_in, os.path.join(outbox, filename)
+
+    def download_result(self, inst: Dict, remote_out: str, local_dir: str) -> str:
+        os.makedirs(local_dir, exist_ok=True)
+        local_path = os.path.join(local_dir, os.path.basename(remote_out))
+        if not os.path.isfile(remote_out):
+            raise RuntimeError(f"Result not found: {remote_out}")
+        self._copy(remote_out, local_path)
+        return os.path.abspath(local_path)
+
+
+def vast_backend() -> str:
+    """VAST_BACKEND: vast (default, real instance over API + SSH) | local (fake GPU server on this machine)."""
+    return (os.getenv("VAST_BACKEND") or "vast").strip().lower()
+
+
+def create_vast_manager() -> VastManager:
+    return LocalVastManager() if vast_backend() == "local" else VastManager()
@@ -7,6 +7,14 @@ from .db import engine
 from .ytdlp_wrapper import download_video, download_video_simple
 from .ffmpeg_wrapper import process_video
 from .auto_pipeline import AutoPipeline
+from .progress import progress_aggregator
+from .stats import queue_stats
+from . import metrics
+from . import timeline
+from . import profiling
+from .upscale_vast import vast_backend, finalize_upload_cmd, write_upload_marker
+from .ingest import DirectoryIngest
+from concurrent.futures import ThreadPoolExecutor
 import shutil
 import requests
 import subprocess
@@ -31,7 +39,9 @@ def _is_local_stable(path: str, checks: int = 3, interval: float = 1.0, timeout:
         time.sleep(interval)
     return checks == 0
 import os
+import json
 import time
+import hashlib
 from datetime import datetime, timezone, timedelta
 import threading
 import os
@@ -104,6 +114,22 @@ _result_dl_sem = threading.Semaphore(get_result_download_concurrency())
 stop_event = Event()
 
 
+def orchestrator_mode() -> str:
+    """ORCHESTRATOR_MODE: threads (default) | async (asyncio upscale core) | external (python -m app.async_worker)"""
+    return (os.getenv("ORCHESTRATOR_MODE") or "threads").strip().lower()
+
+
+def _queue_upscale(task_id: int) -> None:
+    """
+    Hand a QUEUED upscale task to the upload stage. With ORCHESTRATOR_MODE=external the
+    core runs in another process and picks QUEUED rows up from the DB, so the row is
+    the hand-off and nothing is put on this process's queue.
+    """
+    if orchestrator_mode() == "external":
+        return
+    upload_upscale_queue.put(task_id)
+
+
 def enqueue_pending_from_db():
     with Session(engine) as session:
         status_and_queue = (
@@ -128,8 +154,19 @@ def enqueue_pending_from_db():
         session.commit()
 
 
+def _gpu_local() -> bool:
+    """VAST_BACKEND=local: the GPU server runs here in fake mode and 'remote' paths are local."""
+    return vast_backend() == "local"
+
+
+# Keep-alive session for cut submit/status polls against the GPU server
+_gpu_http = requests.Session()
+
+
 def _gpu_http_base() -> str:
     base = os.getenv('VAST_UPSCALE_URL') or ''
+    if not base and _gpu_local():
+        base = get_vast().http_base({})
     return base.rstrip('/')
 
 def _gpu_cut_submit(input_path: str, url: str, model_size: str, resize: bool, aspect_ratio=(9,16), to_dir: str | None = None, out_dir: str | None = None, title: str | None = None) -> str:
@@ -153,7 +190,7 @@ def _gpu_cut_submit(input_path: str, url: str, model_size: str, resize: bool, as
     logging.info(f"[GPU-CUT] Payload: {payload}")
     
     try:
-        r = requests.post(f"{base}/cut_url", json=payload, timeout=30)
+        r = _gpu_http.post(f"{base}/cut_url", json=payload, timeout=30)
         logging.info(f"[GPU-CUT] Response status: {r.status_code}")
         logging.info(f"[GPU-CUT] Response body: {r.text[:500]}")
     except Exception as e:
@@ -174,7 +211,7 @@ def _gpu_cut_status(job_id: str) -> dict:
     logging.debug(f"[GPU-CUT] Checking status for job_id={job_id} at {base}/cut_job/{job_id}")
     
     try:
-        r = requests.get(f"{base}/cut_job/{job_id}", timeout=15)
+        r = _gpu_http.get(f"{base}/cut_job/{job_id}", timeout=15)
         logging.debug(f"[GPU-CUT] Status check response: status_code={r.status_code}")
         if r.status_code != 200:
             logging.warning(f"[GPU-CUT] Status check failed with code {r.status_code}: {r.text[:200]}")
@@ -216,7 +253,7 @@ def _gpu_ssh_exec(cmd: str) -> None:
         logging.info(f"[gpu-ssh] exec cmd: {full_cmd}")
     except Exception:
         logging.info(f"[gpu-ssh] exec: {cmd}")
-    r = subprocess.run(ssh_cmd, capture_output=True, text=True, timeout=60)
+    r = profiling.run(ssh_cmd, label="ssh", capture_output=True, text=True, timeout=60)
     if r.returncode != 0:
         raise RuntimeError(f"ssh failed: {r.stderr or r.stdout}")
 
@@ -226,15 +263,27 @@ def _gpu_ensure_dirs(remote_dir: str) -> None:
     base = remote_dir.rstrip('/')
     parent = os.path.dirname(base)
     cuted = os.path.join(parent, 'cuted')
+    if _gpu_local():
+        os.makedirs(base, exist_ok=True)
+        os.makedirs(cuted, exist_ok=True)
+        return
     _gpu_ssh_exec(f"mkdir -p {shlex.quote(base)} {shlex.quote(cuted)}")
 
 
 def _gpu_scp_upload(local_path: str, remote_dir: str) -> str:
+    if _gpu_local():
+        _gpu_ensure_dirs(remote_dir)
+        remote_path = os.path.join(remote_dir, os.path.basename(local_path))
+        get_vast()._copy(local_path, remote_path)
+        write_upload_marker(remote_path)
+        return remote_path
     host, port, user, key = _gpu_ssh_params()
     if not host:
         raise RuntimeError('VAST_SSH_HOST (or GPU_SSH_HOST) is not set')
     filename = os.path.basename(local_path)
     remote_path = f"{remote_dir.rstrip('/')}/{filename}"
+    # Upload under a temp name; finalize_upload_cmd renames it and writes the .complete marker
+    remote_tmp = f"{remote_dir.rstrip('/')}/.{filename}.part"
     # Ensure remote directories exist
     _gpu_ensure_dirs(remote_dir)
     scp_cmd = ['scp', '-P', str(port),
@@ -243,7 +292,7 @@ def _gpu_scp_upload(local_path: str, remote_dir: str) -> str:
                '-o', 'ConnectTimeout=15']
     if key:
         scp_cmd += ['-i', key]
-    scp_cmd += [local_path, f"{user}@{host}:{remote_path}"]
+    scp_cmd += [local_path, f"{user}@{host}:{remote_tmp}"]
     try:
         full_cmd = shlex.join(scp_cmd)
         key_exists = (os.path.isfile(key) if key else False)
@@ -253,19 +302,22 @@ def _gpu_scp_upload(local_path: str, remote_dir: str) -> str:
         logging.info(f"[gpu-scp] upload -> {remote_path}")
     
     logging.info(f"[gpu-scp] Starting upload of {os.path.basename(local_path)} ({os.path.getsize(local_path)} bytes)...")
-    r = subprocess.run(scp_cmd, capture_output=True, text=True, timeout=600)
+    r = profiling.run(scp_cmd, label="scp_upload", inputs=[local_path], capture_output=True, text=True, timeout=600)
     
     if r.returncode != 0:
         logging.error(f"[gpu-scp] Upload FAILED with return code {r.returncode}")
         logging.error(f"[gpu-scp] STDERR: {r.stderr}")
         logging.error(f"[gpu-scp] STDOUT: {r.stdout}")
         raise RuntimeError(f"scp upload failed: {r.stderr or r.stdout}")
+    _gpu_ssh_exec(finalize_upload_cmd(remote_tmp, remote_path, os.path.getsize(local_path)))
     
     logging.info(f"[gpu-scp] Upload completed successfully: {remote_path}")
     return remote_path
 
 
 def _gpu_scp_download(remote_path: str, local_dir: str) -> str:
+    if _gpu_local():
+        return get_vast().download_result({}, remote_path, local_dir)
     host, port, user, key = _gpu_ssh_params()
     os.makedirs(local_dir, exist_ok=True)
     filename = os.path.basename(remote_path)
@@ -286,7 +338,7 @@ def _gpu_scp_download(remote_path: str, local_dir: str) -> str:
         logging.info(f"[gpu-scp] download <- {remote_path}")
     
     logging.info(f"[gpu-scp] Starting download of {os.path.basename(remote_path)}...")
-    r = subprocess.run(scp_cmd, capture_output=True, text=True, timeout=600)
+    r = profiling.run(scp_cmd, label="scp_download", outputs=[local_path], capture_output=True, text=True, timeout=600)
     
     if r.returncode != 0:
         logging.error(f"[gpu-scp] Download FAILED with return code {r.returncode}")
@@ -297,13 +349,104 @@ def _gpu_scp_download(remote_path: str, local_dir: str) -> str:
     logging.info(f"[gpu-scp] Download completed successfully: {local_path} ({os.path.getsize(local_path)} bytes)")
     return local_path
 
+class _CutDelivery:
+    """
+    Incremental delivery of one GPU cut job: every manifest entry reported 'ready' by
+    /cut_job/<id> is downloaded once, checked against its size/sha256, and each clip gets its
+    Clip row as soon as both the clip and <safe>_clips.json are local.
+    """
+
+    def __init__(self, task_id: int, local_base: str):
+        self.task_id = task_id
+        self.local_base = local_base
+        self.local: dict[str, str] = {}          # manifest name -> local path
+        self.clip_files: dict[int, str] = {}     # clip number -> local path
+        self.clips_data: list | None = None
+        self.saved: set[int] = set()
+        self.dest_dir: str | None = None
+        self.transcript_path: str | None = None
+        self.clips_json_path: str | None = None
+        self._pipeline = None
+
+    def _fetch(self, entry: dict) -> str:
+        local_dir = os.path.join(self.local_base, os.path.dirname(entry["name"]))
+        for attempt in (1, 2):
+            with metrics.stage_timer("result_download"):
+                path = _gpu_scp_download(entry["path"], local_dir)
+            if _matches_manifest(path, entry):
+                break
+            logging.warning(f"[task-{self.task_id}] {entry['name']} does not match its manifest size/checksum (attempt {attempt})")
+        else:
+            raise RuntimeError(f"Downloaded {entry['name']} does not match the GPU manifest")
+        size = metrics.file_size(path)
+        metrics.add_bytes("download", size)
+        timeline.record_bytes("cut", self.task_id, "downloading_results", size)
+        return path
+
+    def sync(self, manifest: list) -> None:
+        for entry in manifest:
+            if entry.get("status") != "ready" or entry["name"] in self.local:
+                continue
+            path = self._fetch(entry)
+            self.local[entry["name"]] = path
+            self.dest_dir = self.dest_dir or os.path.dirname(path)
+            kind = entry.get("kind")
+            if kind == "transcript":
+                self.transcript_path = path
+            elif kind == "clips_json":
+                self.clips_json_path = path
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    self.clips_data = data if isinstance(data, list) else []
+                except Exception as e:
+                    logging.error(f"[task-{self.task_id}] Failed to read {path}: {e}")
+                    self.clips_data = []
+            elif kind == "clip" and entry.get("index") is not None:
+                self.clip_files[int(entry["index"])] = path
+        self._save_ready_clips()
+
+    def _save(self, clip_data: dict, file_path: str | None) -> None:
+        if self._pipeline is None:
+            # Temporary instance just for the save_clip_to_db method
+            self._pipeline = AutoPipeline.__new__(AutoPipeline)
+        self._pipeline.save_clip_to_db(self.task_id, clip_data, file_path, unique=True)
+        self.saved.add(clip_data.get("short_id", 0))
+
+    def _save_ready_clips(self) -> None:
+        if self.clips_data is None:
+            return
+        for clip_data in self.clips_data:
+            short_id = clip_data.get("short_id", 0)
+            if short_id not in self.saved and short_id in self.clip_files:
+                self._save(clip_data, self.clip_files[short_id])
+
+    def finish(self) -> None:
+        """Job completed: clips the GPU did not produce still get their row (without a file), as before."""
+        for clip_data in self.clips_data or []:
+            if clip_data.get("short_id", 0) not in self.saved:
+                self._save(clip_data, self.clip_files.get(clip_data.get("short_id", 0)))
+
+
+def _matches_manifest(path: str, entry: dict) -> bool:
+    if entry.get("size") is not None and metrics.file_size(path) != entry["size"]:
+        return False
+    if entry.get("sha256"):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        return h.hexdigest() == entry["sha256"]
+    return True
+
+
 def download_worker():
     while not stop_event.is_set():
         try:
             task_id = download_queue.get(timeout=0.5)
         except Empty:
             continue
-        with Session(engine) as session:
+        with Session(engine) as session, profiling.task_scope("cut", task_id):
             task = session.get(Task, task_id)
             if not task:
                 download_queue.task_done()
@@ -323,7 +466,8 @@ def download_worker():
                     session.commit()
 
                     logging.info(f"[task-{task_id}] Starting video download...")
-                    video_id, title, file_path = download_video_simple(task.url, RAW_DIR)
+                    with metrics.stage_timer("download"):
+                        video_id, title, file_path = download_video_simple(task.url, RAW_DIR)
                     logging.info(f"[task-{task_id}] Video downloaded: video_id={video_id}, title={title}, path={file_path}")
                     task.video_id = video_id
                     task.original_filename = title
@@ -339,9 +483,13 @@ def download_worker():
                         pass
 
                     # Plan remote dirs
-                    base = os.getenv('VAST_CUT_BASE_DIR') or os.getenv('GPU_CUT_BASE_DIR') or '/workspace/cut'
-                    to_dir = f"{base.rstrip('/')}/to_cut"
-                    out_dir = f"{base.rstrip('/')}/cuted"
+                    if _gpu_local():
+                        to_dir, out_dir = get_vast()._cut_remote_dirs({})
+                        base = os.path.dirname(to_dir)
+                    else:
+                        base = os.getenv('VAST_CUT_BASE_DIR') or os.getenv('GPU_CUT_BASE_DIR') or '/workspace/cut'
+                        to_dir = f"{base.rstrip('/')}/to_cut"
+                        out_dir = f"{base.rstrip('/')}/cuted"
                     logging.info(f"[task-{task_id}] Remote dirs: base={base}, to_dir={to_dir}, out_dir={out_dir}")
 
                     # Upload to GPU
@@ -350,7 +498,10 @@ def download_worker():
                     session.add(task)
                     session.commit()
                     logging.info(f"[task-{task_id}] Starting GPU upload: {file_path} -> {to_dir}")
-                    remote_input = _gpu_scp_upload(file_path, to_dir)
+                    with metrics.stage_timer("upload"):
+                        remote_input = _gpu_scp_upload(file_path, to_dir)
+                    metrics.add_bytes("upload", metrics.file_size(file_path))
+                    timeline.record_bytes("cut", task.id, "uploading_gpu", metrics.file_size(file_path))
                     logging.info(f"[task-{task_id}] GPU upload completed: remote_input={remote_input}")
 
                     # Submit GPU cut job with direct input_path
@@ -380,22 +531,53 @@ def download_worker():
                     session.commit()
                     logging.info(f"[task-{task_id}] Entering polling loop for job_id={job_id}")
 
-                    # Poll
+                    # Poll; clips listed as ready in the job manifest are pulled (and their Clip rows
+                    # inserted) while the GPU is still working on the rest
+                    delivery = _CutDelivery(task.id, os.path.abspath(os.path.join(BASE_DIR, "cuted")))
                     last_pct = 30
                     poll_count = 0
+                    remote_t0 = time.time()
                     while True:
                         poll_count += 1
                         logging.debug(f"[task-{task_id}] Polling status (attempt #{poll_count})...")
                         info = _gpu_cut_status(job_id)
                         st = info.get("status")
                         logging.info(f"[task-{task_id}] Status poll #{poll_count}: status={st}, info={info}")
-                        if st == "processing":
+                        if st in ("validating", "processing"):
                             last_pct = min(last_pct + 3, 85)
-                            task.progress = last_pct
+                            progress_aggregator.update(Task, task.id, progress=last_pct, updated_at=time_utc())
+                            if info.get("manifest"):
+                                saved_before = len(delivery.saved)
+                                delivery.sync(info["manifest"])
+                                if len(delivery.saved) > saved_before:
+                                    if not saved_before:
+                                        metrics.observe_stage("first_clip", time.time() - remote_t0)
+                                    logging.info(f"[task-{task_id}] {len(delivery.saved)} clip(s) delivered while the job runs")
+                                    if not task.clips_dir:
+                                        task.clips_dir = delivery.dest_dir
+                                        session.add(task)
+                                        session.commit()
+                            time.sleep(5)
+                        elif st == "completed" and info.get("manifest") is not None:
+                            logging.info(f"[task-{task_id}] Job completed; fetching the remaining manifest entries")
+                            progress_aggregator.discard(Task, task.id)
+                            task.stage = "downloading_results"
+                            task.progress = 90
+                            session.add(task)
+                            session.commit()
+                            metrics.observe_stage("gpu_job", time.time() - remote_t0)
+                            delivery.sync(info["manifest"])
+                            delivery.finish()
+                            task.clips_dir = delivery.dest_dir
+                            task.transcript_path = delivery.transcript_path
+                            task.clips_json_path = delivery.clips_json_path
+                            task.status = TaskStatus.DONE
+                            task.stage = "done"
+                            task.progress = 100
                             task.updated_at = time_utc()
                             session.add(task)
                             session.commit()
-                            time.sleep(5)
+                            break
                         elif st == "completed":
                             remote_zip = info.get("output_archive")
                             logging.info(f"[task-{task_id}] Job completed! output_archive={remote_zip}")
@@ -405,11 +587,16 @@ def download_worker():
                             # Download archive to local cuted dir
                             local_cuted_base = os.path.abspath(os.path.join(BASE_DIR, "cuted"))
                             os.makedirs(local_cuted_base, exist_ok=True)
+                            progress_aggregator.discard(Task, task.id)
                             task.stage = "downloading_results"
                             task.progress = 90
                             session.add(task)
                             session.commit()
-                            local_zip = _gpu_scp_download(remote_zip, local_cuted_base)
+                            metrics.observe_stage("gpu_job", time.time() - remote_t0)
+                            with metrics.stage_timer("result_download"):
+                                local_zip = _gpu_scp_download(remote_zip, local_cuted_base)
+                            metrics.add_bytes("download", metrics.file_size(local_zip))
+                            timeline.record_bytes("cut", task.id, "downloading_results", metrics.file_size(local_zip))
                             # Unzip into folder
                             import zipfile
                             base_name = os.path.splitext(os.path.basename(local_zip))[0]
@@ -470,7 +657,8 @@ def download_worker():
                         session.add(task)
                         session.commit()
 
-                        video_id, title, file_path = download_video_simple(task.url, RAW_DIR)
+                        with metrics.stage_timer("download"):
+                            video_id, title, file_path = download_video_simple(task.url, RAW_DIR)
                         task.video_id = video_id
                         task.original_filename = title
                         task.downloaded_path = file_path
@@ -496,6 +684,7 @@ def download_worker():
                         raise RuntimeError("Cut processing is GPU-only. Start the GPU server and retry.")
             except Exception as e:
                 logging.error(f"[task-{task_id}] EXCEPTION in download_worker: {type(e).__name__}: {e}", exc_info=True)
+                progress_aggregator.discard(Task, task.id)
                 task.error = str(e)
                 task.status = TaskStatus.ERROR
                 task.stage = "error"
@@ -515,7 +704,7 @@ def process_worker():
             task_id = process_queue.get(timeout=0.5)
         except Empty:
             continue
-        with Session(engine) as session:
+        with Session(engine) as session, profiling.task_scope("cut", task_id):
             task = session.get(Task, task_id)
             if not task:
                 process_queue.task_done()
@@ -550,7 +739,8 @@ def process_worker():
                     session.add(task)
                     session.commit()
                     transcript_path = os.path.join(out_dir, f"{base_name}_transcript.json")
-                    transcript = auto_pipeline.transcribe_video(task.downloaded_path, transcript_path)
+                    with metrics.stage_timer("transcribe"):
+                        transcript = auto_pipeline.transcribe_video(task.downloaded_path, transcript_path)
 
                     # 2) Ask GPT
                     task.stage = "gpt"
@@ -559,7 +749,8 @@ def process_worker():
                     session.add(task)
                     session.commit()
                     clips_json_path = os.path.join(out_dir, f"{base_name}_clips.json")
-                    clips = auto_pipeline.ask_gpt(transcript, clips_json_path, video_title=task.original_filename)
+                    with metrics.stage_timer("gpt"):
+                        clips = auto_pipeline.ask_gpt(transcript, clips_json_path, video_title=task.original_filename)
 
                     # 3) Cut clips
                     total = max(len(clips), 1)
@@ -572,15 +763,11 @@ def process_worker():
                     def on_progress(i: int, total_clips: int):
                         # Прогресс от 80 до 100 в зависимости от продвинутых клипов
                         pct = 80 + int((i / max(total_clips, 1)) * 20)
-                        with Session(engine) as ses2:
-                            t2 = ses2.get(Task, task.id)
-                            if t2:
-                                t2.progress = min(pct, 99)
-                                t2.updated_at = time_utc()
-                                ses2.add(t2)
-                                ses2.commit()
-
-                    clip_files = auto_pipeline.cut_clips(task.downloaded_path, clips, out_dir, on_progress=on_progress)
+                        progress_aggregator.update(Task, task.id, progress=min(pct, 99), updated_at=time_utc())
+
+                    with metrics.stage_timer("cut"):
+                        clip_files = auto_pipeline.cut_clips(task.downloaded_path, clips, out_dir, on_progress=on_progress)
+                    progress_aggregator.discard(Task, task.id)
                     
                     # Save clips to database
                     auto_pipeline.save_clips_to_db(task.id, clips, clip_files)
@@ -602,7 +789,8 @@ def process_worker():
                     task.updated_at = time_utc()
                     session.add(task)
                     session.commit()
-                    output_path = process_video(task.downloaded_path, PROCESSED_DIR, task.start_time, task.end_time)
+                    with metrics.stage_timer("cut"):
+                        output_path = process_video(task.downloaded_path, PROCESSED_DIR, task.start_time, task.end_time)
                     task.processed_path = output_path
                     task.status = TaskStatus.DONE
                     task.stage = "done"
@@ -612,6 +800,7 @@ def process_worker():
                 session.add(task)
                 session.commit()
             except Exception as e:
+                progress_aggregator.discard(Task, task.id)
                 task.error = str(e)
                 task.status = TaskStatus.ERROR
                 task.stage = "error"
@@ -635,17 +824,17 @@ def queue_healthcheck_worker():
     
     while not stop_event.is_set():
         try:
+            # Grouped counts first: only load rows when something is actually stuck
+            snap = queue_stats.snapshot(force=True)
+            # Count currently processing GPU tasks to decide on queued_gpu exception
+            processing_count = queue_stats.by_status(snap["upscale"]).get(UpscaleStatus.PROCESSING, 0)
+            if queue_stats.stuck_counts(snap, gpu_slots_busy=processing_count >= 2)["total"] == 0:
+                time.sleep(healthcheck_interval)
+                continue
+
             with Session(engine) as session:
                 now = time_utc()
                 
-                # Count currently processing GPU tasks to decide on queued_gpu exception
-                processing_active = session.exec(
-                    select(UpscaleTask).where(
-                        UpscaleTask.status == UpscaleStatus.PROCESSING
-                    )
-                ).all()
-                processing_count = len(processing_active)
-                
                 # Найти застрявшие задачи
                 stuck_tasks = []
                 
@@ -709,13 +898,14 @@ def queue_healthcheck_worker():
                     
                     # Добавить в очередь загрузки заново
                     try:
-                        upload_upscale_queue.put(task.id)
+                        _queue_upscale(task.id)
                         logging.info(f"[healthcheck] Re-queued stuck task {task.id}")
                     except Exception as e:
                         logging.error(f"[healthcheck] Failed to re-queue task {task.id}: {e}")
                 
                 if stuck_tasks:
                     session.commit()
+                    queue_stats.invalidate()
                     logging.info(f"[healthcheck] Fixed {len(stuck_tasks)} stuck tasks")
                     
         except Exception as e:
@@ -732,93 +922,156 @@ def start_workers():
     os.makedirs(CLIPS_UPSCALED_DIR, exist_ok=True)
     os.makedirs(TO_UPSCALE_DIR, exist_ok=True)
     enqueue_pending_from_db()
+    mode = orchestrator_mode()
     t1 = Thread(target=download_worker, name="download_worker", daemon=True)
     t2 = Thread(target=process_worker, name="process_worker", daemon=True)
-    t3 = Thread(target=upscale_watcher, name="upscale_watcher", daemon=True)
-    t4 = Thread(target=upload_upscale_worker, name="upload_upscale_worker", daemon=True)
-    # Start as many GPU workers as concurrency allows
-    from .upscale_config import get_upscale_concurrency
-    gpu_workers = []
-    for i in range(max(1, get_upscale_concurrency())):
-        gpu_workers.append(Thread(target=process_upscale_worker, name=f"process_upscale_worker_{i+1}", daemon=True))
-    t6 = Thread(target=result_download_worker, name="result_download_worker", daemon=True)
-    t7 = Thread(target=queue_healthcheck_worker, name="queue_healthcheck_worker", daemon=True)
     t1.start()
     t2.start()
+    if mode == "external":
+        logging.info("Upscale orchestration runs as a separate service (ORCHESTRATOR_MODE=external)")
+        return
+    t3 = Thread(target=upscale_watcher, name="upscale_watcher", daemon=True)
+    t7 = Thread(target=queue_healthcheck_worker, name="queue_healthcheck_worker", daemon=True)
     t3.start()
-    t4.start()
-    for tw in gpu_workers:
-        tw.start()
-    t6.start()
+    if mode == "async":
+        from .async_worker import start_async_orchestrator
+        start_async_orchestrator()
+    else:
+        t4 = Thread(target=upload_upscale_worker, name="upload_upscale_worker", daemon=True)
+        # Start as many GPU workers as concurrency allows
+        from .upscale_config import get_upscale_concurrency
+        gpu_workers = []
+        for i in range(max(1, get_upscale_concurrency())):
+            gpu_workers.append(Thread(target=process_upscale_worker, name=f"process_upscale_worker_{i+1}", daemon=True))
+        t6 = Thread(target=result_download_worker, name="result_download_worker", daemon=True)
+        t4.start()
+        for tw in gpu_workers:
+            tw.start()
+        t6.start()
     t7.start()
+    Thread(target=warm_standby_worker, name="warm_standby_worker", daemon=True).start()
     logging.info("Started queue healthcheck worker - monitors stuck tasks every 5 minutes")
 def add_task_to_download(task_id: int):
     download_queue.put(task_id)
 
 
 # ========== Upscale support ==========
-from .upscale_vast import VastManager
+from .upscale_vast import create_vast_manager
+from .upscale_autoscale import WarmStandbyScheduler
 
 _vast = None
+warm_standby = WarmStandbyScheduler()
 
 
 def get_vast():
     global _vast
     if _vast is None:
-        _vast = VastManager()
+        _vast = create_vast_manager()
     return _vast
 
 
+def _prestart_instance():
+    """Kick off instance boot in the background as soon as upscale work is enqueued."""
+    try:
+        warm_standby.prestart(get_vast())
+    except Exception as e:
+        logging.debug(f"[autoscale] Pre-start skipped: {e}")
+
+
+def _upscale_fully_idle() -> bool:
+    """No upscale work queued or running anywhere (threads or async core)."""
+    from .async_worker import get_async_core
+    core = get_async_core()
+    if core is not None:
+        return core.is_idle()
+    if orchestrator_mode() == "external":
+        sizes = get_upscale_queue_sizes()
+        return not any(sizes.values())
+    return _active_upscale == 0 \
+        and upload_upscale_queue.empty() \
+        and process_upscale_queue.empty() \
+        and result_download_queue.empty()
+
+
+def warm_standby_worker():
+    """Predictive pre-start of the instance ahead of expected arrivals (see upscale_autoscale)."""
+    warm_standby.run_prestart_loop(get_vast, _upscale_fully_idle, stop_event)
+
+
 def _stop_instance_if_fully_idle():
     """Best-effort: stop instance when there is no work anywhere.
-    Calls VastManager.stop_instance_if_idle(), which enforces cooldown and activity windows.
+    Calls VastManager.stop_instance_if_idle(), which enforces cooldown and activity windows,
+    unless the warm-standby scheduler predicts more work within its window.
     """
     vast = get_vast()
     try:
-        if _active_upscale == 0 \
-           and upload_upscale_queue.empty() \
-           and process_upscale_queue.empty() \
-           and result_download_queue.empty():
+        if _upscale_fully_idle():
+            if warm_standby.should_keep_warm():
+                return
             vast.stop_instance_if_idle()
     except Exception:
         pass
 
 
+def _enqueue_upscale_files(paths) -> list:
+    """
+    Create QUEUED UpscaleTask rows for the given files in one transaction (files that
+    already have a task are skipped) and put them on the upload queue. Returns the new ids.
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return []
+    with Session(engine) as session:
+        existing = set()
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            existing.update(session.exec(select(UpscaleTask.file_path).where(UpscaleTask.file_path.in_(chunk))).all())
+        new = [UpscaleTask(file_path=p, status=UpscaleStatus.QUEUED, stage="queued", progress=0)
+               for p in paths if p not in existing]
+        if not new:
+            return []
+        session.add_all(new)
+        session.flush()
+        ids = [ut.id for ut in new]
+        session.commit()
+    for task_id in ids:
+        _queue_upscale(task_id)
+    _prestart_instance()
+    logging.info(f"[ingest] Queued {len(ids)} upscale task(s)")
+    return ids
+
+
+_ingest = None
+
+
+def _get_ingest() -> DirectoryIngest:
+    global _ingest
+    if _ingest is None:
+        _ingest = DirectoryIngest(TO_UPSCALE_DIR, _is_media_file, _enqueue_upscale_files)
+    return _ingest
+
+
 def upscale_watcher():
     """
-    Scan TO_UPSCALE_DIR periodically and enqueue new files as UpscaleTask.
-    Only media files are considered; hidden/system files are ignored.
+    Watch TO_UPSCALE_DIR (inotify, or incremental polling) and enqueue complete media
+    files as UpscaleTask; hidden/system files are ignored. See app/ingest.py.
     """
-    last_seen = set()
+    last_idle_check = [0.0]
+
+    def on_tick(ingest: DirectoryIngest):
+        now = time.time()
+        if now - last_idle_check[0] < 2.0:
+            return
+        last_idle_check[0] = now
+        # If there are no files to upscale and queues are empty, consider stopping instance
+        if not ingest.present_count() and upload_upscale_queue.empty() and process_upscale_queue.empty() and result_download_queue.empty() and _active_upscale == 0:
+            _stop_instance_if_fully_idle()
+
     while not stop_event.is_set():
         try:
-            current = set()
-            for name in os.listdir(TO_UPSCALE_DIR):
-                if not _is_media_file(name):
-                    continue
-                path = os.path.join(TO_UPSCALE_DIR, name)
-                if os.path.isfile(path):
-                    current.add(path)
-                    if path not in last_seen:
-                        # Ensure file is stable before creating a task
-                        if not _is_local_stable(path):
-                            # Not stable yet; skip for now, will see on next scan
-                            continue
-                        # Create task if not exists
-                        with Session(engine) as session:
-                            existing = session.exec(select(UpscaleTask).where(UpscaleTask.file_path == path)).first()
-                            if not existing:
-                                ut = UpscaleTask(file_path=path, status=UpscaleStatus.QUEUED, stage="queued", progress=0)
-                                session.add(ut)
-                                session.commit()
-                                session.refresh(ut)
-                                upload_upscale_queue.put(ut.id)
-            last_seen = current
-            # If there are no files to upscale and queues are empty, consider stopping instance
-            if not current and upload_upscale_queue.empty() and process_upscale_queue.empty() and result_download_queue.empty() and _active_upscale == 0:
-                _stop_instance_if_fully_idle()
-            time.sleep(2.0)
-        except Exception:
+            _get_ingest().run(stop_event, on_tick=on_tick)
+        except Exception as e:
+            logging.error(f"[ingest] Watcher crashed, restarting: {e}")
             time.sleep(2.0)
 
 
@@ -831,7 +1084,7 @@ def upload_upscale_worker():
             # Attempt to stop instance if fully idle
             _stop_instance_if_fully_idle()
             continue
-        with Session(engine) as session:
+        with Session(engine) as session, profiling.task_scope("upscale", task_id):
             ut = session.get(UpscaleTask, task_id)
             if not ut:
                 upload_upscale_queue.task_done()
@@ -845,7 +1098,8 @@ def upload_upscale_worker():
                 session.add(ut)
                 session.commit()
 
-                inst = vast.ensure_instance_running()
+                with metrics.stage_timer("ensure_instance", pipeline="upscale"):
+                    inst = vast.ensure_instance_running()
                 ut.vast_instance_id = str(inst.get("id"))
                 session.add(ut)
                 session.commit()
@@ -857,7 +1111,10 @@ def upload_upscale_worker():
                 session.commit()
                 _upload_sem.acquire()
                 try:
-                    remote_in, remote_out = vast.upload_and_plan_paths(inst, ut.file_path)
+                    with metrics.stage_timer("upload", pipeline="upscale"):
+                        remote_in, remote_out = vast.upload_and_plan_paths(inst, ut.file_path)
+                    metrics.add_bytes("upload", metrics.file_size(ut.file_path), pipeline="upscale")
+                    timeline.record_bytes("upscale", task_id, "uploading", metrics.file_size(ut.file_path))
                 finally:
                     _upload_sem.release()
 
@@ -889,6 +1146,8 @@ def upload_upscale_worker():
                     time.sleep(1.0)
                     upload_upscale_queue.put(task_id)
                 else:
+                    # Instance may have gone away under us: force a fresh state lookup next time
+                    vast.invalidate_instance_state()
                     ut.status = UpscaleStatus.ERROR
                     ut.stage = "error"
                     ut.error = str(e)
@@ -908,13 +1167,9 @@ def process_upscale_worker():
             task_id = process_upscale_queue.get(timeout=0.5)
         except Empty:
             # If all idle, consider stopping instance
-            if _active_upscale == 0 and upload_upscale_queue.empty() and process_upscale_queue.empty():
-                try:
-                    vast.stop_instance_if_idle()
-                except Exception:
-                    pass
+            _stop_instance_if_fully_idle()
             continue
-        with Session(engine) as session:
+        with Session(engine) as session, profiling.task_scope("upscale", task_id):
             ut = session.get(UpscaleTask, task_id)
             if not ut:
                 process_upscale_queue.task_done()
@@ -936,32 +1191,37 @@ def process_upscale_worker():
                 remote_in, remote_out = remote
 
                 inst = vast.ensure_instance_running()
+                # Time since the upload worker parked it in queued_gpu
+                if ut.stage == "queued_gpu" and ut.updated_at:
+                    metrics.observe_stage("queue_wait", (time_utc() - ut.updated_at).total_seconds(), pipeline="upscale")
                 ut.stage = "processing"
                 ut.status = UpscaleStatus.PROCESSING
                 ut.progress = 40
                 session.add(ut)
                 session.commit()
 
+                gpu_t0 = time.time()
                 job_id = vast.submit_job(inst, remote_in, remote_out)
                 ut.vast_job_id = str(job_id)
                 session.add(ut)
                 session.commit()
 
                 # Poll
+                polled_pct = ut.progress or 40
                 while True:
                     status = vast.job_status(inst, job_id)
-                    if status == "processing":
-                        ut.progress = min((ut.progress or 40) + 2, 85)
-                        ut.updated_at = time_utc()
-                        session.add(ut)
-                        session.commit()
+                    if status in ("validating", "processing"):
+                        polled_pct = min(polled_pct + 2, 85)
+                        progress_aggregator.update(UpscaleTask, task_id, progress=polled_pct, updated_at=time_utc())
                         time.sleep(3)
                     elif status == "completed":
                         break
                     else:
                         raise RuntimeError(f"Upscale job failed: status={status}")
+                metrics.observe_stage("upscale", time.time() - gpu_t0, pipeline="upscale")
 
                 # Mark ready for download and immediately free GPU slot before enqueueing download
+                progress_aggregator.discard(UpscaleTask, task_id)
                 ut.stage = "queued_result_download"
                 ut.progress = 90
                 session.add(ut)
@@ -974,6 +1234,8 @@ def process_upscale_worker():
                 # Cleanup remote path mapping will be done by result_download_worker after successful download
 
             except Exception as e:
+                vast.invalidate_instance_state()
+                progress_aggregator.discard(UpscaleTask, task_id)
                 ut.status = UpscaleStatus.ERROR
                 ut.stage = "error"
                 ut.error = str(e)
@@ -992,23 +1254,60 @@ def process_upscale_worker():
 
 def trigger_upscale_scan():
     # force scan by placing all files into queue if not yet queued
+    if _ingest is not None:
+        _ingest.rescan()
+    paths = [os.path.join(TO_UPSCALE_DIR, name) for name in os.listdir(TO_UPSCALE_DIR) if _is_media_file(name)]
+    paths = [p for p in paths if os.path.isfile(p)]
+    if not paths:
+        return
     with Session(engine) as session:
-        for name in os.listdir(TO_UPSCALE_DIR):
-            if not _is_media_file(name):
-                continue
-            path = os.path.join(TO_UPSCALE_DIR, name)
-            if not os.path.isfile(path):
-                continue
-            # Ensure file looks stable before enqueue
-            if not _is_local_stable(path):
-                continue
-            existing = session.exec(select(UpscaleTask).where(UpscaleTask.file_path == path)).first()
-            if not existing:
-                ut = UpscaleTask(file_path=path, status=UpscaleStatus.QUEUED, stage="queued", progress=0)
-                session.add(ut)
-                session.commit()
-                session.refresh(ut)
-                upload_upscale_queue.put(ut.id)
+        known = set(session.exec(select(UpscaleTask.file_path).where(UpscaleTask.file_path.in_(paths))).all())
+    candidates = [p for p in paths if p not in known]
+    if not candidates:
+        return
+    # Stability checks sleep; run them side by side instead of one file after another
+    with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as pool:
+        stable = [p for p, ok in zip(candidates, pool.map(_is_local_stable, candidates)) if ok]
+    _enqueue_upscale_files(stable)
+
+
+def _queue_depths() -> dict:
+    depths = {"download": download_queue.qsize(), "process": process_queue.qsize()}
+    for name, size in get_upscale_queue_sizes().items():
+        if name != "active_gpu":
+            depths[f"upscale_{name}"] = size
+    return depths
+
+
+metrics.QUEUE_DEPTH.set_function(_queue_depths)
+metrics.GPU_SLOTS_ACTIVE.set_function(lambda: {(): get_upscale_queue_sizes().get("active_gpu", 0)})
+
+
+def get_upscale_queue_sizes() -> dict:
+    """Sizes of the upscale stage queues for whichever orchestrator core is running."""
+    from .async_worker import get_async_core
+    core = get_async_core()
+    if core is not None:
+        return core.queue_sizes()
+    if orchestrator_mode() == "external":
+        return _upscale_queue_sizes_from_db()
+    return {
+        "upload": upload_upscale_queue.qsize(),
+        "process": process_upscale_queue.qsize(),
+        "download": result_download_queue.qsize(),
+        "active_gpu": _active_upscale,
+    }
+
+
+def _upscale_queue_sizes_from_db() -> dict:
+    """Stage queue sizes of an external orchestrator, derived from the task rows."""
+    sizes = {"upload": 0, "process": 0, "download": 0, "active_gpu": 0}
+    stage_queue = {"queued": "upload", "queued_gpu": "process", "queued_result_download": "download",
+                   "processing": "active_gpu"}
+    for g in queue_stats.snapshot()["upscale"]:
+        if g["status"] in (UpscaleStatus.QUEUED, UpscaleStatus.PROCESSING) and g["stage"] in stage_queue:
+            sizes[stage_queue[g["stage"]]] += g["count"]
+    return sizes
 
 
 def list_upscale_tasks():
@@ -1026,7 +1325,7 @@ def result_download_worker():
             _stop_instance_if_fully_idle()
             time.sleep(0.1)
             continue
-        with Session(engine) as session:
+        with Session(engine) as session, profiling.task_scope("upscale", task_id):
             ut = session.get(UpscaleTask, task_id)
             if not ut:
                 result_download_queue.task_done()
@@ -1052,7 +1351,10 @@ def result_download_worker():
                 # Sequential (or limited) result download
                 _result_dl_sem.acquire()
                 try:
-                    local_out = vast.download_result(inst, remote_out, CLIPS_UPSCALED_DIR)
+                    with metrics.stage_timer("result_download", pipeline="upscale"):
+                        local_out = vast.download_result(inst, remote_out, CLIPS_UPSCALED_DIR)
+                    metrics.add_bytes("download", metrics.file_size(local_out), pipeline="upscale")
+                    timeline.record_bytes("upscale", task_id, "downloading", metrics.file_size(local_out))
                 finally:
                     _result_dl_sem.release()
 
@@ -1068,6 +1370,7 @@ def result_download_worker():
                 with _remote_lock:
                     _remote_paths.pop(task_id, None)
             except Exception as e:
+                vast.invalidate_instance_state()
                 ut.status = UpscaleStatus.ERROR
                 ut.stage = "error"
                 ut.error = str(e)
@@ -1093,7 +1396,8 @@ def retry_upscale_task(task_id: int):
         session.add(ut)
         session.commit()
         # Start from the beginning of the pipeline: enqueue upload step
-        upload_upscale_queue.put(ut.id)
+        _queue_upscale(ut.id)
+        _prestart_instance()
         return ut
 
 
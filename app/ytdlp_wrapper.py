@@ -1,21 +1,21 @@
 from yt_dlp import YoutubeDL
 from typing import Tuple, List, Any
 import os
-import subprocess
+
+from . import encoders
 
 
 def _convert_to_mp4(input_path: str, output_path: str) -> None:
     """Convert video to MP4 format using ffmpeg"""
-    cmd = [
+    result = encoders.encode(lambda v: [
         'ffmpeg',
         '-y',  # Overwrite output file
         '-i', input_path,
-        '-c:v', 'libx264',
+        *v,
         '-c:a', 'aac',
         '-strict', 'experimental',
         output_path
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    ], crf=23, label="ffmpeg_to_mp4", capture_output=True, text=True)
     if result.returncode != 0:
         raise RuntimeError(f"Failed to convert video to MP4: {result.stderr}")
 
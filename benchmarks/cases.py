@@ -0,0 +1,316 @@
+"""
+Benchmark cases. Each case takes (params, workdir), does its setup (test media, DB, ...)
+and returns the callable to be measured; the callable returns {"frames": ..., "items": ...}.
+"""
+import os
+import sys
+import time
+import socket
+import atexit
+import shutil
+import subprocess
+from typing import Callable, Dict
+from concurrent.futures import ThreadPoolExecutor
+
+from .media import synthetic_video
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+UPSCALE_APP_DIR = os.path.join(REPO_ROOT, "upscale", "vastai_deployment")
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def _frames(params: Dict, seconds: float) -> int:
+    return int(seconds * int(params.get("fps", 30)))
+
+
+def case_process_video(params: Dict, workdir: str) -> Callable[[], Dict]:
+    """app.ffmpeg_wrapper.process_video: trim (re-encode) or full copy."""
+    from app.ffmpeg_wrapper import process_video
+
+    duration = float(params["duration"])
+    src = synthetic_video(duration, params["resolution"], int(params.get("fps", 30)))
+    if params.get("mode", "trim") == "copy":
+        start, end = None, None
+    else:
+        start, end = duration * 0.25, duration * 0.75
+
+    def run() -> Dict:
+        process_video(src, workdir, start, end)
+        span = duration if start is None else (end - start)
+        return {"frames": _frames(params, span), "items": 1}
+    return run
+
+
+def case_cut_clips(params: Dict, workdir: str) -> Callable[[], Dict]:
+    """AutoPipeline.cut_clips with N clips of two fragments each (no Whisper/GPT)."""
+    from app.auto_pipeline import AutoPipeline
+    from app.ffmpeg_wrapper import timemark
+
+    duration = float(params["duration"])
+    src = synthetic_video(duration, params["resolution"], int(params.get("fps", 30)))
+    n = int(params.get("clips", 4))
+    frag = float(params.get("fragment_seconds", 3))
+    clips = []
+    slot = duration / n
+    for i in range(n):
+        a = i * slot
+        clips.append({
+            "title": f"bench clip {i + 1}",
+            "fragments": [
+                {"start": timemark(a), "end": timemark(min(a + frag, a + slot / 2))},
+                {"start": timemark(a + slot / 2), "end": timemark(min(a + slot / 2 + frag, a + slot))},
+            ],
+        })
+    clip_seconds = sum(min(frag, slot / 2) * 2 for _ in clips)
+    # Same trick the GPU-cut path uses: cut_clips needs neither Whisper nor OpenAI
+    pipeline = AutoPipeline.__new__(AutoPipeline)
+
+    def run() -> Dict:
+        created = pipeline.cut_clips(src, clips, workdir)
+        if len(created) != n:
+            raise RuntimeError(f"cut_clips produced {len(created)}/{n} clips")
+        return {"frames": _frames(params, clip_seconds), "items": n}
+    return run
+
+
+def case_encode(params: Dict, workdir: str) -> Callable[[], Dict]:
+    """Full H.264 re-encode through app.encoders with a pinned ladder entry ("auto" = probed choice)."""
+    from app import encoders
+
+    duration = float(params["duration"])
+    src = synthetic_video(duration, params["resolution"], int(params.get("fps", 30)))
+    entry = params.get("encoder", "auto")
+    if entry != "auto":
+        os.environ["VIDEO_ENCODER_LADDER"] = entry
+    usable = encoders.probe(force=True)
+    if entry != "auto" and entry not in usable:
+        raise RuntimeError(f"encoder {entry} not usable here: {encoders.stats()['probe'].get('rejected', {}).get(entry, 'not listed by ffmpeg')}")
+    out = os.path.join(workdir, "encoded.mp4")
+
+    def run() -> Dict:
+        r = encoders.encode(lambda v: ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", src, *v, "-an", out],
+                            crf=int(params.get("crf", 18)), label="bench_encode", capture_output=True, text=True)
+        if r.returncode != 0:
+            raise RuntimeError(f"encode failed: {r.stderr.strip()[-300:]}")
+        return {"frames": _frames(params, duration), "items": 1, "encoder": encoders.selected()}
+    return run
+
+
+def case_upscale_frames(params: Dict, workdir: str) -> Callable[[], Dict]:
+    """
+    upscale_app.upscale_video_with_realesrgan on CPU (extract -> ESRGAN -> encode).
+    writer "ffmpeg" (rawvideo pipe, H.264/H.265 + audio) or "mp4v" (OpenCV) for size/fps comparisons.
+    clips > 1: that many copies, one after another, or with batch=True concurrently through the
+    server's shared GPU queue (one ESRGAN run per batch).
+    dedup=True skips near-duplicate frames (frame_dedup.py) and reports PSNR/SSIM against a full
+    run made during setup; pattern="inset" gives it a mostly static source to work with.
+    """
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    if UPSCALE_APP_DIR not in sys.path:
+        sys.path.insert(0, UPSCALE_APP_DIR)
+    import upscale_app
+
+    upscale_app.FACE_ENHANCEMENT = bool(params.get("face_enhance", False))
+    upscale_app.UPSCALE_WRITER = params.get("writer", "ffmpeg")
+    upscale_app.UPSCALE_CODEC = params.get("codec", "h264")
+    upscale_app.UPSCALE_DEDUP = False
+    duration = float(params["duration"])
+    src = synthetic_video(duration, params["resolution"], int(params.get("fps", 30)), params.get("pattern", "testsrc"))
+    reference = None
+    if params.get("dedup"):
+        reference = os.path.join(workdir, "reference.mp4")
+        if not upscale_app.upscale_video_with_realesrgan(src, reference):
+            raise RuntimeError("full reference upscale failed")
+        upscale_app.UPSCALE_DEDUP = True
+    clips = int(params.get("clips", 1))
+    outs = [os.path.join(workdir, f"upscaled_{i}.mp4") for i in range(clips)]
+    esrgan = None
+    if params.get("batch"):
+        import gpu_queue
+        queue = gpu_queue.GpuQueue(upscale_app.run_esrgan_batch, max_units=clips)
+        esrgan = lambda unit: queue.submit(unit).result()
+
+    def run() -> Dict:
+        if esrgan:
+            with ThreadPoolExecutor(max_workers=clips) as pool:
+                ok = list(pool.map(lambda o: upscale_app.upscale_video_with_realesrgan(src, o, esrgan=esrgan), outs))
+        else:
+            ok = [upscale_app.upscale_video_with_realesrgan(src, o) for o in outs]
+        if not all(ok):
+            raise RuntimeError("upscale_video_with_realesrgan returned False")
+        result = {"frames": _frames(params, duration) * clips, "items": clips}
+        if reference:
+            import frame_dedup
+            result.update({f"quality_{k}": v for k, v in frame_dedup.quality(reference, outs[0]).items() if k != "frames"})
+        return result
+    return run
+
+
+def _start_fake_gpu_server(params: Dict, workdir: str) -> str:
+    """Run server.py in FAKE_GPU mode on a free port; returns its base URL."""
+    import requests
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ,
+               FAKE_GPU="1", PORT=str(port),
+               FAKE_GPU_LATENCY=str(params.get("gpu_seconds", 0)),
+               FAKE_GPU_FAILURE_RATE=str(params.get("failure_rate", 0)),
+               FAKE_GPU_SLOTS=str(params.get("gpu_slots", params.get("concurrency", 2))),
+               FAKE_GPU_SEED="0")
+    log = open(os.path.join(workdir, "fake_gpu.log"), "w")
+    proc = subprocess.Popen([sys.executable, "server.py"], cwd=UPSCALE_APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    atexit.register(proc.terminate)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(f"{base}/health", timeout=1).status_code == 200:
+                return base
+        except Exception:
+            pass
+        if proc.poll() is not None:
+            break
+        time.sleep(0.1)
+    raise RuntimeError("fake GPU server did not start (see fake_gpu.log)")
+
+
+def case_worker_queues(params: Dict, workdir: str) -> Callable[[], Dict]:
+    """
+    Threaded upscale queues (upload -> GPU slots -> result download) on a throwaway SQLite DB.
+    backend "stub": in-process StubVast, measures orchestration overhead only.
+    backend "local": FAKE_GPU server.py over HTTP + LocalVastManager (file copies instead of scp).
+    """
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ.pop("POSTGRES_URL", None)
+    os.environ["UPSCALE_CONCURRENCY"] = str(params.get("concurrency", 2))
+
+    from threading import Thread
+    from sqlmodel import SQLModel, Session, select
+    from app.db import engine
+    from app.models import UpscaleTask, UpscaleStatus
+    from app import worker
+    from .stub_gpu import StubVast
+
+    SQLModel.metadata.create_all(engine)
+    n = int(params.get("tasks", 50))
+    src = synthetic_video(float(params.get("duration", 2)), params.get("resolution", "640x360"))
+    inputs_dir = os.path.join(workdir, "to_upscale")
+    os.makedirs(inputs_dir, exist_ok=True)
+    worker.CLIPS_UPSCALED_DIR = os.path.join(workdir, "clips_upscaled")
+    if params.get("backend", "stub") == "local":
+        os.environ.update(
+            VAST_BACKEND="local",
+            LOCAL_GPU_URL=_start_fake_gpu_server(params, workdir),
+            LOCAL_GPU_ROOT=os.path.join(workdir, "gpu"),
+        )
+        worker._vast = None
+    else:
+        worker._vast = StubVast(
+            os.path.join(workdir, "gpu"),
+            gpu_seconds=float(params.get("gpu_seconds", 0)),
+            failure_rate=float(params.get("failure_rate", 0)),
+        )
+    task_ids = []
+    with Session(engine) as session:
+        for i in range(n):
+            path = os.path.join(inputs_dir, f"bench_{i:04d}.mp4")
+            shutil.copyfile(src, path)
+            ut = UpscaleTask(file_path=path, status=UpscaleStatus.QUEUED, stage="queued", progress=0)
+            session.add(ut)
+            session.commit()
+            session.refresh(ut)
+            task_ids.append(ut.id)
+    timeout = float(params.get("timeout", 600))
+
+    def run() -> Dict:
+        threads = [Thread(target=worker.upload_upscale_worker, daemon=True),
+                   Thread(target=worker.result_download_worker, daemon=True)]
+        threads += [Thread(target=worker.process_upscale_worker, daemon=True)
+                    for _ in range(int(os.environ["UPSCALE_CONCURRENCY"]))]
+        for t in threads:
+            t.start()
+        for tid in task_ids:
+            worker.upload_upscale_queue.put(tid)
+        deadline = time.time() + timeout
+        done = errors = 0
+        while time.time() < deadline:
+            with Session(engine) as session:
+                statuses = session.exec(select(UpscaleTask.status)).all()
+            done = sum(1 for s in statuses if s == UpscaleStatus.DONE)
+            errors = sum(1 for s in statuses if s == UpscaleStatus.ERROR)
+            if done + errors >= n:
+                break
+            time.sleep(0.2)
+        worker.stop_event.set()
+        for t in threads:
+            t.join(timeout=5)
+        if done + errors < n:
+            raise RuntimeError(f"timed out: {done} done, {errors} failed of {n}")
+        return {"items": done, "failed": errors}
+    return run
+
+
+CASES: Dict[str, Callable] = {
+    "process_video": case_process_video,
+    "cut_clips": case_cut_clips,
+    "encode": case_encode,
+    "upscale_frames": case_upscale_frames,
+    "worker_queues": case_worker_queues,
+}
+
+# Parameter matrices per profile; keep them stable so results stay comparable across commits
+PROFILES: Dict[str, Dict[str, list]] = {
+    "smoke": {
+        "process_video": [{"duration": 10, "resolution": "640x360"}],
+        "cut_clips": [{"duration": 20, "resolution": "640x360", "clips": 2}],
+        "encode": [{"duration": 5, "resolution": "640x360", "encoder": "libx264"}],
+        "upscale_frames": [{"duration": 1, "resolution": "160x90"}],
+        "worker_queues": [{"tasks": 10}],
+    },
+    "default": {
+        "process_video": [
+            {"duration": 60, "resolution": "1280x720", "mode": "trim"},
+            {"duration": 60, "resolution": "1280x720", "mode": "copy"},
+            {"duration": 60, "resolution": "1920x1080", "mode": "trim"},
+        ],
+        "cut_clips": [
+            {"duration": 120, "resolution": "1280x720", "clips": 4},
+            {"duration": 120, "resolution": "1920x1080", "clips": 4},
+        ],
+        "encode": [
+            {"duration": 30, "resolution": "1920x1080", "encoder": "libx264"},
+            {"duration": 30, "resolution": "1920x1080", "encoder": "h264_nvenc"},
+            {"duration": 30, "resolution": "1920x1080", "encoder": "auto"},
+        ],
+        "upscale_frames": [
+            {"duration": 2, "resolution": "320x180", "writer": "mp4v"},
+            {"duration": 2, "resolution": "320x180", "writer": "ffmpeg"},
+            {"duration": 2, "resolution": "320x180", "writer": "ffmpeg", "codec": "hevc"},
+            {"duration": 1, "resolution": "320x180", "clips": 4},
+            {"duration": 1, "resolution": "320x180", "clips": 4, "batch": True},
+            {"duration": 2, "resolution": "320x180", "pattern": "inset"},
+            {"duration": 2, "resolution": "320x180", "pattern": "inset", "dedup": True},
+        ],
+        "worker_queues": [
+            {"tasks": 50, "concurrency": 2},
+            {"tasks": 50, "concurrency": 4, "failure_rate": 0.1},
+            {"tasks": 50, "concurrency": 2, "backend": "local", "gpu_seconds": 0.5},
+        ],
+    },
+    "long": {
+        "process_video": [{"duration": 600, "resolution": "1920x1080", "mode": "trim"}],
+        "cut_clips": [{"duration": 600, "resolution": "1920x1080", "clips": 10}],
+        "encode": [{"duration": 300, "resolution": "1920x1080", "encoder": "auto"}],
+        "upscale_frames": [
+            {"duration": 5, "resolution": "640x360", "writer": "mp4v"},
+            {"duration": 5, "resolution": "640x360", "writer": "ffmpeg"},
+        ],
+        "worker_queues": [
+            {"tasks": 300, "concurrency": 4, "gpu_seconds": 1},
+            {"tasks": 300, "concurrency": 4, "backend": "local", "gpu_seconds": 1, "failure_rate": 0.05},
+        ],
+    },
+}
@@ -0,0 +1,81 @@
+"""
+Measurement helpers: wall time, CPU time, peak RSS and bytes written for one benchmark case.
+
+Each case runs in its own interpreter (see run.py), so ru_maxrss is the peak of that case
+alone, and /proc/self/io includes the ffmpeg/ESRGAN children it waited for.
+"""
+import os
+import sys
+import time
+import resource
+from typing import Callable, Dict, Optional
+
+
+def _proc_io() -> Dict[str, int]:
+    """Linux /proc/self/io counters (includes reaped children); empty dict elsewhere."""
+    out: Dict[str, int] = {}
+    try:
+        with open("/proc/self/io", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                out[key.strip()] = int(value.strip())
+    except Exception:
+        pass
+    return out
+
+
+def _maxrss_mb(who) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def tree_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def measure(fn: Callable[[], Dict], workdir: Optional[str] = None) -> Dict:
+    """
+    Run fn() and return its result dict extended with timings and resource usage.
+    fn may report "frames" (for fps) and "items" (for items_per_second).
+    """
+    io0 = _proc_io()
+    cpu0 = os.times()
+    t0 = time.perf_counter()
+    error = None
+    result: Dict = {}
+    try:
+        result = fn() or {}
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - t0
+    cpu1 = os.times()
+    io1 = _proc_io()
+
+    cpu = (cpu1.user - cpu0.user) + (cpu1.system - cpu0.system) \
+        + (cpu1.children_user - cpu0.children_user) + (cpu1.children_system - cpu0.children_system)
+    out = dict(result)
+    out.update({
+        "ok": error is None,
+        "error": error,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": _maxrss_mb(resource.RUSAGE_SELF),
+        "peak_rss_children_mb": _maxrss_mb(resource.RUSAGE_CHILDREN),
+        "disk_write_bytes": (io1.get("write_bytes", 0) - io0.get("write_bytes", 0)) if io1 else None,
+        "output_bytes": tree_size(workdir) if workdir and os.path.isdir(workdir) else None,
+    })
+    frames = result.get("frames")
+    if frames and wall > 0:
+        out["fps"] = round(frames / wall, 2)
+    items = result.get("items")
+    if items and wall > 0:
+        out["items_per_second"] = round(items / wall, 3)
+    return out
@@ -0,0 +1,48 @@
+"""
+Synthetic test media for the benchmarks (ffmpeg testsrc + sine), cached by parameters
+so repeated runs and runs on different commits decode the exact same input.
+"""
+import os
+import subprocess
+from typing import Tuple
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    w, h = value.lower().split("x", 1)
+    return int(w), int(h)
+
+
+def synthetic_video(duration: float, resolution: str = "1280x720", fps: int = 30, pattern: str = "testsrc") -> str:
+    """
+    Return the path of a cached H.264/AAC test video, generating it on first use.
+    pattern "testsrc" changes every pixel each frame; "inset" is a static background with a small
+    testsrc in the middle (interview-like: most of the frame never changes).
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    w, h = parse_resolution(resolution)
+    path = os.path.join(CACHE_DIR, f"{pattern}_{w}x{h}_{fps}fps_{duration:g}s.mp4")
+    video = f"testsrc=size={w}x{h}:rate={fps}:duration={duration:g}"
+    if pattern == "inset":
+        iw, ih = max(2, w // 8 // 2 * 2), max(2, h // 8 // 2 * 2)
+        video = (f"smptebars=size={w}x{h}:rate={fps}:duration={duration:g}[bg];"
+                 f"testsrc=size={iw}x{ih}:rate={fps}:duration={duration:g}[fg];"
+                 f"[bg][fg]overlay=x={(w - iw) // 2}:y={(h - ih) // 2}")
+    if os.path.isfile(path) and os.path.getsize(path) > 0:
+        return path
+    tmp = path + ".part.mp4"
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", video,
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration:g}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-g", str(fps * 2),
+        "-c:a", "aac", "-b:a", "128k", "-shortest",
+        "-fflags", "+bitexact", "-movflags", "+faststart",
+        tmp,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "ffmpeg failed to generate test video")
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the cut and upscale pipelines.
+
+Every (case, params, repeat) runs in a fresh interpreter so peak RSS and I/O counters
+belong to that case only. Results are written as JSON tagged with the git commit, so two
+runs can be diffed with --compare.
+
+Usage:
+  python -m benchmarks.run                              # default profile, all cases
+  python -m benchmarks.run --profile smoke --cases process_video,cut_clips
+  python -m benchmarks.run --repeat 3 --out bench.json
+  python -m benchmarks.run --compare old.json new.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from typing import Dict, List
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+_MARK = "BENCH_RESULT "
+
+
+def _git(*args: str) -> str:
+    try:
+        r = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+        return r.stdout.strip() if r.returncode == 0 else ""
+    except Exception:
+        return ""
+
+
+def _ffmpeg_version() -> str:
+    try:
+        r = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, timeout=10)
+        return r.stdout.splitlines()[0] if r.stdout else ""
+    except Exception:
+        return ""
+
+
+def _environment() -> Dict:
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": _ffmpeg_version(),
+    }
+
+
+def _key(entry: Dict) -> str:
+    return entry["case"] + " " + json.dumps(entry["params"], sort_keys=True)
+
+
+# ---- child side ----
+
+def _run_child(case: str, params: Dict) -> None:
+    from .cases import CASES
+    from .harness import measure
+
+    workdir = tempfile.mkdtemp(prefix=f"bench_{case}_")
+    try:
+        try:
+            fn = CASES[case](params, workdir)
+        except Exception as e:
+            result = {"ok": False, "error": f"setup: {type(e).__name__}: {e}"}
+        else:
+            result = measure(fn, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.stdout.write(_MARK + json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+
+# ---- parent side ----
+
+def _spawn(case: str, params: Dict, timeout: float) -> Dict:
+    cmd = [sys.executable, "-m", "benchmarks.run", "--child", case, "--params", json.dumps(params)]
+    try:
+        r = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"ok": False, "error": f"timeout after {timeout:.0f}s"}
+    for line in reversed(r.stdout.splitlines()):
+        if line.startswith(_MARK):
+            return json.loads(line[len(_MARK):])
+    tail = (r.stderr or r.stdout).strip().splitlines()[-5:]
+    return {"ok": False, "error": f"exit {r.returncode}: " + " | ".join(tail)}
+
+
+def _summarize(runs: List[Dict]) -> Dict:
+    ok = [r for r in runs if r.get("ok")]
+    if not ok:
+        return {"ok": False, "error": runs[-1].get("error") if runs else "no runs"}
+    out = {"ok": True, "runs": len(runs), "failed_runs": len(runs) - len(ok)}
+    for field in ("wall_seconds", "cpu_seconds", "fps", "items_per_second", "peak_rss_mb",
+                  "peak_rss_children_mb", "disk_write_bytes", "output_bytes"):
+        values = [r[field] for r in ok if r.get(field) is not None]
+        if values:
+            out[field] = round(statistics.median(values), 3)
+    return out
+
+
+def run_suite(profile: str, cases: List[str], repeat: int, timeout: float) -> Dict:
+    from .cases import PROFILES
+
+    report = {"started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "profile": profile,
+              "repeat": repeat, "environment": _environment(), "results": []}
+    matrix = PROFILES[profile]
+    for case in cases:
+        for params in matrix.get(case, []):
+            runs = []
+            for i in range(repeat):
+                res = _spawn(case, params, timeout)
+                runs.append(res)
+                status = f"{res.get('wall_seconds', 0):.2f}s" if res.get("ok") else f"❌ {res.get('error')}"
+                fps = f" {res['fps']:.1f} fps" if res.get("fps") else ""
+                print(f"  {case} {json.dumps(params, sort_keys=True)} [{i + 1}/{repeat}] {status}{fps}")
+            report["results"].append({"case": case, "params": params, "summary": _summarize(runs), "runs": runs})
+    return report
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"old: {old['environment'].get('commit', '')[:10]}  new: {new['environment'].get('commit', '')[:10]}")
+    old_by_key = {_key(e): e["summary"] for e in old["results"]}
+    for entry in new["results"]:
+        a = old_by_key.get(_key(entry))
+        b = entry["summary"]
+        if not a or not a.get("ok") or not b.get("ok"):
+            print(f"  {_key(entry)}: not comparable")
+            continue
+        parts = []
+        for field in ("wall_seconds", "fps", "items_per_second", "peak_rss_mb", "disk_write_bytes"):
+            if a.get(field) and b.get(field) is not None:
+                delta = (b[field] - a[field]) / a[field] * 100
+                parts.append(f"{field} {a[field]:g} -> {b[field]:g} ({delta:+.1f}%)")
+        print(f"  {_key(entry)}\n    " + "\n    ".join(parts))
+
+
+def main():
+    from .cases import CASES, PROFILES
+
+    ap = argparse.ArgumentParser(description="Cut/upscale pipeline benchmarks")
+    ap.add_argument("--profile", default="default", choices=sorted(PROFILES))
+    ap.add_argument("--cases", default=",".join(CASES), help="Comma-separated subset of: " + ", ".join(CASES))
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--timeout", type=float, default=3600, help="Per-run timeout in seconds")
+    ap.add_argument("--out", default=None, help="Output JSON (default benchmarks/results/<time>_<commit>.json)")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--params", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _run_child(args.child, json.loads(args.params or "{}"))
+        return 0
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        ap.error(f"unknown case(s): {', '.join(unknown)}")
+
+    print(f"=== benchmarks: profile={args.profile} repeat={args.repeat} ===")
+    report = run_suite(args.profile, cases, max(1, args.repeat), args.timeout)
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["environment"].get("commit") or "nogit")[:10]
+        out = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out}")
+    failed = [e for e in report["results"] if not e["summary"].get("ok")]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
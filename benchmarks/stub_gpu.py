@@ -0,0 +1,74 @@
+"""
+In-process stand-in for VastManager used by the worker-queue benchmark.
+
+"Remote" inbox/outbox are local directories; a GPU job is a file copy that completes
+after gpu_seconds. No Vast API, SSH or HTTP involved, so the numbers measure the
+orchestrator's own queueing, DB and slot-accounting overhead.
+"""
+import os
+import time
+import uuid
+import random
+import shutil
+import threading
+from typing import Dict, Tuple
+
+
+class StubVast:
+    def __init__(self, root: str, gpu_seconds: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.inbox = os.path.join(root, "inbox")
+        self.outbox = os.path.join(root, "outbox")
+        os.makedirs(self.inbox, exist_ok=True)
+        os.makedirs(self.outbox, exist_ok=True)
+        self.gpu_seconds = gpu_seconds
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+
+    def ensure_instance_running(self) -> Dict:
+        return {"id": "stub", "actual_status": "running"}
+
+    def invalidate_instance_state(self, instance_id: str | None = None):
+        pass
+
+    def stop_instance_if_idle(self):
+        pass
+
+    def upload_and_plan_paths(self, inst: Dict, local_path: str) -> Tuple[str, str]:
+        base = os.path.basename(local_path)
+        remote_in = os.path.join(self.inbox, base)
+        remote_out = os.path.join(self.outbox, f"{os.path.splitext(base)[0]}_upscaled.mp4")
+        shutil.copyfile(local_path, remote_in)
+        return remote_in, remote_out
+
+    def submit_job(self, inst: Dict, remote_in: str, remote_out: str) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            fail = self._rng.random() < self.failure_rate
+            self._jobs[job_id] = {
+                "in": remote_in,
+                "out": remote_out,
+                "ready_at": time.time() + self.gpu_seconds,
+                "fail": fail,
+            }
+        return job_id
+
+    def job_status(self, inst: Dict, job_id: str) -> str:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if not job:
+            return "failed"
+        if time.time() < job["ready_at"]:
+            return "processing"
+        if job["fail"]:
+            return "failed"
+        if not os.path.exists(job["out"]):
+            shutil.copyfile(job["in"], job["out"])
+        return "completed"
+
+    def download_result(self, inst: Dict, remote_out: str, local_dir: str) -> str:
+        os.makedirs(local_dir, exist_ok=True)
+        local_path = os.path.join(local_dir, os.path.basename(remote_out))
+        shutil.copyfile(remote_out, local_path)
+        return os.path.abspath(local_path)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Migration script to add lookup indexes used by the task/clip listing endpoints.
+create_all() only creates indexes for new tables, so run this once on existing databases.
+"""
+import os
+import sys
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.db import engine
+
+# Import text from sqlalchemy (available through SQLModel's dependencies)
+try:
+    from sqlmodel import text
+except ImportError:
+    from sqlalchemy import text
+
+# Same names SQLModel generates for Field(index=True): ix_<table>_<column>
+INDEXES = [
+    ("task", "status"),
+    ("upscaletask", "status"),
+    ("upscaletask", "stage"),
+    ("upscaletask", "updated_at"),
+    ("clip", "task_id"),
+    ("clipfragment", "clip_id"),
+]
+
+
+def migrate():
+    print("Starting migration: add listing indexes...")
+
+    print(f"Database dialect: {engine.dialect.name}")
+    for table, column in INDEXES:
+        name = f"ix_{table}_{column}"
+        try:
+            # One transaction per index: on PostgreSQL a failed statement aborts the
+            # whole transaction, which would skip every index after it
+            with engine.begin() as conn:
+                # Both PostgreSQL and SQLite support IF NOT EXISTS for CREATE INDEX
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
+            print(f"✅ {name}")
+        except Exception as e:
+            print(f"⚠️  Error creating {name}: {e}")
+
+    print("Migration completed!")
+
+if __name__ == "__main__":
+    migrate()
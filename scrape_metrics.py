@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Local Prometheus-style scraper for testing without a Prometheus server.
+
+Scrapes /metrics from the orchestrator and (optionally) the GPU server, appends every
+sample to a JSONL file and prints a per-stage latency summary estimated from the
+histogram buckets.
+
+Usage:
+  python scrape_metrics.py                       # one scrape of http://127.0.0.1:8000/metrics
+  python scrape_metrics.py --gpu http://<ip>:5000 --interval 15 --out metrics.jsonl
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Tuple
+
+import requests
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text: str) -> List[Tuple[str, Dict[str, str], float]]:
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = _SAMPLE.match(line.strip())
+        if not m:
+            continue
+        name, _, labels, value = m.groups()
+        try:
+            val = float(value.replace("+Inf", "inf"))
+        except ValueError:
+            continue
+        samples.append((name, dict(_LABEL.findall(labels or "")), val))
+    return samples
+
+
+def _quantile(buckets: List[Tuple[float, float]], q: float) -> float:
+    """Linear interpolation inside the bucket that holds the q-th observation."""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return 0.0
+    rank = q * total
+    prev_le, prev_count = 0.0, 0.0
+    for le, count in buckets:
+        if count >= rank:
+            if le == float("inf"):
+                return prev_le
+            span = count - prev_count
+            return prev_le + (le - prev_le) * ((rank - prev_count) / span if span else 0)
+        prev_le, prev_count = le, count
+    return prev_le
+
+
+def summarize(samples) -> List[str]:
+    hist: Dict[Tuple[str, Tuple], List[Tuple[float, float]]] = {}
+    sums: Dict[Tuple[str, Tuple], float] = {}
+    counts: Dict[Tuple[str, Tuple], float] = {}
+    for name, labels, val in samples:
+        key_labels = tuple(sorted((k, v) for k, v in labels.items() if k != "le"))
+        if name.endswith("_bucket"):
+            hist.setdefault((name[:-7], key_labels), []).append((float(labels["le"].replace("+Inf", "inf")), val))
+        elif name.endswith("_sum"):
+            sums[(name[:-4], key_labels)] = val
+        elif name.endswith("_count"):
+            counts[(name[:-6], key_labels)] = val
+    lines = []
+    for key, buckets in sorted(hist.items()):
+        n = counts.get(key, 0)
+        if not n:
+            continue
+        name, labels = key
+        label_str = ",".join(f"{k}={v}" for k, v in labels)
+        lines.append(
+            f"  {name}{{{label_str}}} n={int(n)} avg={sums.get(key, 0) / n:.2f} "
+            f"p50~{_quantile(buckets, 0.5):.2f} p95~{_quantile(buckets, 0.95):.2f}"
+        )
+    return lines
+
+
+def scrape(url: str):
+    r = requests.get(url, timeout=10)
+    r.raise_for_status()
+    return parse(r.text)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scrape /metrics endpoints into JSONL")
+    ap.add_argument("--api", default="http://127.0.0.1:8000", help="Orchestrator base URL")
+    ap.add_argument("--gpu", default=None, help="GPU server base URL (e.g. http://1.2.3.4:5000)")
+    ap.add_argument("--interval", type=float, default=0, help="Seconds between scrapes; 0 = scrape once")
+    ap.add_argument("--out", default=None, help="Append samples to this JSONL file")
+    args = ap.parse_args()
+
+    targets = {"api": args.api.rstrip("/") + "/metrics"}
+    if args.gpu:
+        targets["gpu"] = args.gpu.rstrip("/") + "/metrics"
+
+    while True:
+        ts = time.time()
+        for job, url in targets.items():
+            try:
+                samples = scrape(url)
+            except Exception as e:
+                print(f"❌ {job}: {url} failed: {e}")
+                continue
+            print(f"=== {job} ({len(samples)} samples) ===")
+            for line in summarize(samples):
+                print(line)
+            for name, labels, val in samples:
+                if not name.endswith(("_bucket", "_sum", "_count")) and val:
+                    label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+                    print(f"  {name}{{{label_str}}} {val:g}")
+            if args.out:
+                with open(args.out, "a", encoding="utf-8") as f:
+                    for name, labels, val in samples:
+                        f.write(json.dumps({"ts": ts, "job": job, "name": name, "labels": labels, "value": val}) + "\n")
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
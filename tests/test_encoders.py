@@ -0,0 +1,62 @@
+import shutil
+import subprocess
+
+import pytest
+
+from app import encoders
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+@pytest.fixture
+def ladder(monkeypatch):
+    """Fresh encoder state with the ladder pinned to libx264."""
+    monkeypatch.setenv("VIDEO_ENCODER_LADDER", "libx264")
+    monkeypatch.delenv("VIDEO_ENCODER", raising=False)
+    monkeypatch.setattr(encoders, "_usable", None)
+    for name in ("_probe_info", "_strikes", "_disabled", "_stats"):
+        monkeypatch.setattr(encoders, name, {})
+    if "libx264" not in encoders.list_ffmpeg_encoders():
+        pytest.skip("ffmpeg built without libx264")
+    return monkeypatch
+
+
+def _encode(out):
+    return encoders.encode(
+        lambda v: ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-nostdin",
+                   "-f", "lavfi", "-i", "testsrc2=size=160x120:rate=10:duration=0.5", *v, str(out)],
+        crf=23, label="test_encode", capture_output=True, text=True)
+
+
+def test_probe_and_selected(ladder):
+    assert encoders.probe(force=True) == ["libx264"]
+    assert encoders.selected() == "libx264"
+    assert encoders.stats()["selected"]["h264"] == "libx264"
+
+
+def test_encode_writes_file(ladder, tmp_path):
+    out = tmp_path / "out.mp4"
+    r = _encode(out)
+    assert r.returncode == 0, r.stderr
+    assert r.encoder == "libx264"
+    assert out.exists() and out.stat().st_size > 0
+
+
+def test_failing_hardware_entry_falls_back_and_is_disabled(ladder, tmp_path):
+    encoders.probe(force=True)
+    broken = ("fake_hw", "fake_hw", lambda crf: ["-c:v", "no_such_encoder"], True, "h264")
+    ladder.setitem(encoders._BY_ID, "fake_hw", broken)
+    ladder.setattr(encoders, "_usable", ["fake_hw", "libx264"])
+    assert encoders.selected() == "fake_hw"
+
+    for n in range(encoders.MAX_FAILURES):
+        out = tmp_path / f"out{n}.mp4"
+        r = _encode(out)
+        assert isinstance(r, subprocess.CompletedProcess)
+        assert r.returncode == 0, r.stderr
+        assert r.encoder == "libx264"
+        assert out.stat().st_size > 0
+
+    assert "fake_hw" in encoders._disabled
+    assert encoders.selected() == "libx264"
+    assert encoders.stats()["encoders"]["fake_hw"]["failures"] == encoders.MAX_FAILURES
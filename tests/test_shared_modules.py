@@ -0,0 +1,34 @@
+"""
+The GPU server is deployed standalone (upscale/vastai_deployment is run from its own directory,
+without the app package), so it carries copies of a few orchestrator modules. These tests fail
+as soon as a copy drifts from app/.
+"""
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "app"
+GPU = ROOT / "upscale" / "vastai_deployment"
+
+
+def _read(path: Path) -> str:
+    return path.read_text(encoding="utf-8")
+
+
+def _generic_part(text: str) -> str:
+    """metrics.py minus its module docstring and the side-specific metric definitions."""
+    body = text.split('"""', 2)[2]
+    return body.split("\n# ---- ", 1)[0]
+
+
+@pytest.mark.parametrize("name", ["profiling.py", "encoders.py"])
+def test_copies_identical(name):
+    assert _read(GPU / name) == _read(APP / name), f"upscale/vastai_deployment/{name} differs from app/{name}"
+
+
+def test_metrics_generic_part_identical():
+    app_part = _generic_part(_read(APP / "metrics.py"))
+    gpu_part = _generic_part(_read(GPU / "metrics.py"))
+    assert "class " in app_part
+    assert gpu_part == app_part, "generic part of upscale/vastai_deployment/metrics.py differs from app/metrics.py"
@@ -0,0 +1,105 @@
+"""
+Zip archives for cut job results.
+
+Clips are H.264/AAC MP4s that deflate cannot shrink, so media entries are written with
+ZIP_STORED and only text entries (transcript/clips JSON) are deflated.
+
+  IncrementalZip   appends each file to <name>.zip as soon as the job finalizes it, so the
+                   archive is complete the moment the last clip is (no zip pass at the end)
+  stream_zip       builds a zip on the fly from (path, arcname) pairs without touching disk;
+                   the pairs may be produced while the job is still running
+"""
+import os
+import zipfile
+import threading
+from typing import Iterable, Iterator, List, Tuple
+
+DEFLATE_EXTS = {'.json', '.txt', '.srt', '.vtt', '.csv', '.log'}
+CHUNK_SIZE = 1024 * 1024
+
+
+def compress_type(name: str) -> int:
+    """ZIP_DEFLATED for text, ZIP_STORED for everything else (media is already compressed)."""
+    return zipfile.ZIP_DEFLATED if os.path.splitext(name)[1].lower() in DEFLATE_EXTS else zipfile.ZIP_STORED
+
+
+class IncrementalZip:
+    """Archive written entry by entry; lives at .<name>.part until close() moves it into place."""
+
+    def __init__(self, archive_path: str):
+        self.path = archive_path
+        self.tmp_path = os.path.join(os.path.dirname(archive_path) or '.', f".{os.path.basename(archive_path)}.part")
+        os.makedirs(os.path.dirname(self.tmp_path) or '.', exist_ok=True)
+        self._zf = zipfile.ZipFile(self.tmp_path, 'w', allowZip64=True)
+        self._lock = threading.Lock()
+        self.names: List[str] = []
+
+    def add(self, path: str, arcname: str) -> None:
+        with self._lock:
+            if arcname in self.names:
+                return
+            self._zf.write(path, arcname, compress_type=compress_type(arcname))
+            self.names.append(arcname)
+
+    def close(self) -> str:
+        with self._lock:
+            self._zf.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        with self._lock:
+            try:
+                self._zf.close()
+            except Exception:
+                pass
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class _Sink:
+    """Write-only, non-seekable target: zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, data) -> int:
+        self._buf += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a zip of (path, arcname) entries chunk by chunk; entries is consumed lazily."""
+    sink = _Sink()
+    zf = zipfile.ZipFile(sink, 'w', allowZip64=True)
+    try:
+        for path, arcname in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = compress_type(arcname)
+            with open(path, 'rb') as src, zf.open(info, 'w') as dst:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dst.write(block)
+                    data = sink.take()
+                    if data:
+                        yield data
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        zf.close()
+    data = sink.take()
+    if data:
+        yield data
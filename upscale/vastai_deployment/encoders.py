@@ -0,0 +1,348 @@
+"""
+H.264/H.265 encoder selection with a fallback ladder.
+
+At first use (or at startup via warm_up()) `ffmpeg -encoders` is probed and every ladder
+entry the build lists is test-encoded on a tiny synthetic clip; the first working entry
+becomes the default. Callers get encoder arguments at an equivalent quality level instead
+of hardcoding `-c:v libx264 -crf 18 -preset medium`:
+
+    r = encoders.encode(lambda v: ["ffmpeg", "-y", "-i", src, *v, "-c:a", "aac", out],
+                        crf=18, label="ffmpeg_cut", capture_output=True, text=True)
+
+encode() retries a failed hardware encode with the next entry of the ladder; an entry
+whose encodes keep failing while the fallback succeeds is disabled for the process.
+encode_pipe() does the same for an ffmpeg process fed through stdin (rawvideo frames).
+codec="hevc" selects from the H.265 entries and falls back to H.264 when none works; MPEG-4
+Part 2 (mpeg4) is the last resort behind both.
+Per-encoder frames/seconds/fps are kept in stats().
+
+Configuration:
+  VIDEO_ENCODER=auto           or a ladder id (h264_nvenc, h264_qsv, libx264, ...) to pin it
+  VIDEO_ENCODER_LADDER         comma-separated ids, overrides the default order
+  X264_PRESET=medium           libx264 preset
+  X265_PRESET=medium           libx265 preset
+  VIDEO_ENCODER_MAX_FAILURES=3 consecutive fallbacks before an entry is disabled
+
+The GPU server carries a copy of this module (upscale/vastai_deployment/encoders.py).
+"""
+import os
+import time
+import threading
+import subprocess
+from typing import IO, Callable, Dict, List, Optional
+
+try:
+    from . import profiling
+except ImportError:  # standalone copy on the GPU server
+    import profiling
+
+
+X264_PRESET = os.getenv("X264_PRESET", "medium")
+X265_PRESET = os.getenv("X265_PRESET", "medium")
+MAX_FAILURES = max(1, int(os.getenv("VIDEO_ENCODER_MAX_FAILURES", "3")))
+
+
+def _nvenc(crf: int) -> List[str]:
+    # p-presets (ffmpeg >= 4.3 / NVENC SDK 10); constant-quality VBR, cq ~ crf + 1
+    return ["-c:v", "h264_nvenc", "-preset", "p5", "-tune", "hq", "-rc", "vbr",
+            "-cq", str(crf + 1), "-b:v", "0", "-profile:v", "high", "-pix_fmt", "yuv420p"]
+
+
+def _nvenc_legacy(crf: int) -> List[str]:
+    # Older ffmpeg builds without p-presets
+    return ["-c:v", "h264_nvenc", "-preset", "slow", "-rc", "vbr_hq",
+            "-cq", str(crf + 1), "-b:v", "0", "-profile:v", "high", "-pix_fmt", "yuv420p"]
+
+
+def _qsv(crf: int) -> List[str]:
+    return ["-c:v", "h264_qsv", "-preset", "medium", "-global_quality", str(crf + 2),
+            "-pix_fmt", "nv12"]
+
+
+def _x264(crf: int) -> List[str]:
+    return ["-c:v", "libx264", "-crf", str(crf), "-preset", X264_PRESET]
+
+
+def _openh264(crf: int) -> List[str]:
+    # No constant-quality mode; bitrate roughly matching crf 18..23 at 1080p
+    return ["-c:v", "libopenh264", "-b:v", "8M" if crf <= 20 else "5M", "-pix_fmt", "yuv420p"]
+
+
+def _mpeg4(crf: int) -> List[str]:
+    return ["-c:v", "mpeg4", "-q:v", "2" if crf <= 20 else "4"]
+
+
+def _hevc_nvenc(crf: int) -> List[str]:
+    # HEVC holds the same quality at a higher cq; hvc1 tag keeps Apple players happy
+    return ["-c:v", "hevc_nvenc", "-preset", "p5", "-tune", "hq", "-rc", "vbr",
+            "-cq", str(crf + 3), "-b:v", "0", "-pix_fmt", "yuv420p", "-tag:v", "hvc1"]
+
+
+def _x265(crf: int) -> List[str]:
+    return ["-c:v", "libx265", "-crf", str(crf + 2), "-preset", X265_PRESET,
+            "-pix_fmt", "yuv420p", "-tag:v", "hvc1", "-x265-params", "log-level=error"]
+
+
+# (ladder id, ffmpeg encoder name, args builder, hardware, codec)
+LADDER = [
+    ("h264_nvenc", "h264_nvenc", _nvenc, True, "h264"),
+    ("h264_nvenc_legacy", "h264_nvenc", _nvenc_legacy, True, "h264"),
+    ("h264_qsv", "h264_qsv", _qsv, True, "h264"),
+    ("libx264", "libx264", _x264, False, "h264"),
+    ("libopenh264", "libopenh264", _openh264, False, "h264"),
+    ("mpeg4", "mpeg4", _mpeg4, False, "mpeg4"),
+    ("hevc_nvenc", "hevc_nvenc", _hevc_nvenc, True, "hevc"),
+    ("libx265", "libx265", _x265, False, "hevc"),
+]
+_BY_ID = {entry[0]: entry for entry in LADDER}
+# Codecs tried, in order, when no entry of the requested codec works
+_FALLBACK = {"hevc": ["h264", "mpeg4"], "h264": ["mpeg4"]}
+
+_lock = threading.Lock()
+_usable: Optional[List[str]] = None
+_probe_info: Dict = {}
+_strikes: Dict[str, int] = {}
+_disabled: Dict[str, str] = {}
+_stats: Dict[str, Dict] = {}
+
+
+def _ladder_ids() -> List[str]:
+    raw = os.getenv("VIDEO_ENCODER_LADDER", "")
+    ids = [x.strip() for x in raw.split(",") if x.strip() in _BY_ID] if raw else [e[0] for e in LADDER]
+    pinned = (os.getenv("VIDEO_ENCODER") or "auto").strip()
+    if pinned != "auto" and pinned in _BY_ID:
+        ids = [pinned] + [i for i in ids if i != pinned]
+    return ids
+
+
+def list_ffmpeg_encoders() -> List[str]:
+    """Encoder names from `ffmpeg -encoders` (empty if ffmpeg is missing)."""
+    try:
+        r = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=20)
+    except Exception:
+        return []
+    names = []
+    for line in r.stdout.splitlines():
+        parts = line.split()
+        # " V....D libx264   libx264 H.264 / AVC ..." (flags column, then the name)
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in "VAS":
+            names.append(parts[1])
+    return names
+
+
+def _test_encode(entry_id: str) -> Optional[str]:
+    """Encode a few synthetic frames; returns None if the entry works, else the error."""
+    build = _BY_ID[entry_id][2]
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+           "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30:duration=0.3",
+           *build(23), "-f", "null", "-"]
+    try:
+        r = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except Exception as e:
+        return str(e)
+    if r.returncode != 0:
+        return (r.stderr or r.stdout or f"exit {r.returncode}").strip().splitlines()[-1]
+    return None
+
+
+def probe(force: bool = False) -> List[str]:
+    """Usable ladder ids in preference order (probed once per process)."""
+    global _usable
+    with _lock:
+        if _usable is not None and not force:
+            return list(_usable)
+        t0 = time.time()
+        listed = set(list_ffmpeg_encoders())
+        usable, rejected = [], {}
+        for entry_id in _ladder_ids():
+            name = _BY_ID[entry_id][1]
+            if name not in listed or any(_BY_ID[u][1] == name for u in usable):
+                continue
+            err = _test_encode(entry_id)
+            if err is None:
+                usable.append(entry_id)
+            else:
+                rejected[entry_id] = err
+        _usable = usable
+        _probe_info.clear()
+        _probe_info.update({
+            "listed": sorted(n for n in listed if n in {e[1] for e in LADDER}),
+            "usable": usable,
+            "rejected": rejected,
+            "probe_seconds": round(time.time() - t0, 2),
+        })
+        if usable:
+            print(f"🎞️ Video encoders: {', '.join(usable)}")
+        else:
+            print("⚠️ No working H.264 encoder found in ffmpeg; falling back to libx264 arguments")
+        return list(usable)
+
+
+def warm_up() -> None:
+    """Probe in a background thread so the first encode does not pay for it."""
+    threading.Thread(target=probe, daemon=True).start()
+
+
+def _candidates(codec: str = "h264") -> List[str]:
+    usable = [i for i in probe() if i not in _disabled]
+    ids = [i for i in usable if _BY_ID[i][4] == codec]
+    for fallback in _FALLBACK.get(codec, []):
+        # A failing hardware HEVC encoder still has the H.264 ladder behind it
+        ids += [i for i in usable if _BY_ID[i][4] == fallback]
+    return ids or ["libx264"]
+
+
+def selected(codec: str = "h264") -> str:
+    """Ladder id that encode()/video_args() currently use for the codec."""
+    return _candidates(codec)[0]
+
+
+def video_args(crf: int = 18, entry_id: Optional[str] = None, codec: str = "h264") -> List[str]:
+    """Video encoder arguments for the selected (or given) ladder entry at an x264-crf-like quality."""
+    return _BY_ID[entry_id or selected(codec)][2](crf)
+
+
+def _account(entry_id: str, ok: bool, wall: float, frames: Optional[int]) -> None:
+    with _lock:
+        st = _stats.setdefault(entry_id, {"runs": 0, "failures": 0, "frames": 0, "seconds": 0.0})
+        st["runs"] += 1
+        if not ok:
+            st["failures"] += 1
+            return
+        if frames:
+            st["frames"] += frames
+            st["seconds"] += wall
+
+
+def _strike(entry_id: str, reason: str) -> None:
+    with _lock:
+        _strikes[entry_id] = _strikes.get(entry_id, 0) + 1
+        if _strikes[entry_id] >= MAX_FAILURES and entry_id not in _disabled:
+            _disabled[entry_id] = reason
+            print(f"⚠️ Disabling video encoder {entry_id} after {MAX_FAILURES} failed encodes: {reason}")
+
+
+def _walk(codec: str, attempt: Callable[[str], subprocess.CompletedProcess]) -> subprocess.CompletedProcess:
+    """Call attempt(entry_id) down the ladder while a hardware encoder fails."""
+    failed_hw: List[str] = []
+    result = None
+    for entry_id in _candidates(codec):
+        hardware = _BY_ID[entry_id][3]
+        result = attempt(entry_id)
+        result.encoder = entry_id
+        if result.returncode == 0:
+            with _lock:
+                _strikes.pop(entry_id, None)
+            for hw in failed_hw:
+                # The input was fine, so the hardware encoder itself is at fault
+                _strike(hw, f"fell back to {entry_id}")
+            return result
+        if not hardware:
+            # Software encoders fail on bad input, not on missing hardware; don't mask that
+            return result
+        failed_hw.append(entry_id)
+        err = result.stderr if isinstance(result.stderr, str) else (result.stderr or b"").decode(errors="replace")
+        print(f"⚠️ {entry_id} encode failed, trying next encoder: {(err or '').strip()[-300:]}")
+    return result
+
+
+def encode(build_cmd: Callable[[List[str]], List[str]], crf: int = 18, label: str = "ffmpeg_encode",
+           codec: str = "h264", **run_kwargs) -> subprocess.CompletedProcess:
+    """
+    Run an ffmpeg command built by build_cmd(video_args) through profiling.run, walking
+    down the ladder while a hardware encoder fails. Returns the last CompletedProcess
+    (its .encoder is the ladder id that produced it).
+    """
+    def attempt(entry_id: str) -> subprocess.CompletedProcess:
+        t0 = time.perf_counter()
+        result = profiling.run(build_cmd(video_args(crf, entry_id)), label=f"{label}:{entry_id}", **run_kwargs)
+        wall = time.perf_counter() - t0
+        prof = (getattr(result, "profile", None) or {}).get("ffmpeg") or {}
+        _account(entry_id, result.returncode == 0, wall, prof.get("frame"))
+        return result
+    return _walk(codec, attempt)
+
+
+def encode_pipe(build_cmd: Callable[[List[str]], List[str]], feed: Callable[[IO[bytes]], int], crf: int = 18,
+                label: str = "ffmpeg_pipe", codec: str = "h264") -> subprocess.CompletedProcess:
+    """
+    Like encode(), for an ffmpeg reading from stdin ("-i -"): feed(stdin) writes the input
+    and returns the number of frames written. feed is called again from the start when the
+    ladder falls back, so it must be restartable (e.g. frames read from disk).
+    """
+    def attempt(entry_id: str) -> subprocess.CompletedProcess:
+        argv = build_cmd(video_args(crf, entry_id))
+        t0 = time.perf_counter()
+        frames = 0
+        with profiling.timed(f"{label}:{entry_id}", argv) as rec:
+            proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            # Drain stderr concurrently so a chatty ffmpeg cannot block on a full pipe
+            err_chunks: List[bytes] = []
+            drain = threading.Thread(target=lambda: err_chunks.append(proc.stderr.read()), daemon=True)
+            drain.start()
+            try:
+                frames = feed(proc.stdin)
+            except BrokenPipeError:
+                pass  # ffmpeg exited early; its return code and stderr say why
+            finally:
+                try:
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass
+            returncode = proc.wait()
+            drain.join(timeout=10)
+            rec["returncode"] = returncode
+            rec["frames"] = frames
+        wall = time.perf_counter() - t0
+        _account(entry_id, returncode == 0, wall, frames)
+        stderr = b"".join(err_chunks).decode(errors="replace")
+        return subprocess.CompletedProcess(argv, returncode, None, stderr)
+    return _walk(codec, attempt)
+
+
+def stats() -> Dict:
+    """Probe result and per-encoder runs/failures/fps since process start."""
+    with _lock:
+        per = {}
+        for entry_id, st in _stats.items():
+            per[entry_id] = dict(st, seconds=round(st["seconds"], 3),
+                                 fps=round(st["frames"] / st["seconds"], 1) if st["seconds"] else None)
+        usable = [i for i in (_usable or []) if i not in _disabled]
+        return {
+            "selected": {
+                codec: next((i for i in usable if _BY_ID[i][4] == codec), None)
+                for codec in ("h264", "hevc", "mpeg4")
+            } if _usable is not None else None,
+            "probe": dict(_probe_info),
+            "disabled": dict(_disabled),
+            "encoders": per,
+        }
+
+
+def _self_test() -> int:
+    """python -m app.encoders: probe, then encode a 3 s 720p test clip with every usable entry."""
+    import tempfile
+    usable = probe()
+    if not usable:
+        print("❌ No usable encoder")
+        return 1
+    rc = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for entry_id in usable:
+            out = os.path.join(tmp, f"{entry_id}.mp4")
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+                   "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30:duration=3",
+                   *video_args(18, entry_id), out]
+            t0 = time.perf_counter()
+            r = profiling.run(cmd, label=f"encoder_self_test:{entry_id}", capture_output=True, text=True)
+            wall = time.perf_counter() - t0
+            if r.returncode != 0 or not os.path.exists(out) or os.path.getsize(out) == 0:
+                print(f"❌ {entry_id}: {(r.stderr or '').strip()[-300:]}")
+                rc = 1
+                continue
+            print(f"✅ {entry_id}: 90 frames in {wall:.2f}s ({90 / max(wall, 1e-6):.1f} fps), {os.path.getsize(out)} bytes")
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(_self_test())
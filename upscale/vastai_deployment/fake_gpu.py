@@ -0,0 +1,140 @@
+"""
+Fake GPU mode for server.py (FAKE_GPU=1): same HTTP API, no CUDA/ESRGAN/Whisper/OpenAI.
+
+Jobs are file copies that take a configurable amount of time, so the orchestrator
+(queues, slot accounting, retries) can be load-tested on a laptop:
+
+  FAKE_GPU_LATENCY=2.0       base seconds per job
+  FAKE_GPU_JITTER=0.2        +/- fraction applied to the job time
+  FAKE_GPU_MBPS=0            extra time = input MB / MBPS (0 = size does not matter)
+  FAKE_GPU_FAILURE_RATE=0.0  probability that a job fails
+  FAKE_GPU_SLOTS=1           jobs processed concurrently (the rest wait, reported as processing)
+  FAKE_GPU_CLIPS=3           clips produced by a fake cut job
+  FAKE_GPU_SEED              RNG seed for reproducible failure patterns
+"""
+import os
+import json
+import time
+import random
+import shutil
+import threading
+
+import archive
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except Exception:
+        return default
+
+
+def enabled() -> bool:
+    return str(os.environ.get('FAKE_GPU', '')).strip().lower() in ('1', 'true', 'yes')
+
+
+class FakeGpu:
+    def __init__(self):
+        self.latency = _env_float('FAKE_GPU_LATENCY', 2.0)
+        self.jitter = _env_float('FAKE_GPU_JITTER', 0.2)
+        self.mbps = _env_float('FAKE_GPU_MBPS', 0.0)
+        self.failure_rate = _env_float('FAKE_GPU_FAILURE_RATE', 0.0)
+        self.clips = max(1, int(_env_float('FAKE_GPU_CLIPS', 3)))
+        seed = os.environ.get('FAKE_GPU_SEED')
+        self._rng = random.Random(int(seed) if seed else None)
+        self._rng_lock = threading.Lock()
+        self._slots = threading.Semaphore(max(1, int(_env_float('FAKE_GPU_SLOTS', 1))))
+
+    def config(self) -> dict:
+        return {
+            "latency": self.latency, "jitter": self.jitter, "mbps": self.mbps,
+            "failure_rate": self.failure_rate, "clips": self.clips,
+        }
+
+    def _plan(self, input_path: str | None) -> tuple[float, bool]:
+        """(simulated seconds, whether the job fails) for one job."""
+        with self._rng_lock:
+            jitter = self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.failure_rate
+        seconds = self.latency * (1.0 + jitter)
+        if self.mbps > 0 and input_path and os.path.isfile(input_path):
+            seconds += os.path.getsize(input_path) / (1024 * 1024) / self.mbps
+        return max(0.0, seconds), fail
+
+    def _work(self, input_path: str | None) -> None:
+        """Hold a slot for the simulated processing time; raise on a simulated failure."""
+        seconds, fail = self._plan(input_path)
+        with self._slots:
+            time.sleep(seconds)
+        if fail:
+            raise RuntimeError("simulated GPU failure (FAKE_GPU_FAILURE_RATE)")
+
+    def upscale(self, input_path: str, output_path: str) -> bool:
+        self._work(input_path)
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        tmp = output_path + '.part'
+        shutil.copyfile(input_path, tmp)
+        os.replace(tmp, output_path)
+        return True
+
+    def cut(self, input_path: str | None, out_dir: str, safe: str, on_file=None) -> tuple[str, str]:
+        """
+        Produce the same layout as a real cut job: <out_dir>/<safe>/ with transcript, clips.json
+        and clip_<n>_*.mp4 (copies of the input), zipped to <out_dir>/<safe>.zip.
+        The simulated time is split between analysis and the clips, and on_file(path) is called
+        as each output is written, so clips become ready one by one like in a real job.
+        Returns (dest_dir, archive_path).
+        """
+        seconds, fail = self._plan(input_path)
+        step = seconds / (self.clips + 1)
+        self._slots.acquire()
+        try:
+            time.sleep(step)
+            if fail:
+                raise RuntimeError("simulated GPU failure (FAKE_GPU_FAILURE_RATE)")
+            return self._write_cut(input_path, out_dir, safe, step, on_file)
+        finally:
+            self._slots.release()
+
+    def _write_cut(self, input_path: str | None, out_dir: str, safe: str, step: float, on_file) -> tuple[str, str]:
+        dest_dir = os.path.join(out_dir, safe)
+        os.makedirs(dest_dir, exist_ok=True)
+        transcript = [{"start": 0.0, "end": 1.0, "text": "fake transcript"}]
+        clips = [
+            {
+                "short_id": i,
+                "title": f"Fake clip {i}",
+                "description": "Generated by FAKE_GPU mode",
+                "fragments": [{"start": "00:00:00.000", "end": "00:00:01.000", "text": "fake transcript"}],
+            }
+            for i in range(1, self.clips + 1)
+        ]
+        tr_path = os.path.join(dest_dir, f"{safe}_transcript.json")
+        clips_json_path = os.path.join(dest_dir, f"{safe}_clips.json")
+        with open(tr_path, 'w', encoding='utf-8') as f:
+            json.dump(transcript, f)
+        with open(clips_json_path, 'w', encoding='utf-8') as f:
+            json.dump(clips, f)
+        zipper = archive.IncrementalZip(os.path.join(out_dir, f"{safe}.zip"))
+        try:
+            for p in (tr_path, clips_json_path):
+                zipper.add(p, os.path.relpath(p, out_dir))
+                if on_file:
+                    on_file(p)
+            for i in range(1, self.clips + 1):
+                if i > 1:
+                    time.sleep(step)
+                p = os.path.join(dest_dir, f"clip_{i}_Fake_clip_{i}.mp4")
+                if input_path and os.path.isfile(input_path):
+                    shutil.copyfile(input_path, p)
+                else:
+                    with open(p, 'wb') as f:
+                        f.write(b'\0' * 1024)
+                zipper.add(p, os.path.relpath(p, out_dir))
+                if on_file:
+                    on_file(p)
+            time.sleep(step)
+            return dest_dir, zipper.close()
+        except BaseException:
+            zipper.abort()
+            raise
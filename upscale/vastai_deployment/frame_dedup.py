@@ -0,0 +1,290 @@
+"""
+Near-duplicate frame skipping for the Real-ESRGAN step of an upscale.
+
+Interview footage is mostly a static background with a talking head: consecutive frames are
+often identical or differ in one small area. After extraction each frame is compared, on a
+downscaled luma copy, with what the upscaled output currently shows (the reference):
+
+  duplicate   no block changed and the mean abs diff is tiny -> reuse the previous output frame
+  roi         the changed blocks fit in a small box -> upscale only that crop (with context
+              padding) and paste it into the previous output frame
+  full        anything else, a scene cut, or MAX_RUN frames since the last full frame
+
+  UPSCALE_DEDUP=0                      1 to enable (off: every frame goes through ESRGAN as before)
+  UPSCALE_DEDUP_THRESHOLD=1.0          mean abs diff (0-255) up to which a frame is a duplicate
+  UPSCALE_DEDUP_BLOCK_THRESHOLD=6.0    mean abs diff that marks an 8x8 block of the copy as changed
+  UPSCALE_DEDUP_ROI=auto               ROI upscaling: 1 | 0 | auto (off with GFPGAN face enhancement,
+                                       which does not find a face in a partial crop)
+  UPSCALE_DEDUP_ROI_MAX_AREA=0.25      largest changed box (fraction of the frame) done as ROI
+  UPSCALE_DEDUP_SCENE_THRESHOLD=30.0   mean abs diff treated as a scene cut
+  UPSCALE_DEDUP_MAX_RUN=48             full frame at least this often (bounds drift)
+
+apply() returns per-video counts (full/roi/duplicate, share of pixels sent to ESRGAN), also
+exported as gpu_upscale_dedup_frames_total. quality() scores a dedup run against a full run:
+
+    python frame_dedup.py full.mp4 dedup.mp4     # PSNR / SSIM per frame, mean and worst
+"""
+import os
+import re
+import sys
+import json
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import metrics as _metrics
+except Exception:
+    _metrics = None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except Exception:
+        return default
+
+
+DEDUP = str(os.environ.get('UPSCALE_DEDUP', '0')).strip().lower() in ('1', 'true', 'yes')
+THRESHOLD = _env_float('UPSCALE_DEDUP_THRESHOLD', 1.0)
+BLOCK_THRESHOLD = _env_float('UPSCALE_DEDUP_BLOCK_THRESHOLD', 6.0)
+ROI_MODE = (os.environ.get('UPSCALE_DEDUP_ROI') or 'auto').strip().lower()
+ROI_MAX_AREA = _env_float('UPSCALE_DEDUP_ROI_MAX_AREA', 0.25)
+SCENE_THRESHOLD = _env_float('UPSCALE_DEDUP_SCENE_THRESHOLD', 30.0)
+MAX_RUN = max(1, int(_env_float('UPSCALE_DEDUP_MAX_RUN', 48)))
+
+ANALYSIS_WIDTH = 160  # width of the luma copy frames are compared on
+BLOCK = 8             # block size (in copy pixels) for locating changes
+ROI_PAD = 24          # source pixels of context around a changed box; half of it is pasted back
+
+_NAME_RE = re.compile(r'^(frame|roi)_(\d+)')
+
+if _metrics is not None:
+    DEDUP_FRAMES = _metrics.Counter(
+        "gpu_upscale_dedup_frames_total",
+        "Extracted frames by how the upscaler handled them (full, roi, duplicate)",
+        ["kind"],
+    )
+else:
+    DEDUP_FRAMES = None
+
+
+def roi_enabled(face_enhance: bool) -> bool:
+    if ROI_MODE in ('1', 'true', 'yes', 'on'):
+        return True
+    if ROI_MODE in ('0', 'false', 'no', 'off'):
+        return False
+    return not face_enhance
+
+
+def _small(path: str) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+    """(luma copy as float32 with sides a multiple of BLOCK, (width, height) of the source)."""
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    sw = max(BLOCK, min(ANALYSIS_WIDTH, w) // BLOCK * BLOCK)
+    sh = max(BLOCK, round(h * sw / w) // BLOCK * BLOCK)
+    return cv2.resize(img, (sw, sh), interpolation=cv2.INTER_AREA).astype(np.float32), (w, h)
+
+
+def _boxes(bx0: int, by0: int, bx1: int, by1: int, copy_shape, size) -> Tuple[list, list]:
+    """Changed block range -> (crop box with ROI_PAD context, paste box with half of it), source pixels."""
+    sh, sw = copy_shape
+    w, h = size
+    fx, fy = w / sw, h / sh
+    x0, y0 = int(bx0 * BLOCK * fx), int(by0 * BLOCK * fy)
+    x1, y1 = min(w, int(np.ceil(bx1 * BLOCK * fx))), min(h, int(np.ceil(by1 * BLOCK * fy)))
+
+    def grow(pad):
+        return [max(0, x0 - pad), max(0, y0 - pad), min(w, x1 + pad), min(h, y1 + pad)]
+
+    return grow(ROI_PAD), grow(ROI_PAD // 2)
+
+
+def plan(frames_dir: str, roi: bool = True) -> List[dict]:
+    """
+    Decide per extracted frame (in order) how it is produced:
+    {"index", "name", "kind": full|roi|duplicate, "crop"/"paste": [x0, y0, x1, y1] for roi}.
+    """
+    names = sorted(fn for fn in os.listdir(frames_dir) if _NAME_RE.match(fn) and fn.lower().endswith('.png'))
+    entries = []
+    ref = None
+    since_full = 0
+    for name in names:
+        entry = {"index": int(_NAME_RE.match(name).group(2)), "name": name, "kind": "full"}
+        cur = _small(os.path.join(frames_dir, name))
+        if ref is not None and cur is not None and cur[0].shape == ref[0].shape and since_full < MAX_RUN:
+            diff = np.abs(cur[0] - ref[0])
+            mean = float(diff.mean())
+            if mean < SCENE_THRESHOLD:
+                sh, sw = diff.shape
+                changed = diff.reshape(sh // BLOCK, BLOCK, sw // BLOCK, BLOCK).mean(axis=(1, 3)) > BLOCK_THRESHOLD
+                if not changed.any():
+                    # A small change spread over the whole frame (fade, exposure) is not a duplicate
+                    if mean <= THRESHOLD:
+                        entry["kind"] = "duplicate"
+                elif roi:
+                    ys, xs = np.nonzero(changed)
+                    by0, by1, bx0, bx1 = int(ys.min()), int(ys.max()) + 1, int(xs.min()), int(xs.max()) + 1
+                    if (by1 - by0) * (bx1 - bx0) / changed.size <= ROI_MAX_AREA:
+                        entry["kind"] = "roi"
+                        entry["crop"], entry["paste"] = _boxes(bx0, by0, bx1, by1, diff.shape, cur[1])
+                        # The output now shows this frame inside the changed blocks
+                        ys0, ys1, xs0, xs1 = by0 * BLOCK, by1 * BLOCK, bx0 * BLOCK, bx1 * BLOCK
+                        ref[0][ys0:ys1, xs0:xs1] = cur[0][ys0:ys1, xs0:xs1]
+        if entry["kind"] == "full":
+            ref = cur
+            since_full = 0
+        else:
+            since_full += 1
+        entries.append(entry)
+    return entries
+
+
+def apply(frames_dir: str, entries: List[dict]) -> Dict:
+    """
+    Leave only ESRGAN's work in frames_dir: duplicates are removed, roi frames are replaced by
+    their crop (roi_<index>.png). Returns the per-video stats.
+    """
+    stats = {"frames": len(entries), "full": 0, "roi": 0, "duplicate": 0, "esrgan_inputs": 0}
+    size = _png_size(os.path.join(frames_dir, entries[0]["name"])) if entries else None
+    area = size[0] * size[1] if size else 0
+    pixels = 0
+    for entry in entries:
+        path = os.path.join(frames_dir, entry["name"])
+        kind = entry["kind"]
+        stats[kind] += 1
+        if kind == "duplicate":
+            os.remove(path)
+            continue
+        if kind == "roi":
+            x0, y0, x1, y1 = entry["crop"]
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            cv2.imwrite(os.path.join(frames_dir, f"roi_{entry['index']:06d}.png"), img[y0:y1, x0:x1])
+            os.remove(path)
+            pixels += (x1 - x0) * (y1 - y0)
+        else:
+            pixels += area
+        stats["esrgan_inputs"] += 1
+    stats["esrgan_pixel_share"] = round(pixels / (area * len(entries)), 4) if area else 1.0
+    if DEDUP_FRAMES is not None:
+        for kind in ("full", "roi", "duplicate"):
+            DEDUP_FRAMES.inc(stats[kind], kind=kind)
+    return stats
+
+
+def _png_size(path: str) -> Optional[Tuple[int, int]]:
+    with open(path, 'rb') as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != b'\x89PNG\r\n\x1a\n':
+        return None
+    return int.from_bytes(head[16:20], 'big'), int.from_bytes(head[20:24], 'big')
+
+
+def _link(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def reconstruct(output_frames_dir: str, entries: List[dict]) -> int:
+    """
+    Turn ESRGAN's outputs back into one upscaled frame per extracted frame, named
+    frame_<index>.png: duplicates link the previous output, roi crops are pasted into it.
+    Returns the number of frames.
+    """
+    outputs = {}
+    for fn in os.listdir(output_frames_dir):
+        m = _NAME_RE.match(fn)
+        if m:
+            outputs[(m.group(1), int(m.group(2)))] = fn
+    prev_path, prev_img = None, None
+    for entry in entries:
+        idx = entry["index"]
+        dst = os.path.join(output_frames_dir, f"frame_{idx:06d}.png")
+        kind = entry["kind"]
+        if kind == "full":
+            fn = outputs.get(("frame", idx))
+            if fn is None:
+                raise RuntimeError(f"Real-ESRGAN output missing for frame {idx}")
+            if os.path.join(output_frames_dir, fn) != dst:
+                os.replace(os.path.join(output_frames_dir, fn), dst)
+            prev_path, prev_img = dst, None
+            continue
+        if prev_path is None:
+            raise RuntimeError(f"Frame {idx} has no previous output to reuse")
+        if kind == "duplicate":
+            _link(prev_path, dst)
+            prev_path = dst
+            continue
+        fn = outputs.get(("roi", idx))
+        if fn is None:
+            raise RuntimeError(f"Real-ESRGAN output missing for ROI of frame {idx}")
+        crop = cv2.imread(os.path.join(output_frames_dir, fn), cv2.IMREAD_COLOR)
+        base = (prev_img if prev_img is not None else cv2.imread(prev_path, cv2.IMREAD_COLOR)).copy()
+        cx0, cy0, cx1, cy1 = entry["crop"]
+        px0, py0, px1, py1 = entry["paste"]
+        scale = crop.shape[1] / (cx1 - cx0)
+        s = lambda v: int(round(v * scale))
+        base[s(py0):s(py1), s(px0):s(px1)] = crop[s(py0 - cy0):s(py1 - cy0), s(px0 - cx0):s(px1 - cx0)]
+        cv2.imwrite(dst, base)
+        os.remove(os.path.join(output_frames_dir, fn))
+        prev_path, prev_img = dst, base
+    return len(entries)
+
+
+def _ssim(a: np.ndarray, b: np.ndarray) -> float:
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a * mu_a
+    var_b = blur(b * b) - mu_b * mu_b
+    cov = blur(a * b) - mu_a * mu_b
+    ssim = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a * mu_a + mu_b * mu_b + c1) * (var_a + var_b + c2))
+    return float(ssim.mean())
+
+
+def quality(reference_video: str, candidate_video: str, step: int = 1) -> Dict:
+    """PSNR (dB, luma) and SSIM of candidate vs reference, every `step`-th frame: mean and worst."""
+    ref_cap, cand_cap = cv2.VideoCapture(reference_video), cv2.VideoCapture(candidate_video)
+    psnrs, ssims = [], []
+    i = 0
+    try:
+        while True:
+            ok_a, a = ref_cap.read()
+            ok_b, b = cand_cap.read()
+            if not ok_a or not ok_b:
+                break
+            i += 1
+            if (i - 1) % step:
+                continue
+            if a.shape != b.shape:
+                raise ValueError(f"Frame size differs: {a.shape[1]}x{a.shape[0]} vs {b.shape[1]}x{b.shape[0]}")
+            a = cv2.cvtColor(a, cv2.COLOR_BGR2GRAY).astype(np.float64)
+            b = cv2.cvtColor(b, cv2.COLOR_BGR2GRAY).astype(np.float64)
+            mse = float(np.mean((a - b) ** 2))
+            psnrs.append(100.0 if mse == 0 else 10 * np.log10(255.0 ** 2 / mse))
+            ssims.append(_ssim(a, b))
+    finally:
+        ref_cap.release()
+        cand_cap.release()
+    if not psnrs:
+        raise ValueError("No frames to compare")
+    return {
+        "frames": len(psnrs),
+        "psnr": round(float(np.mean(psnrs)), 3),
+        "psnr_min": round(float(np.min(psnrs)), 3),
+        "ssim": round(float(np.mean(ssims)), 5),
+        "ssim_min": round(float(np.min(ssims)), 5),
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("usage: python frame_dedup.py FULL_RUN.mp4 DEDUP_RUN.mp4 [STEP]")
+        sys.exit(2)
+    print(json.dumps(quality(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 1), indent=2))
@@ -0,0 +1,107 @@
+"""
+Shared GPU work queue for the ESRGAN step of every job on this server.
+
+Callers extract frames themselves (CPU, in their own thread), submit the prepared unit and
+wait on the returned Future. One dispatcher thread owns the GPU: it waits up to
+GPU_BATCH_WINDOW_SECONDS for more units, groups the pending ones by frame size and hands
+each group to run_batch (one Real-ESRGAN process for several clips, possibly from different
+jobs). Every unit gets its own result, so a failed clip does not fail its batch mates.
+
+  GPU_BATCH_WINDOW_SECONDS=1.0   how long the first unit waits for company
+  GPU_BATCH_MAX_UNITS=4          units per ESRGAN run
+  GPU_BATCH_MAX_FRAMES=6000      frames per ESRGAN run (bounds the shared frames dir)
+"""
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except Exception:
+        return default
+
+
+BATCH_WINDOW_SECONDS = _env_float('GPU_BATCH_WINDOW_SECONDS', 1.0)
+BATCH_MAX_UNITS = max(1, int(_env_float('GPU_BATCH_MAX_UNITS', 4)))
+BATCH_MAX_FRAMES = max(1, int(_env_float('GPU_BATCH_MAX_FRAMES', 6000)))
+
+
+class GpuQueue:
+    def __init__(self, run_batch: Callable[[list], List[bool]], window: float = BATCH_WINDOW_SECONDS,
+                 max_units: int = BATCH_MAX_UNITS, max_frames: int = BATCH_MAX_FRAMES):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_units = max_units
+        self.max_frames = max_frames
+        self._pending = deque()  # (unit, future, submitted_at)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats = {"batches": 0, "units": 0, "failed_units": 0, "busy_seconds": 0.0}
+
+    def submit(self, unit) -> Future:
+        """Queue a prepared unit (needs .size and .frames); the Future resolves to True/False."""
+        fut = Future()
+        with self._cond:
+            self._pending.append((unit, fut, time.time()))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="gpu-queue", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return fut
+
+    def _take_batch(self) -> list:
+        """Oldest pending unit plus the later ones with the same frame size, within the limits."""
+        first = self._pending[0]
+        batch, frames = [], 0
+        for item in list(self._pending):
+            unit = item[0]
+            if unit.size != first[0].size:
+                continue
+            if batch and (len(batch) >= self.max_units or frames + unit.frames > self.max_frames):
+                break
+            batch.append(item)
+            frames += unit.frames
+        for item in batch:
+            self._pending.remove(item)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Give other clips/jobs a moment to join the first unit's batch
+                deadline = self._pending[0][2] + self.window
+                while len(self._pending) < self.max_units and time.time() < deadline:
+                    self._cond.wait(max(0.0, deadline - time.time()))
+                batch = self._take_batch()
+            units = [item[0] for item in batch]
+            t0 = time.time()
+            try:
+                results = list(self.run_batch(units))
+            except Exception as e:
+                print(f"[gpu-queue] batch of {len(units)} failed: {e}")
+                results = [False] * len(units)
+            results += [False] * (len(units) - len(results))
+            busy = time.time() - t0
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["units"] += len(units)
+                self._stats["failed_units"] += sum(1 for ok in results if not ok)
+                self._stats["busy_seconds"] += busy
+            for (_, fut, _), ok in zip(batch, results):
+                fut.set_result(bool(ok))
+
+    def stats(self) -> dict:
+        with self._cond:
+            out = dict(self._stats)
+            out["pending"] = len(self._pending)
+        out["avg_batch"] = round(out["units"] / out["batches"], 2) if out["batches"] else 0.0
+        out["busy_seconds"] = round(out["busy_seconds"], 2)
+        out.update(window=self.window, max_units=self.max_units, max_frames=self.max_frames)
+        return out
@@ -107,6 +107,31 @@ CUT_FORCE_DEVICE=cuda
 CUT_ENABLE_UPSCALE=1
 WHISPER_MODEL=small
 
+# Upscale reconstruction: rawvideo pipe into ffmpeg (NVENC when available) + source audio
+UPSCALE_WRITER=ffmpeg
+UPSCALE_CODEC=h264
+UPSCALE_CRF=18
+UPSCALE_AUDIO=1
+# Near-duplicate frame skipping (validate with: python frame_dedup.py full.mp4 dedup.mp4)
+UPSCALE_DEDUP=0
+# Real-ESRGAN tile size fitted to free VRAM, halved on out-of-memory
+REALESRGAN_TILE=auto
+# Shared ESRGAN queue (clips of all jobs batched by frame size)
+GPU_BATCH_WINDOW_SECONDS=1.0
+GPU_BATCH_MAX_UNITS=4
+CUT_UPSCALE_PARALLEL=4
+# Resource pools: stages of concurrent jobs overlap (GPU for Whisper/ESRGAN, network for GPT)
+POOL_GPU=1
+POOL_NET=4
+WHISPER_CACHE=1
+
+# HTTP serving: single gunicorn process (shared job table) with request threads;
+# SIGTERM drains running jobs for up to DRAIN_SECONDS before exiting
+SERVER_MODE=gunicorn
+GUNICORN_THREADS=16
+GUNICORN_KEEPALIVE=75
+DRAIN_SECONDS=1800
+
 # OpenAI API (set this manually)
 # OPENAI_API_KEY=your_key_here
 EOF
@@ -148,6 +173,9 @@ EnvironmentFile=/workspace/aporto/.env
 ExecStart=/workspace/aporto/.venv/bin/python upscale/vastai_deployment/server.py
 Restart=always
 RestartSec=10
+# SIGTERM only the gunicorn master; it drains running jobs (DRAIN_SECONDS) before exiting
+KillMode=mixed
+TimeoutStopSec=1900
 StandardOutput=append:/workspace/server.log
 StandardError=append:/workspace/server.log
 
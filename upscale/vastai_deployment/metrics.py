@@ -0,0 +1,276 @@
+"""
+Minimal Prometheus-compatible metrics (text exposition format 0.0.4), no external dependency.
+
+    STAGE_SECONDS.observe(12.3, stage="upload")
+    with stage_timer("transcribe"):
+        ...
+    render()  # -> text for GET /metrics
+
+Copy of app/metrics.py for the GPU server (deployed standalone, without the app package);
+keep the generic part in sync (checked by tests/test_shared_modules.py).
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_LabelKey = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict) -> _LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels_str(self, key: _LabelKey, extra: Optional[Dict] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels_str(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelKey, float] = {}
+        self._fn: Optional[Callable[[], Dict]] = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], Dict]) -> None:
+        """Compute values at scrape time: fn() -> {label value or tuple of label values: number}."""
+        self._fn = fn
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = dict(self._values)
+        if self._fn is not None:
+            try:
+                for k, v in (self._fn() or {}).items():
+                    key = k if isinstance(k, tuple) else (k,) if self.labelnames else ()
+                    items[tuple(str(x) for x in key)] = float(v)
+            except Exception:
+                pass
+        return [f"{self.name}{self._labels_str(k)} {_fmt(v)}" for k, v in items.items()]
+
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float("inf"),)
+        self._data: Dict[_LabelKey, List] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._data.items()]
+        out = []
+        for key, data in items:
+            for i, b in enumerate(self.buckets):
+                out.append(f"{self.name}_bucket{self._labels_str(key, {'le': _fmt(b)})} {data[i]}")
+            out.append(f"{self.name}_sum{self._labels_str(key)} {_fmt(data[-2])}")
+            out.append(f"{self.name}_count{self._labels_str(key)} {data[-1]}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---- GPU server metrics ----
+
+STAGE_SECONDS = Histogram(
+    "gpu_stage_duration_seconds",
+    "Wall time per GPU server stage",
+    ["job_type", "stage", "outcome"],
+)
+STAGE_FAILURES = Counter(
+    "gpu_stage_failures_total",
+    "GPU server stage executions that raised",
+    ["job_type", "stage"],
+)
+FRAMES_PER_SECOND = Histogram(
+    "gpu_frames_per_second",
+    "Frame throughput per video phase (extract, esrgan, encode)",
+    ["phase"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 240, 480),
+)
+BYTES_TOTAL = Counter(
+    "gpu_bytes_total",
+    "Bytes read and produced by GPU jobs",
+    ["job_type", "direction"],
+)
+JOBS = Gauge(
+    "gpu_jobs",
+    "Jobs known to the server by type and status",
+    ["job_type", "status"],
+)
+GPU_INFO = Gauge(
+    "gpu_device",
+    "nvidia-smi readings per GPU (utilization %, memory MiB)",
+    ["gpu", "metric"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str, job_type: str = "cut"):
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        STAGE_FAILURES.inc(job_type=job_type, stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, job_type=job_type, stage=stage, outcome=outcome)
+
+
+def observe_fps(phase: str, frames: int, seconds: float) -> None:
+    if frames and seconds and seconds > 0:
+        FRAMES_PER_SECOND.observe(frames / seconds, phase=phase)
+
+
+def add_bytes(job_type: str, direction: str, path: str) -> None:
+    try:
+        if path and os.path.isfile(path):
+            BYTES_TOTAL.inc(float(os.path.getsize(path)), job_type=job_type, direction=direction)
+    except Exception:
+        pass
+
+
+_gpu_cache = {"ts": 0.0, "values": {}}
+
+
+def nvidia_smi_readings(max_age: float = 5.0) -> Dict:
+    """{(gpu index, metric): value} from nvidia-smi, cached for a few seconds; empty without a GPU."""
+    import subprocess
+    now = time.time()
+    if now - _gpu_cache["ts"] < max_age:
+        return _gpu_cache["values"]
+    values = {}
+    try:
+        r = subprocess.run(
+            ["nvidia-smi", "--query-gpu=index,utilization.gpu,memory.used,memory.total",
+             "--format=csv,noheader,nounits"],
+            capture_output=True, text=True, timeout=5,
+        )
+        if r.returncode == 0:
+            for line in r.stdout.strip().splitlines():
+                parts = [p.strip() for p in line.split(",")]
+                if len(parts) == 4:
+                    idx, util, used, total = parts
+                    values[(idx, "utilization_percent")] = float(util)
+                    values[(idx, "memory_used_mib")] = float(used)
+                    values[(idx, "memory_total_mib")] = float(total)
+    except Exception:
+        pass
+    _gpu_cache.update(ts=now, values=values)
+    return values
+
+
+GPU_INFO.set_function(nvidia_smi_readings)
@@ -0,0 +1,121 @@
+"""
+Resource pools for the stages of GPU server jobs.
+
+Every job still runs in its own thread, but each stage first takes a slot in the pool of the
+resource it actually uses. Stages of different jobs then overlap instead of queueing behind
+whole jobs: job A waits on OpenAI (net) while job B transcribes (gpu) and job C cuts (cpu).
+
+  POOL_GPU=1                Whisper, clipsai resize, ESRGAN batches
+  POOL_CPU=<cores/2, >=1>   ffmpeg cutting, frame extraction, encoding
+  POOL_NET=4                yt-dlp downloads, OpenAI calls
+
+    with pools.use("gpu", "transcribe"):
+        ...
+
+stats() (GET /pools) reports per pool the slots in use, waiters, utilisation since start and
+over the last minute, and per-stage run/wait totals; the same numbers are exported on /metrics.
+"""
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+import metrics
+
+RECENT_SECONDS = 60.0
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except Exception:
+        return default
+
+
+class ResourcePool:
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self._sem = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._waiting = 0
+        self._started = time.time()
+        self._last_change = self._started
+        self._busy_seconds = 0.0  # integral of busy slots over time
+        self._history = deque()   # (ts, busy_seconds) at most once per second
+        self._stages: Dict[str, dict] = {}
+
+    def _advance(self, now: float) -> None:
+        """Accumulate busy slot-seconds up to now (caller holds the lock)."""
+        self._busy_seconds += self._busy * (now - self._last_change)
+        self._last_change = now
+        if not self._history or now - self._history[-1][0] >= 1.0:
+            self._history.append((now, self._busy_seconds))
+        while self._history and now - self._history[0][0] > RECENT_SECONDS:
+            self._history.popleft()
+
+    @contextmanager
+    def use(self, stage: str):
+        t0 = time.time()
+        with self._lock:
+            self._waiting += 1
+        self._sem.acquire()
+        acquired = time.time()
+        with self._lock:
+            self._waiting -= 1
+            self._advance(acquired)
+            self._busy += 1
+        try:
+            yield
+        finally:
+            now = time.time()
+            with self._lock:
+                self._advance(now)
+                self._busy -= 1
+                st = self._stages.setdefault(stage, {"runs": 0, "run_seconds": 0.0, "wait_seconds": 0.0})
+                st["runs"] += 1
+                st["run_seconds"] += now - acquired
+                st["wait_seconds"] += acquired - t0
+            self._sem.release()
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            self._advance(now)
+            uptime = max(now - self._started, 1e-6)
+            since, base = self._history[0] if self._history else (now, self._busy_seconds)
+            recent = (self._busy_seconds - base) / (self.size * max(now - since, 1e-6)) if now > since else self._busy / self.size
+            return {
+                "size": self.size,
+                "busy": self._busy,
+                "waiting": self._waiting,
+                "utilization": round(self._busy_seconds / (self.size * uptime), 4),
+                "utilization_recent": round(min(recent, 1.0), 4),
+                "stages": {k: {"runs": v["runs"], "run_seconds": round(v["run_seconds"], 2),
+                               "wait_seconds": round(v["wait_seconds"], 2)} for k, v in self._stages.items()},
+            }
+
+
+POOLS: Dict[str, ResourcePool] = {
+    "gpu": ResourcePool("gpu", _env_int("POOL_GPU", 1)),
+    "cpu": ResourcePool("cpu", _env_int("POOL_CPU", max(1, (os.cpu_count() or 2) // 2))),
+    "net": ResourcePool("net", _env_int("POOL_NET", 4)),
+}
+
+
+def use(pool: str, stage: str):
+    """Context manager holding one slot of POOLS[pool] for the duration of a stage."""
+    return POOLS[pool].use(stage)
+
+
+def stats() -> dict:
+    return {name: p.stats() for name, p in POOLS.items()}
+
+
+POOL_SLOTS = metrics.Gauge("gpu_pool_slots", "Resource pool slots by state (size, busy, waiting)", ["pool", "state"])
+POOL_UTILIZATION = metrics.Gauge("gpu_pool_utilization", "Busy fraction of a resource pool since start", ["pool"])
+POOL_SLOTS.set_function(lambda: {(n, k): s[k] for n, s in stats().items() for k in ("size", "busy", "waiting")})
+POOL_UTILIZATION.set_function(lambda: {n: s["utilization"] for n, s in stats().items()})
@@ -0,0 +1,451 @@
+"""
+Profiling wrapper for heavy calls: ffmpeg, scp/ssh, Real-ESRGAN subprocesses and Python
+stages such as Whisper transcription.
+
+    with profiling.task_scope("cut", task.id):
+        r = profiling.run(cmd, label="ffmpeg_cut", capture_output=True, text=True)
+        with profiling.python_stage("whisper_transcribe"):
+            model.transcribe(...)
+    profiling.task_report("cut", task.id)
+
+profiling.run() is a drop-in for subprocess.run(). It records the command, wall/CPU time,
+the child's own peak RSS and block I/O (os.wait4 rusage), the sizes of its input/output
+files and, for ffmpeg, the final -progress block (fps, speed, frames, size). Records are kept
+in memory per task (PROFILE_MAX_TASKS, default 500) and optionally appended to
+PROFILE_LOG as JSONL.
+
+Python stages can additionally be sampled: PROFILE_PYTHON=cprofile|pyspy with
+PROFILE_SAMPLE_RATE (0..1, default 1) writes .prof / speedscope dumps to PROFILE_DIR.
+
+The GPU server carries a copy of this module (upscale/vastai_deployment/profiling.py).
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import shlex
+import logging
+import resource
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_TaskKey = Tuple[str, Any]
+_current_task: ContextVar[Optional[_TaskKey]] = ContextVar("profiling_task", default=None)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except Exception:
+        return default
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    val = os.getenv(name)
+    if val is None or val == "":
+        return default
+    return val.strip().lower() in ("1", "true", "yes", "on")
+
+
+FFMPEG_PROGRESS = _env_flag("PROFILE_FFMPEG_PROGRESS", True)
+PROFILE_LOG = os.getenv("PROFILE_LOG") or None
+PROFILE_PYTHON = (os.getenv("PROFILE_PYTHON") or "off").strip().lower()
+PROFILE_SAMPLE_RATE = _env_float("PROFILE_SAMPLE_RATE", 1.0)
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "aporto_profiles")
+
+
+# ---- Task attribution ----
+
+@contextmanager
+def task_scope(kind: str, task_id: Any):
+    """Attribute every call made inside the block (and threads started via asyncio.to_thread) to a task."""
+    token = _current_task.set((kind, task_id))
+    try:
+        yield
+    finally:
+        _current_task.reset(token)
+
+
+def bind_task(kind: Optional[str], task_id: Any = None) -> None:
+    """Set the current task for the rest of this thread/asyncio task (long-lived worker loops)."""
+    _current_task.set((kind, task_id) if kind and task_id is not None else None)
+
+
+# ---- Storage ----
+
+class _Store:
+    def __init__(self):
+        self.max_tasks = max(1, int(_env_float("PROFILE_MAX_TASKS", 500)))
+        self.max_calls = max(1, int(_env_float("PROFILE_MAX_CALLS_PER_TASK", 1000)))
+        self._lock = threading.Lock()
+        self._tasks: "OrderedDict[_TaskKey, List[Dict]]" = OrderedDict()
+        self._labels: Dict[str, Dict] = {}
+
+    def add(self, rec: Dict) -> None:
+        key = (rec["task_kind"], rec["task_id"]) if rec.get("task_kind") else None
+        with self._lock:
+            agg = self._labels.setdefault(rec["label"], _empty_agg(rec["label"]))
+            _accumulate(agg, rec)
+            if key is not None:
+                calls = self._tasks.pop(key, [])
+                calls.append(rec)
+                del calls[:-self.max_calls]
+                self._tasks[key] = calls
+                while len(self._tasks) > self.max_tasks:
+                    self._tasks.popitem(last=False)
+        if PROFILE_LOG:
+            try:
+                with self._lock, open(PROFILE_LOG, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec, default=str) + "\n")
+            except Exception as e:
+                logging.debug(f"[profiling] Failed to append to {PROFILE_LOG}: {e}")
+
+    def calls(self, kind: str, task_id: Any) -> List[Dict]:
+        with self._lock:
+            return list(self._tasks.get((kind, task_id), []))
+
+    def labels(self) -> List[Dict]:
+        with self._lock:
+            return [dict(v) for v in self._labels.values()]
+
+
+def _empty_agg(label: str) -> Dict:
+    return {"label": label, "calls": 0, "failed": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+            "peak_rss_mb": 0.0, "bytes_in": 0, "bytes_out": 0}
+
+
+def _accumulate(agg: Dict, rec: Dict) -> None:
+    agg["calls"] += 1
+    if not rec.get("ok", True):
+        agg["failed"] += 1
+    agg["wall_seconds"] = round(agg["wall_seconds"] + (rec.get("wall_seconds") or 0.0), 3)
+    agg["cpu_seconds"] = round(agg["cpu_seconds"] + (rec.get("cpu_seconds") or 0.0), 3)
+    agg["peak_rss_mb"] = max(agg["peak_rss_mb"], rec.get("peak_rss_mb") or 0.0)
+    agg["bytes_in"] += rec.get("bytes_in") or 0
+    agg["bytes_out"] += rec.get("bytes_out") or 0
+
+
+_store = _Store()
+
+
+def _record(rec: Dict) -> Dict:
+    task = _current_task.get()
+    rec["task_kind"], rec["task_id"] = task if task else (None, None)
+    _store.add(rec)
+    return rec
+
+
+# ---- Subprocesses ----
+
+class _RusagePopen(subprocess.Popen):
+    """Popen that reaps with os.wait4 so the child's own rusage (CPU, maxrss, blocks) is kept."""
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        try:
+            pid, sts, ru = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0
+        if pid == self.pid:
+            self.rusage = ru
+        return pid, sts
+
+
+def _maxrss_mb(ru) -> float:
+    # Linux reports kilobytes, macOS bytes
+    return round(ru.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else ru.ru_maxrss / 1024, 1)
+
+
+def _size(paths: Iterable[str]) -> int:
+    total = 0
+    for p in paths or ():
+        try:
+            if p and os.path.isfile(p):
+                total += os.path.getsize(p)
+        except OSError:
+            pass
+    return total
+
+
+def _cmd_str(cmd) -> str:
+    s = cmd if isinstance(cmd, str) else shlex.join(str(c) for c in cmd)
+    return s if len(s) <= 1000 else s[:1000] + "..."
+
+
+def _is_ffmpeg(argv) -> bool:
+    return isinstance(argv, list) and bool(argv) and os.path.basename(str(argv[0])).lower() in ("ffmpeg", "ffmpeg.exe")
+
+
+def _ffmpeg_paths(argv: List[str]) -> Tuple[List[str], List[str]]:
+    inputs = [str(argv[i + 1]) for i, a in enumerate(argv[:-1]) if a == "-i"]
+    last = str(argv[-1]) if argv else ""
+    outputs = [last] if last and not last.startswith("-") and last not in inputs and last != "-" else []
+    return inputs, outputs
+
+
+def _parse_ffmpeg_progress(path: str) -> Optional[Dict]:
+    """Last key=value block written by ffmpeg -progress."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except Exception:
+        return None
+    last: Dict[str, str] = {}
+    block: Dict[str, str] = {}
+    for line in lines:
+        k, sep, v = line.partition("=")
+        if not sep:
+            continue
+        block[k.strip()] = v.strip()
+        if k.strip() == "progress":
+            last, block = block, {}
+    last = last or block
+    if not last:
+        return None
+    out: Dict[str, Any] = {}
+    for key in ("frame", "drop_frames", "dup_frames", "total_size"):
+        try:
+            out[key] = int(last[key])
+        except (KeyError, ValueError):
+            pass
+    try:
+        out["fps"] = float(last["fps"])
+    except (KeyError, ValueError):
+        pass
+    try:
+        out["speed"] = float(last.get("speed", "").rstrip("x"))
+    except ValueError:
+        pass
+    try:
+        # out_time_us (out_time_ms is also microseconds in ffmpeg's output)
+        out["out_time_seconds"] = round(int(last.get("out_time_us") or last["out_time_ms"]) / 1e6, 3)
+    except (KeyError, ValueError):
+        pass
+    if last.get("bitrate"):
+        out["bitrate"] = last["bitrate"]
+    return out
+
+
+def run(cmd, *, label: Optional[str] = None, inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+        input=None, timeout: Optional[float] = None, check: bool = False, **kwargs) -> subprocess.CompletedProcess:
+    """
+    Drop-in for subprocess.run() that records a profile of the call.
+    inputs/outputs: local files whose sizes are reported as bytes_in/bytes_out
+    (detected automatically for ffmpeg's -i arguments and output file).
+    """
+    argv = list(cmd) if not isinstance(cmd, str) else cmd
+    label = label or (os.path.basename(str(argv[0])) if isinstance(argv, list) and argv else "subprocess")
+    inputs, outputs = list(inputs or ()), list(outputs or ())
+    progress_path = None
+    if _is_ffmpeg(argv):
+        ff_in, ff_out = _ffmpeg_paths(argv)
+        inputs = inputs or ff_in
+        outputs = outputs or ff_out
+        if FFMPEG_PROGRESS and "-progress" not in argv:
+            fd, progress_path = tempfile.mkstemp(prefix="ffprogress_", suffix=".txt")
+            os.close(fd)
+            argv = [argv[0], "-progress", progress_path, "-nostats"] + argv[1:]
+
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = subprocess.PIPE
+        kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    rec: Dict[str, Any] = {
+        "kind": "subprocess",
+        "label": label,
+        "cmd": _cmd_str(cmd),
+        "started_at": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+        "bytes_in": _size(inputs),
+    }
+    t0 = time.perf_counter()
+    proc = None
+    try:
+        with _RusagePopen(argv, **kwargs) as proc:
+            try:
+                stdout, stderr = proc.communicate(input, timeout=timeout)
+            except subprocess.TimeoutExpired as exc:
+                proc.kill()
+                exc.stdout, exc.stderr = proc.communicate()
+                rec["error"] = f"timeout after {timeout}s"
+                raise
+            except BaseException:
+                proc.kill()
+                raise
+            retcode = proc.poll()
+    except Exception as e:
+        rec.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        rec["wall_seconds"] = round(time.perf_counter() - t0, 3)
+        ru = getattr(proc, "rusage", None)
+        if ru is not None:
+            rec["cpu_seconds"] = round(ru.ru_utime + ru.ru_stime, 3)
+            rec["peak_rss_mb"] = _maxrss_mb(ru)
+            rec["io_read_bytes"] = ru.ru_inblock * 512
+            rec["io_write_bytes"] = ru.ru_oublock * 512
+        rec["returncode"] = proc.returncode if proc is not None else None
+        rec["ok"] = "error" not in rec and rec["returncode"] == 0
+        rec["bytes_out"] = _size(outputs)
+        if progress_path:
+            rec["ffmpeg"] = _parse_ffmpeg_progress(progress_path)
+            try:
+                os.remove(progress_path)
+            except OSError:
+                pass
+        _record(rec)
+    completed = subprocess.CompletedProcess(cmd, retcode, stdout, stderr)
+    completed.profile = rec
+    if check:
+        completed.check_returncode()
+    return completed
+
+
+@contextmanager
+def timed(label: str, cmd=None, inputs: Iterable[str] = (), outputs: Iterable[str] = ()):
+    """
+    Record a call that is not run through run() (e.g. asyncio subprocesses): wall time and
+    file sizes only. The yielded dict can be filled with returncode/error by the caller.
+    """
+    rec: Dict[str, Any] = {
+        "kind": "subprocess",
+        "label": label,
+        "cmd": _cmd_str(cmd) if cmd else None,
+        "started_at": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+        "bytes_in": _size(inputs),
+    }
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    except Exception as e:
+        rec.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        rec["wall_seconds"] = round(time.perf_counter() - t0, 3)
+        rec["ok"] = "error" not in rec and rec.get("returncode", 0) == 0
+        rec["bytes_out"] = _size(outputs)
+        _record(rec)
+
+
+# ---- Python stages ----
+
+_cprofile_lock = threading.Lock()
+
+
+def _dump_path(label: str, ext: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    task = _current_task.get()
+    tag = f"{task[0]}{task[1]}_" if task else ""
+    return os.path.join(PROFILE_DIR, f"{tag}{label}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.{ext}")
+
+
+class _Sampler:
+    """Optional cProfile (this thread) or py-spy (whole process) capture around a Python stage."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.path: Optional[str] = None
+        self._profile = None
+        self._pyspy = None
+        mode = PROFILE_PYTHON
+        if mode in ("", "off", "0", "none") or random.random() >= PROFILE_SAMPLE_RATE:
+            return
+        try:
+            if mode == "cprofile":
+                # Only one cProfile can be active per interpreter (3.12+); skip instead of failing
+                if _cprofile_lock.acquire(blocking=False):
+                    import cProfile
+                    self._profile = cProfile.Profile()
+                    self._profile.enable()
+                    self.path = _dump_path(label, "prof")
+            elif mode == "pyspy":
+                self.path = _dump_path(label, "speedscope.json")
+                self._pyspy = subprocess.Popen(
+                    ["py-spy", "record", "--pid", str(os.getpid()), "--output", self.path,
+                     "--format", "speedscope", "--nonblocking"],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+        except Exception as e:
+            logging.debug(f"[profiling] {mode} sampler not started for {label}: {e}")
+            self.path = None
+
+    def stop(self) -> Optional[str]:
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+                self._profile.dump_stats(self.path)
+                _cprofile_lock.release()
+            elif self._pyspy is not None:
+                self._pyspy.send_signal(signal.SIGINT)
+                self._pyspy.wait(timeout=30)
+        except Exception as e:
+            logging.debug(f"[profiling] Failed to write profile dump for {self.label}: {e}")
+            return None
+        return self.path if self.path and os.path.exists(self.path) else None
+
+
+@contextmanager
+def python_stage(label: str, inputs: Iterable[str] = (), outputs: Iterable[str] = ()):
+    """Profile an in-process stage: wall time, this thread's CPU time, process peak RSS, optional dump."""
+    rec: Dict[str, Any] = {
+        "kind": "python",
+        "label": label,
+        "started_at": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+        "bytes_in": _size(inputs),
+    }
+    sampler = _Sampler(label)
+    t0 = time.perf_counter()
+    c0 = time.thread_time()
+    try:
+        yield rec
+    except Exception as e:
+        rec["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        rec["wall_seconds"] = round(time.perf_counter() - t0, 3)
+        rec["cpu_seconds"] = round(time.thread_time() - c0, 3)
+        rec["peak_rss_mb"] = _maxrss_mb(resource.getrusage(resource.RUSAGE_SELF))
+        rec["bytes_out"] = _size(outputs)
+        rec["ok"] = "error" not in rec
+        dump = sampler.stop()
+        if dump:
+            rec["profile_dump"] = dump
+        _record(rec)
+
+
+# ---- Reports ----
+
+def task_report(kind: str, task_id: Any) -> Dict:
+    """All recorded calls of one task plus per-label totals (slowest first)."""
+    calls = _store.calls(kind, task_id)
+    by_label: Dict[str, Dict] = {}
+    for rec in calls:
+        _accumulate(by_label.setdefault(rec["label"], _empty_agg(rec["label"])), rec)
+    labels = sorted(by_label.values(), key=lambda a: a["wall_seconds"], reverse=True)
+    return {
+        "task_kind": kind,
+        "task_id": task_id,
+        "calls": len(calls),
+        "wall_seconds": round(sum(r.get("wall_seconds") or 0 for r in calls), 3),
+        "cpu_seconds": round(sum(r.get("cpu_seconds") or 0 for r in calls), 3),
+        "peak_rss_mb": max((r.get("peak_rss_mb") or 0 for r in calls), default=0),
+        "bytes_in": sum(r.get("bytes_in") or 0 for r in calls),
+        "bytes_out": sum(r.get("bytes_out") or 0 for r in calls),
+        "by_label": labels,
+        "records": calls,
+    }
+
+
+def summary() -> Dict:
+    """Per-label totals across everything recorded by this process."""
+    labels = sorted(_store.labels(), key=lambda a: a["wall_seconds"], reverse=True)
+    return {"python_profiler": PROFILE_PYTHON, "sample_rate": PROFILE_SAMPLE_RATE, "labels": labels}
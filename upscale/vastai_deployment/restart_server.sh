@@ -4,7 +4,8 @@
 cd /workspace/aporto
 
 echo "Stopping old server..."
-pkill -f 'python.*server.py' || true
+# SIGINT = immediate stop (SIGTERM would drain running jobs first, see DRAIN_SECONDS)
+pkill -INT -f 'python.*server.py' || true
 sleep 2
 
 echo "Loading environment from .env..."
@@ -8,10 +8,67 @@ import os
 import sys
 import time
 import json
+import hashlib
 import threading
-import subprocess
-from flask import Flask, request, jsonify, send_file
-from upscale_app import upscale_video_with_realesrgan
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
+import metrics
+import profiling
+import encoders
+import fake_gpu
+import serving
+import archive
+import gpu_queue
+import pools
+import speaker_crop
+
+# FAKE_GPU=1: serve the same API with timed file copies instead of ESRGAN/Whisper (see fake_gpu.py)
+FAKE_GPU = fake_gpu.enabled()
+fake = fake_gpu.FakeGpu() if FAKE_GPU else None
+
+try:
+    from upscale_app import upscale_video_with_realesrgan, prepare_upscale, run_esrgan_batch, finish_upscale
+except ImportError:
+    # Fake mode runs without OpenCV/ESRGAN installed
+    if not FAKE_GPU:
+        raise
+    upscale_video_with_realesrgan = prepare_upscale = run_esrgan_batch = finish_upscale = None
+
+
+def _esrgan_batch(units):
+    with pools.use("gpu", "esrgan"):
+        return run_esrgan_batch(units)
+
+
+# One queue owns the GPU: ESRGAN runs of all jobs/clips are batched there (see gpu_queue.py)
+gpu = gpu_queue.GpuQueue(_esrgan_batch) if run_esrgan_batch else None
+# Clips of one cut job prepared (frames extracted) and encoded concurrently around the GPU queue
+CUT_UPSCALE_PARALLEL = max(1, int(os.environ.get('CUT_UPSCALE_PARALLEL', gpu_queue.BATCH_MAX_UNITS)))
+
+
+def _upscale_pooled(input_path: str, output_path: str, info: dict = None) -> bool:
+    """
+    upscale_video_with_realesrgan with extract/encode in the CPU pool and ESRGAN on the GPU queue.
+    info (if given) receives 'tile_plan' (Real-ESRGAN tiling) and, with UPSCALE_DEDUP, 'dedup'
+    (frames skipped vs processed).
+    """
+    unit = None
+    try:
+        print(f"Upscaling video: {input_path}")
+        with pools.use("cpu", "extract"):
+            unit = prepare_upscale(input_path, output_path)
+        ok = gpu.submit(unit).result()
+        if info is not None:
+            info.update({k: v for k, v in (("tile_plan", unit.tile_plan), ("dedup", unit.dedup_stats)) if v})
+        if not ok:
+            return False
+        with pools.use("cpu", "encode"):
+            return finish_upscale(unit)
+    except Exception as e:
+        print(f"Error during video upscaling: {e}")
+        return False
+    finally:
+        if unit is not None:
+            unit.cleanup()
 
 # Optional imports for GPU-based transcription and cutting
 try:
@@ -77,9 +134,41 @@ def _resolve_model_paths():
         "REALESRGAN_MODEL_PATH": realesr,
     }
 
-# In-memory job tracking
+# In-memory job tracking (one process; see serving.py)
 jobs = {}
 job_counter = 0
+_jobs_lock = threading.Lock()
+# Set by /drain or SIGTERM: no new jobs, running ones finish
+_draining = threading.Event()
+_ACTIVE_STATUSES = ('validating', 'processing')
+
+
+def _new_job(fields: dict) -> int:
+    """Allocate the next job id and register the job atomically (request threads run concurrently)."""
+    global job_counter
+    with _jobs_lock:
+        job_counter += 1
+        jobs[job_counter] = fields
+        return job_counter
+
+
+def _active_jobs() -> int:
+    return sum(1 for j in list(jobs.values()) if j.get('status') in _ACTIVE_STATUSES)
+
+
+def drain(timeout: float) -> bool:
+    """Stop accepting jobs and wait up to timeout seconds for running ones; True if none are left."""
+    _draining.set()
+    deadline = time.time() + timeout
+    while _active_jobs() and time.time() < deadline:
+        time.sleep(1.0)
+    return _active_jobs() == 0
+
+
+def _draining_response():
+    resp = jsonify({"error": "Server is draining; retry on another instance or later", "active_jobs": _active_jobs()})
+    resp.headers['Retry-After'] = '30'
+    return resp, 503
 
 # Base directories for cut pipeline
 CUT_BASE = os.environ.get("CUT_BASE_DIR") or "/workspace/cut"
@@ -107,11 +196,40 @@ def _is_file_stable(path: str, checks: int = 3, interval: float = 1.0, timeout:
     return checks == 0
 
 
+# Written by the orchestrator's transfer layer after the atomic rename: <file>.complete
+# holding the byte size (see app/upscale_vast.py UPLOAD_MARKER_SUFFIX)
+UPLOAD_MARKER_SUFFIX = '.complete'
+
+
+def _upload_marker_state(path: str) -> tuple[bool, str] | None:
+    """(ok, error) from the upload-complete marker, or None when there is no marker."""
+    marker = path + UPLOAD_MARKER_SUFFIX
+    try:
+        with open(marker, 'r') as f:
+            expected = int((f.read() or '').strip() or -1)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        return False, f"Unreadable upload marker {marker}: {e}"
+    try:
+        actual = os.path.getsize(path)
+    except FileNotFoundError:
+        return False, "Input file not found"
+    if expected != actual:
+        return False, f"Upload incomplete: marker says {expected} bytes, file has {actual}"
+    return True, ''
+
+
 def _ffprobe_video_ok(path: str) -> tuple[bool, str]:
     try:
         if not os.path.exists(path):
             return False, "Input file not found"
-        if not _is_file_stable(path):
+        marker = _upload_marker_state(path)
+        if marker is not None:
+            if not marker[0]:
+                return marker
+        elif not _is_file_stable(path):
+            # Clients without upload markers: fall back to waiting for size/mtime to settle
             return False, "Input file appears to be still uploading (not stable)"
         try:
             sz = os.path.getsize(path)
@@ -124,7 +242,7 @@ def _ffprobe_video_ok(path: str) -> tuple[bool, str]:
             '-select_streams', 'v:0', '-show_entries', 'stream=codec_name',
             '-of', 'csv=p=0', path
         ]
-        r = subprocess.run(cmd, capture_output=True, text=True)
+        r = profiling.run(cmd, label='ffprobe_validate', capture_output=True, text=True)
         if r.returncode == 0 and r.stdout.strip():
             return True, ''
         return False, (r.stderr or r.stdout or 'ffprobe failed')
@@ -142,14 +260,14 @@ def upscale_video():
         "output_path": "/path/to/output/video.mp4"
     }
     
-    Returns:
+    Returns immediately (the input is validated inside the job):
     {
         "job_id": 123,
-        "status": "processing"
+        "status": "validating"
     }
     """
-    global job_counter
-    
+    if _draining.is_set():
+        return _draining_response()
     try:
         data = request.get_json()
         input_path = data.get('input_path')
@@ -161,20 +279,13 @@ def upscale_video():
         if not os.path.exists(input_path):
             return jsonify({"error": "Input file not found"}), 404
         
-        ok, err = _ffprobe_video_ok(input_path)
-        if not ok:
-            return jsonify({"error": f"Invalid input video: {err}"}), 400
-        
         # Create a new job
-        job_counter += 1
-        job_id = job_counter
-        
-        jobs[job_id] = {
-            "status": "processing",
+        job_id = _new_job({
+            "status": "validating",
             "input_path": input_path,
             "output_path": output_path,
             "start_time": time.time()
-        }
+        })
         
         # Process in background
         thread = threading.Thread(target=process_upscale_job, args=(job_id, input_path, output_path))
@@ -183,7 +294,7 @@ def upscale_video():
         
         return jsonify({
             "job_id": job_id,
-            "status": "processing"
+            "status": "validating"
         }), 202
         
     except Exception as e:
@@ -191,8 +302,22 @@ def upscale_video():
 
 def process_upscale_job(job_id, input_path, output_path):
     """Process the upscaling job in background."""
+    profiling.bind_task("upscale", job_id)
     try:
-        success = upscale_video_with_realesrgan(input_path, output_path)
+        ok, err = (True, '') if FAKE_GPU else _ffprobe_video_ok(input_path)
+        if not ok:
+            raise RuntimeError(f"Invalid input video: {err}")
+        jobs[job_id]["status"] = "processing"
+        metrics.add_bytes("upscale", "in", input_path)
+        info = {}
+        with metrics.stage_timer("upscale", job_type="upscale"):
+            if FAKE_GPU:
+                success = fake.upscale(input_path, output_path)
+            else:
+                success = _upscale_pooled(input_path, output_path, info)
+        if success:
+            metrics.add_bytes("upscale", "out", output_path)
+        jobs[job_id].update(info)
         
         jobs[job_id]["status"] = "completed" if success else "failed"
         jobs[job_id]["end_time"] = time.time()
@@ -223,13 +348,78 @@ def get_job_status(job_id):
     if "end_time" in job:
         response["end_time"] = job["end_time"]
         response["duration"] = job["end_time"] - job["start_time"]
+
+    for key in ("tile_plan", "dedup"):
+        if key in job:
+            response[key] = job[key]
     
     return jsonify(response)
 
+@app.route('/job/<int:job_id>/profile', methods=['GET'])
+def get_job_profile(job_id):
+    """Recorded ffmpeg/ESRGAN/Whisper calls of a job (upscale or cut)."""
+    if job_id not in jobs:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(profiling.task_report(jobs[job_id].get('type', 'upscale'), job_id))
+
+
+@app.route('/encoders', methods=['GET'])
+def encoders_info():
+    """Selected H.264 encoder, probe result and per-encoder fps."""
+    return jsonify(encoders.stats())
+
+
+@app.route('/profile/summary', methods=['GET'])
+def profile_summary():
+    """Per-label call totals since server start."""
+    return jsonify(profiling.summary())
+
+
+def _job_counts():
+    counts = {}
+    for j in list(jobs.values()):
+        key = (j.get('type', 'upscale'), j.get('status', 'unknown'))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+metrics.JOBS.set_function(_job_counts)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition: stage durations, fps, bytes, job counts, GPU utilisation."""
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({"status": "healthy", "service": "video-upscale-api"})
+    resp = {"status": "draining" if _draining.is_set() else "healthy", "service": "video-upscale-api",
+            "active_jobs": _active_jobs()}
+    if FAKE_GPU:
+        resp["fake_gpu"] = fake.config()
+    if gpu is not None:
+        resp["gpu_queue"] = gpu.stats()
+    resp["pools"] = {name: {k: p[k] for k in ("size", "busy", "waiting", "utilization_recent")}
+                     for name, p in pools.stats().items()}
+    return jsonify(resp)
+
+
+@app.route('/pools', methods=['GET'])
+def pools_info():
+    """Per resource pool (gpu, cpu, net): slots in use, waiters, utilisation and per-stage run/wait seconds."""
+    resp = {"pools": pools.stats()}
+    if gpu is not None:
+        resp["gpu_queue"] = gpu.stats()
+    return jsonify(resp)
+
+
+@app.route('/drain', methods=['POST'])
+def start_drain():
+    """Stop accepting new jobs (503) while running ones finish; poll /health until active_jobs is 0."""
+    _draining.set()
+    return jsonify({"draining": True, "active_jobs": _active_jobs()})
 
 
 @app.route('/env', methods=['GET'])
@@ -273,6 +463,20 @@ def _require_gfpgan_on_start():
     # Expose the resolved path to downstream code (if it respects GFPGAN_MODEL_PATH)
     os.environ.setdefault('GFPGAN_MODEL_PATH', found)
 
+def _check_cuda_on_start():
+    """Optional CUT_REQUIRE_CUDA check; runs in the serving process, never in the gunicorn master."""
+    try:
+        require_cuda = str(os.environ.get('CUT_REQUIRE_CUDA', '')).strip().lower() in ('1', 'true', 'yes')
+        if require_cuda:
+            cs = _cuda_status()
+            if not cs.get('cuda_available'):
+                print("FATAL: CUT_REQUIRE_CUDA=1 but torch.cuda.is_available() is False. Install CUDA-enabled torch and GPU drivers.")
+                return False
+            print("CUDA OK:", cs)
+    except Exception:
+        pass
+    return True
+
 # ==== Cutting/transcription helpers ====
 
 def _load_whisper_model(model_size: str):
@@ -305,6 +509,30 @@ def _load_whisper_model(model_size: str):
     return m
 
 
+# Loaded Whisper models are kept between jobs (WHISPER_CACHE=0 reloads per job); whisper's
+# decoder installs hooks on the model, so each model is used by one transcription at a time
+WHISPER_CACHE = str(os.environ.get('WHISPER_CACHE', '1')).strip().lower() not in ('0', 'false', 'no')
+_whisper_models: dict = {}
+_whisper_models_lock = threading.Lock()
+
+
+def _get_whisper_model(model_size: str):
+    """(model, lock) for model_size, loading it on first use."""
+    if not WHISPER_CACHE:
+        return _load_whisper_model(model_size), threading.Lock()
+    with _whisper_models_lock:
+        if model_size not in _whisper_models:
+            _whisper_models[model_size] = (_load_whisper_model(model_size), threading.Lock())
+        return _whisper_models[model_size]
+
+
+def _whisper_pool() -> str:
+    dev = os.environ.get('CUT_FORCE_DEVICE', '').strip().lower()
+    if dev == 'cpu' or (dev != 'cuda' and not (torch is not None and torch.cuda.is_available())):
+        return "cpu"
+    return "gpu"
+
+
 def _yt_dlp_download(url: str, out_dir: str) -> str:
     os.makedirs(out_dir, exist_ok=True)
     # Use yt-dlp CLI to avoid vendor API drift
@@ -325,7 +553,7 @@ def _yt_dlp_download(url: str, out_dir: str) -> str:
         # Expect a single string acceptable by yt-dlp: --extractor-args "youtube:player-client=android"
         cmd += ['--extractor-args', extractor_args]
     cmd.append(url)
-    r = subprocess.run(cmd, capture_output=True, text=True)
+    r = profiling.run(cmd, label='yt_dlp', capture_output=True, text=True)
     if r.returncode != 0:
         raise RuntimeError(f"yt-dlp failed: {r.stderr or r.stdout}")
     # Pick the newest file in out_dir
@@ -339,7 +567,8 @@ def _yt_dlp_download(url: str, out_dir: str) -> str:
 
 def _transcribe_to_json(model, video_path: str, out_json: str) -> list:
     fp16 = bool(torch is not None and torch.cuda.is_available())
-    result = model.transcribe(video_path, fp16=fp16)
+    with profiling.python_stage('whisper_transcribe', inputs=[video_path]):
+        result = model.transcribe(video_path, fp16=fp16)
     segs = result.get('segments') or []
     data = [{"start": s.get("start"), "end": s.get("end"), "text": s.get("text")} for s in segs]
     with open(out_json, 'w', encoding='utf-8') as f:
@@ -480,7 +709,81 @@ def _safe_name_from_path(path: str) -> str:
     return safe or base
 
 
-def _cut_clips_ffmpeg(video_path: str, clips: list, out_dir: str, clip_suffix: str = "") -> list:
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _manifest_entry(path: str, out_dir: str, status: str) -> dict:
+    """Per-file manifest row; clips carry their clip_<n>_ number as index."""
+    name = os.path.relpath(path, out_dir)
+    base = os.path.basename(path)
+    entry = {"name": name, "path": path, "status": status, "kind": "file", "index": None, "size": None, "sha256": None}
+    if base.endswith('_transcript.json'):
+        entry["kind"] = "transcript"
+    elif base.endswith('_clips.json'):
+        entry["kind"] = "clips_json"
+    elif base.startswith('clip_'):
+        entry["kind"] = "clip"
+        entry["index"] = _clip_number(path)
+    return entry
+
+
+def _clip_number(path: str):
+    """n from clip_<n>_<title>.mp4 (1-based position in the GPT clip list), or None."""
+    try:
+        return int(os.path.basename(path).split('_')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _track_file(job_id: int, path: str, out_dir: str, status: str = 'processing') -> None:
+    """Announce an output that exists but is not final yet (e.g. a cut clip waiting for upscale)."""
+    entry = _manifest_entry(path, out_dir, status)
+    with _jobs_lock:
+        jobs[job_id].setdefault('manifest', {}).setdefault(entry["name"], entry).update(status=status)
+
+
+def _publish_file(job_id: int, path: str, out_dir: str, zipper=None) -> None:
+    """Make a final output downloadable: manifest (size + sha256), archive entry, /files/<name>, archive stream."""
+    entry = _manifest_entry(path, out_dir, 'ready')
+    entry["size"] = os.path.getsize(path)
+    entry["sha256"] = _sha256(path)
+    if zipper is not None:
+        zipper.add(path, entry["name"])
+    with _jobs_lock:
+        jobs[job_id].setdefault('manifest', {})[entry["name"]] = entry
+        # The manifest keeps the position of a tracked placeholder; publish order is kept apart
+        published = jobs[job_id].setdefault('published', [])
+        if entry["name"] not in published:
+            published.append(entry["name"])
+
+
+def _ready_files(job_id: int) -> list:
+    """(path, arcname) of the job's published files, in publish order (append-only)."""
+    with _jobs_lock:
+        manifest = jobs[job_id].get('manifest', {})
+        return [(manifest[name]["path"], name) for name in jobs[job_id].get('published', [])
+                if manifest.get(name, {}).get("status") == 'ready']
+
+
+def _fail_unfinished_files(job_id: int) -> None:
+    with _jobs_lock:
+        for e in jobs[job_id].get('manifest', {}).values():
+            if e["status"] == 'processing':
+                e["status"] = 'failed'
+
+
+def _manifest(job_id: int) -> list:
+    with _jobs_lock:
+        return [dict(e) for e in jobs[job_id].get('manifest', {}).values()]
+
+
+def _cut_clips_ffmpeg(video_path: str, clips: list, out_dir: str, clip_suffix: str = "", on_clip=None) -> list:
+    """Cut every clip; on_clip(path) is called as soon as each one is written."""
     os.makedirs(out_dir, exist_ok=True)
     made = []
     for i, clip in enumerate(clips, start=1):
@@ -494,40 +797,40 @@ def _cut_clips_ffmpeg(video_path: str, clips: list, out_dir: str, clip_suffix: s
         try:
             if len(frs) == 1:
                 s = frs[0]
-                cmd = [
+                r = encoders.encode(lambda v: [
                     'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
                     '-i', video_path,
                     '-ss', s['start'], '-to', s['end'],
-                    '-c:v', 'libx264', '-c:a', 'aac',
-                    '-crf', '18', '-preset', 'medium', '-b:a', '192k',
+                    *v, '-c:a', 'aac', '-b:a', '192k',
                     '-avoid_negative_ts', 'make_zero', '-fflags', '+genpts',
                     out_file,
-                ]
-                r = subprocess.run(cmd, capture_output=True, text=True)
+                ], crf=18, label='ffmpeg_cut', capture_output=True, text=True)
                 if r.returncode == 0:
                     made.append(out_file)
+                    if on_clip:
+                        on_clip(out_file)
             else:
                 # multi-fragment: extract parts then concat
                 tmp_files = []
                 for j, s in enumerate(frs):
                     tmp = os.path.join(out_dir, f"tmp_{i}_{j}.mp4")
                     tmp_files.append(tmp)
-                    cmd = [
+                    encoders.encode(lambda v: [
                         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
                         '-i', video_path,
                         '-ss', s['start'], '-to', s['end'],
-                        '-c:v', 'libx264', '-c:a', 'aac',
-                        '-crf', '18', '-preset', 'medium', '-b:a', '192k',
+                        *v, '-c:a', 'aac', '-b:a', '192k',
                         '-avoid_negative_ts', 'make_zero', '-fflags', '+genpts',
                         tmp,
-                    ]
-                    subprocess.run(cmd, capture_output=True)
+                    ], crf=18, label='ffmpeg_cut_fragment', capture_output=True)
                 valid = [p for p in tmp_files if os.path.exists(p)]
                 if len(valid) >= 1:
                     if len(valid) == 1:
                         import shutil
                         shutil.copy2(valid[0], out_file)
                         made.append(out_file)
+                        if on_clip:
+                            on_clip(out_file)
                     else:
                         inputs = []
                         concat = []
@@ -535,13 +838,14 @@ def _cut_clips_ffmpeg(video_path: str, clips: list, out_dir: str, clip_suffix: s
                             inputs += ['-i', p]
                             concat.append(f'[{idx}:v][{idx}:a]')
                         fc = f"{''.join(concat)}concat=n={len(valid)}:v=1:a=1[outv][outa]"
-                        cmd = ['ffmpeg', '-y'] + inputs + [
+                        r = encoders.encode(lambda v: ['ffmpeg', '-y'] + inputs + [
                             '-filter_complex', fc, '-map', '[outv]', '-map', '[outa]',
-                            '-c:v', 'libx264', '-c:a', 'aac', '-crf', '18', '-preset', 'medium', '-b:a', '192k', out_file
-                        ]
-                        r = subprocess.run(cmd, capture_output=True)
+                            *v, '-c:a', 'aac', '-b:a', '192k', out_file
+                        ], crf=18, label='ffmpeg_concat', capture_output=True)
                         if r.returncode == 0:
                             made.append(out_file)
+                            if on_clip:
+                                on_clip(out_file)
                 for p in tmp_files:
                     if os.path.exists(p):
                         try:
@@ -565,9 +869,10 @@ def cut_from_url():
       "resize": bool?, "aspect_ratio": [w,h]?,
       "upscale": bool?               # optional, default from env CUT_ENABLE_UPSCALE (default true)
     }
-    Returns: {"job_id": int, "status": "processing"}
+    Returns: {"job_id": int, "status": "validating" | "processing"} (input_path is validated inside the job)
     """
-    global job_counter
+    if _draining.is_set():
+        return _draining_response()
     try:
         data = request.get_json()
         print(f"[GPU-CUT] Received cut_url request: {data}")
@@ -596,34 +901,27 @@ def cut_from_url():
             if not os.path.isfile(input_path):
                 print(f"[GPU-CUT] ERROR: input_path not found: {input_path}")
                 return jsonify({"error": f"input_path not found: {input_path}"}), 400
-            ok, err = _ffprobe_video_ok(input_path)
-            if not ok:
-                print(f"[GPU-CUT] ERROR: Invalid input video: {err}")
-                return jsonify({"error": f"Invalid input video: {err}"}), 400
-            print(f"[GPU-CUT] Input validation successful for: {input_path}")
         elif not url:
             print(f"[GPU-CUT] ERROR: No input_path or url provided")
             return jsonify({"error": "Provide either input_path or url"}), 400
         # Prepare job
-        job_counter += 1
-        job_id = job_counter
-        print(f"[GPU-CUT] Creating job_id={job_id} with model_size={model_size}, resize={resize_flag}, upscale={upscale_flag}")
-        jobs[job_id] = {
-            "status": "processing",
+        job_id = _new_job({
+            "status": "validating" if input_path else "processing",
             "type": "cut",
             "start_time": time.time(),
             "input_path": input_path,
             "to_dir": to_dir,
             "out_dir": out_dir,
             "upscale": upscale_flag
-        }
+        })
+        print(f"[GPU-CUT] Created job_id={job_id} with model_size={model_size}, resize={resize_flag}, upscale={upscale_flag}")
         # Background thread
         print(f"[GPU-CUT] Starting background thread for job_id={job_id}")
         t = threading.Thread(target=process_cut_job, args=(job_id, url, model_size, to_dir, out_dir, resize_flag, aspect_tuple, input_path, provided_title, upscale_flag))
         t.daemon = True
         t.start()
         print(f"[GPU-CUT] Job submitted successfully: job_id={job_id}")
-        return jsonify({"job_id": job_id, "status": "processing"}), 202
+        return jsonify({"job_id": job_id, "status": jobs[job_id]["status"]}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
@@ -631,17 +929,31 @@ def cut_from_url():
 
 
 def process_cut_job(job_id: int, url: str, model_size: str, to_dir: str, out_dir: str, resize_flag: bool, aspect_ratio: tuple[int, int], input_path: str | None = None, title: str | None = None, upscale_flag: bool = True):
+    profiling.bind_task("cut", job_id)
+    zipper = None
     try:
         print(f"[GPU-CUT-{job_id}] Starting cut job processing")
         print(f"[GPU-CUT-{job_id}] Parameters: model_size={model_size}, resize={resize_flag}, aspect_ratio={aspect_ratio}, upscale={upscale_flag}")
         
+        if input_path and not FAKE_GPU:
+            ok, err = _ffprobe_video_ok(input_path)
+            if not ok:
+                raise RuntimeError(f"Invalid input video: {err}")
+            print(f"[GPU-CUT-{job_id}] Input validation successful for: {input_path}")
+        jobs[job_id]["status"] = "processing"
+
+        if FAKE_GPU:
+            _fake_cut_job(job_id, url, out_dir, input_path, title)
+            return
+
         # 1) Obtain input path
         if input_path and os.path.isfile(input_path):
             print(f"[GPU-CUT-{job_id}] Using provided input_path: {input_path}")
             video_path = input_path
         else:
             print(f"[GPU-CUT-{job_id}] Downloading video from URL: {url}")
-            video_path = _yt_dlp_download(url, to_dir)
+            with metrics.stage_timer("download"), pools.use("net", "download"):
+                video_path = _yt_dlp_download(url, to_dir)
             print(f"[GPU-CUT-{job_id}] Download completed: {video_path}")
         if title and isinstance(title, str) and title.strip():
             safe = "".join(c for c in title if c.isalnum() or c in ("_", "-", ".", "!", "?", ":", ",", "'", "&", " ")).rstrip().replace(" ", "_")
@@ -657,27 +969,44 @@ def process_cut_job(job_id: int, url: str, model_size: str, to_dir: str, out_dir
             parts = [p for p in name.replace('_', ' ').replace('-', ' ').split() if p]
             return "_".join(parts[:2]) if parts else ""
         clip_suffix = _first_two_words(safe)
+        # Archive is filled as outputs become final, so it is ready when the last clip is
+        zipper = archive.IncrementalZip(os.path.join(out_dir, f"{safe}.zip"))
+
+        def _publish(path: str) -> None:
+            if os.path.exists(path):
+                _publish_file(job_id, path, out_dir, zipper)
         
         # 2) Transcribe
         print(f"[GPU-CUT-{job_id}] Starting transcription with model_size={model_size}")
         print(f"[GPU-CUT-{job_id}] Loading Whisper model...")
-        model = _load_whisper_model(model_size)
-        print(f"[GPU-CUT-{job_id}] Whisper model loaded successfully")
-        
         tr_path = os.path.join(dest_dir, f"{safe}_transcript.json")
-        print(f"[GPU-CUT-{job_id}] Transcribing video: {video_path}")
-        print(f"[GPU-CUT-{job_id}] Transcript output path: {tr_path}")
-        transcript = _transcribe_to_json(model, video_path, tr_path)
+        metrics.add_bytes("cut", "in", video_path)
+        # Whisper holds the GPU pool; other jobs' GPT calls and cutting run meanwhile
+        with pools.use(_whisper_pool(), "transcribe"):
+            with metrics.stage_timer("whisper_load"):
+                model, model_lock = _get_whisper_model(model_size)
+            print(f"[GPU-CUT-{job_id}] Whisper model loaded successfully")
+            print(f"[GPU-CUT-{job_id}] Transcribing video: {video_path}")
+            print(f"[GPU-CUT-{job_id}] Transcript output path: {tr_path}")
+            with metrics.stage_timer("transcribe"), model_lock:
+                transcript = _transcribe_to_json(model, video_path, tr_path)
         print(f"[GPU-CUT-{job_id}] Transcription completed: {len(transcript)} segments")
+        _publish(tr_path)
         # 3) Ask OpenAI for clips
         print(f"[GPU-CUT-{job_id}] Asking OpenAI for clip suggestions...")
         clips_json_path = os.path.join(dest_dir, f"{safe}_clips.json")
-        clips = _ask_openai_for_clips(transcript, clips_json_path)
+        with metrics.stage_timer("gpt"), pools.use("net", "gpt"):
+            clips = _ask_openai_for_clips(transcript, clips_json_path)
         print(f"[GPU-CUT-{job_id}] OpenAI returned {len(clips)} clip suggestions")
+        _publish(clips_json_path)
         
         # 4) Cut
         print(f"[GPU-CUT-{job_id}] Starting clip cutting with ffmpeg...")
-        made = _cut_clips_ffmpeg(video_path, clips, dest_dir, clip_suffix=clip_suffix)
+        with metrics.stage_timer("cut"), pools.use("cpu", "cut"):
+            # A clip is final after its last enabled stage (cut -> resize -> upscale)
+            final_after_cut = not (resize_flag or upscale_flag)
+            made = _cut_clips_ffmpeg(video_path, clips, dest_dir, clip_suffix=clip_suffix,
+                                     on_clip=_publish if final_after_cut else (lambda p: _track_file(job_id, p, out_dir)))
         print(f"[GPU-CUT-{job_id}] Cut {len(made)} clips successfully")
 
         # 5) Optional resize to aspect ratio using clipsai (strict: no fallback). Results must replace original clip files.
@@ -688,55 +1017,70 @@ def process_cut_job(job_id: int, url: str, model_size: str, to_dir: str, out_dir
                 raise RuntimeError("clipsai not installed on server, cannot perform speaker-centered resize")
             if not token:
                 raise RuntimeError("HUGGINGFACE_TOKEN/PYANNOTE_AUTH_TOKEN is required for speaker-centered resize")
-            w, h = aspect_ratio
-            import glob, time as _time, shutil as _sh
+            # Diarization + speaker tracking run once on the source; each clip gets its slice of
+            # the crop windows (by fragment timestamps) applied in a single ffmpeg pass
+            with metrics.stage_timer("resize_diarize"), pools.use("gpu", "resize"):
+                crops = speaker_crop.speaker_crops(video_path, token, aspect_ratio, clipsai_resize)
             for src in made:
-                # Run clipsai resize and expect a new mp4 to appear in the same dir
-                dirn = os.path.dirname(src)
-                before = set(glob.glob(os.path.join(dirn, '*.mp4')))
-                t0 = _time.time()
-                _ = clipsai_resize(video_file_path=src, pyannote_auth_token=token, aspect_ratio=(w, h))
-                # Find a new/updated file
-                after = set(glob.glob(os.path.join(dirn, '*.mp4')))
-                candidates = [p for p in after if p not in before or os.path.getmtime(p) >= t0]
-                if not candidates:
-                    raise RuntimeError("clipsai resize did not produce an output file")
-                newest = max(candidates, key=lambda p: os.path.getmtime(p))
-                # Replace original clip with resized result (atomic move)
+                n = _clip_number(src)
+                fragments = (clips[n - 1].get('fragments') or []) if n and n <= len(clips) else []
                 tmp_dst = src + ".resized.tmp.mp4"
-                _sh.copy2(newest, tmp_dst)
+                with metrics.stage_timer("resize"), pools.use("cpu", "resize_render"):
+                    speaker_crop.render_clip(src, tmp_dst, crops, fragments)
+                # Replace original clip with resized result (atomic move)
                 os.replace(tmp_dst, src)
+                if not upscale_flag:
+                    _publish(src)
 
         # 6) Optional upscaling of clips in place (write over original filenames inside dest_dir)
+        # Clips are independent units on the shared GPU queue (batched with other clips/jobs);
+        # a clip that fails is dropped from the results instead of failing the whole job.
         if upscale_flag and made:
-            print(f"[GPU-CUT-{job_id}] Starting upscaling of {len(made)} clips...")
-            import shutil as _sh
-            for src in made:
+            print(f"[GPU-CUT-{job_id}] Starting upscaling of {len(made)} clips ({CUT_UPSCALE_PARALLEL} in parallel)...")
+
+            def _upscale_clip(src: str) -> bool:
                 name = os.path.basename(src)
                 tmp_out = os.path.join(dest_dir, f".{name}.up.tmp.mp4")
                 ok = False
+                info = {}
                 try:
-                    ok = upscale_video_with_realesrgan(src, tmp_out)
+                    with metrics.stage_timer("upscale"):
+                        ok = _upscale_pooled(src, tmp_out, info)
+                    # Per clip: {"tile_plan": {clip: plan}, "dedup": {clip: stats}}
+                    for key, value in info.items():
+                        jobs[job_id].setdefault(key, {})[name] = value
                 except Exception as _e:
+                    print(f"[GPU-CUT-{job_id}] Upscale error for {name}: {_e}")
                     ok = False
                 if not ok or not os.path.exists(tmp_out):
-                    raise RuntimeError(f"Upscale failed for {name}")
+                    if os.path.exists(tmp_out):
+                        os.remove(tmp_out)
+                    return False
                 # Replace original clip with upscaled clip
                 os.replace(tmp_out, src)
-
-        # 7) Zip outputs for download (folder named as source video, files are the final upscaled clips)
-        print(f"[GPU-CUT-{job_id}] Creating archive...")
-        archive_path = os.path.join(out_dir, f"{safe}.zip")
-        import zipfile
-        with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-            # Always include transcript and clips.json
-            for aux in (tr_path, clips_json_path):
-                if os.path.exists(aux):
-                    zf.write(aux, os.path.relpath(aux, out_dir))
-            # Include final clip files (same names as auto mode)
-            for p in made:
-                if os.path.exists(p):
-                    zf.write(p, os.path.relpath(p, out_dir))
+                _publish(src)
+                return True
+
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=CUT_UPSCALE_PARALLEL, thread_name_prefix=f"cut{job_id}-up") as pool:
+                results = list(pool.map(_upscale_clip, made))
+            failed = [src for src, ok in zip(made, results) if not ok]
+            for src in failed:
+                print(f"[GPU-CUT-{job_id}] Upscale failed for {os.path.basename(src)}; excluded from results")
+                _track_file(job_id, src, out_dir, status='failed')
+            if failed:
+                jobs[job_id]['failed_clips'] = [os.path.relpath(p, out_dir) for p in failed]
+                made = [src for src, ok in zip(made, results) if ok]
+                if not made:
+                    raise RuntimeError(f"Upscale failed for all {len(failed)} clips")
+
+        # 7) Finalize the archive (folder named as source video, files are the final clips).
+        # Entries were appended as each output became final; media is stored, JSON deflated.
+        print(f"[GPU-CUT-{job_id}] Finalizing archive...")
+        with metrics.stage_timer("zip"):
+            archive_path = zipper.close()
+            zipper = None
+        metrics.add_bytes("cut", "out", archive_path)
         print(f"[GPU-CUT-{job_id}] Job completed successfully!")
         print(f"[GPU-CUT-{job_id}] Output archive: {archive_path}")
         jobs[job_id]['status'] = 'completed'
@@ -762,6 +1106,33 @@ def process_cut_job(job_id: int, url: str, model_size: str, to_dir: str, out_dir
         print(f"[GPU-CUT-{job_id}] ERROR: Job failed with exception: {type(e).__name__}: {e}")
         import traceback
         print(f"[GPU-CUT-{job_id}] Traceback:\n{traceback.format_exc()}")
+        if zipper is not None:
+            zipper.abort()
+        _fail_unfinished_files(job_id)
+        jobs[job_id]['status'] = 'failed'
+        jobs[job_id]['error'] = str(e)
+        jobs[job_id]['end_time'] = time.time()
+
+
+def _fake_cut_job(job_id: int, url: str, out_dir: str, input_path: str | None, title: str | None):
+    """FAKE_GPU cut: no download/Whisper/GPT; emits the real archive layout after the simulated delay."""
+    try:
+        source = input_path or url or f"job_{job_id}"
+        if title and isinstance(title, str) and title.strip():
+            safe = "".join(c for c in title if c.isalnum() or c in ("_", "-", ".", "!", "?", ":", ",", "'", "&", " ")).rstrip().replace(" ", "_")
+        else:
+            safe = ""
+        safe = safe or _safe_name_from_path(source) or f"job_{job_id}"
+        with metrics.stage_timer("fake_cut"):
+            dest_dir, archive_path = fake.cut(input_path, out_dir, safe,
+                                              on_file=lambda p: _publish_file(job_id, p, out_dir))
+        metrics.add_bytes("cut", "out", archive_path)
+        jobs[job_id]['status'] = 'completed'
+        jobs[job_id]['output_dir'] = dest_dir
+        jobs[job_id]['output_archive'] = archive_path
+        jobs[job_id]['end_time'] = time.time()
+    except Exception as e:
+        print(f"[GPU-CUT-{job_id}] FAKE job failed: {e}")
         jobs[job_id]['status'] = 'failed'
         jobs[job_id]['error'] = str(e)
         jobs[job_id]['end_time'] = time.time()
@@ -779,11 +1150,66 @@ def get_cut_job(job_id: int):
         resp['output_dir'] = j['output_dir']
     if 'output_archive' in j:
         resp['output_archive'] = j['output_archive']
+    if 'manifest' in j:
+        # Grows while the job runs; a clip is downloadable once its status is 'ready'
+        resp['manifest'] = _manifest(job_id)
+        resp['files'] = [name for _, name in _ready_files(job_id)]
+    if 'failed_clips' in j:
+        resp['failed_clips'] = j['failed_clips']
+    for key in ('tile_plan', 'dedup'):
+        if key in j:
+            resp[key] = j[key]
     if 'error' in j:
         resp['error'] = j['error']
     return jsonify(resp)
 
 
+@app.route('/cut_job/<int:job_id>/files/<path:name>', methods=['GET'])
+def get_cut_file(job_id: int, name: str):
+    """Download one finished output (clip, transcript, clips.json) while the job may still be running."""
+    if job_id not in jobs:
+        return jsonify({"error": "Job not found"}), 404
+    path = dict((n, p) for p, n in _ready_files(job_id)).get(name)
+    if not path or not os.path.isfile(path):
+        return jsonify({"error": f"File not ready: {name}"}), 404
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path), conditional=True)
+
+
+@app.route('/cut_job/<int:job_id>/archive', methods=['GET'])
+def stream_cut_archive(job_id: int):
+    """
+    Zip stream generated on the fly (media stored, JSON deflated).
+    follow=1 (default): start with the outputs that are ready and keep appending clips as the job
+    finishes them, so the transfer overlaps with processing. The stream ends when the job
+    completes; if the job fails the stream is cut before the zip directory (client sees a broken zip).
+    follow=0: only what is ready now.
+    """
+    if job_id not in jobs:
+        return jsonify({"error": "Job not found"}), 404
+    follow = str(request.args.get('follow', '1')).strip().lower() not in ('0', 'false', 'no')
+
+    def _entries():
+        # Names already in the zip: clips finish out of order, so a position cursor is not enough
+        sent = set()
+        while True:
+            for path, arcname in _ready_files(job_id):
+                if arcname not in sent:
+                    sent.add(arcname)
+                    yield path, arcname
+            status = jobs[job_id].get('status')
+            if not follow or status not in _ACTIVE_STATUSES:
+                if status == 'failed':
+                    raise RuntimeError(f"cut job {job_id} failed")
+                if all(arcname in sent for _, arcname in _ready_files(job_id)):
+                    return
+                continue
+            time.sleep(0.5)
+
+    name = os.path.basename(jobs[job_id].get('output_archive') or f"cut_job_{job_id}.zip")
+    return Response(stream_with_context(archive.stream_zip(_entries())), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{name}"'})
+
+
 @app.route('/clear_queue', methods=['POST'])
 def clear_queue():
     """Clear all pending jobs from the queue."""
@@ -791,12 +1217,13 @@ def clear_queue():
     
     # Count jobs by status
     total = len(jobs)
-    pending = sum(1 for j in jobs.values() if j.get('status') in ('queued', 'pending'))
+    pending = sum(1 for j in jobs.values() if j.get('status') in ('queued', 'pending', 'validating'))
     processing = sum(1 for j in jobs.values() if j.get('status') == 'processing')
     
     # Clear all jobs
-    jobs.clear()
-    job_counter = 0
+    with _jobs_lock:
+        jobs.clear()
+        job_counter = 0
     
     return jsonify({
         "ok": True,
@@ -839,26 +1266,27 @@ if __name__ == '__main__':
     print("  POST /upscale - Submit upscaling job")
     print("  GET /job/<id> - Check job status")
     print("  POST /cut_url - Submit cut-from-URL job")
-    print("  GET /cut_job/<id> - Check cut job status")
+    print("  GET /cut_job/<id> - Check cut job status (per-clip manifest)")
+    print("  GET /cut_job/<id>/files/<name>, /cut_job/<id>/archive - Download clips while the job runs")
     print("  GET /health - Health check")
+    print("  GET /metrics - Prometheus metrics")
+    print("  GET /encoders - Video encoder selection")
+    print("  GET /pools - GPU/CPU/network pool utilisation")
+    print("  POST /drain - Stop accepting jobs, finish running ones")
+
+    port = int(os.environ.get('PORT', '5000'))
+    if FAKE_GPU:
+        print(f"FAKE_GPU mode: {fake.config()}")
+        serving.serve(app, os.environ.get('HOST', '127.0.0.1'), port, drain)
+        sys.exit(0)
 
     # Enforce GFPGAN weights presence at startup (project policy)
     _require_gfpgan_on_start()
 
-    # Optional: require CUDA availability at startup
-    try:
-        require_cuda = str(os.environ.get('CUT_REQUIRE_CUDA', '')).strip().lower() in ('1', 'true', 'yes')
-        if require_cuda:
-            cs = _cuda_status()
-            if not cs.get('cuda_available'):
-                print("FATAL: CUT_REQUIRE_CUDA=1 but torch.cuda.is_available() is False. Install CUDA-enabled torch and GPU drivers.")
-                sys.exit(1)
-            else:
-                print("CUDA OK:", cs)
-    except Exception:
-        pass
+    # Pick the H.264 encoder (NVENC when the driver exposes it) before the first job
+    encoders.probe()
 
     # GPU server ready - processes jobs as they come
     
-    # Run the server
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    # Run the server; the CUDA check runs in the worker so the master never initialises CUDA
+    serving.serve(app, os.environ.get('HOST', '0.0.0.0'), port, drain, on_worker_start=_check_cuda_on_start)
@@ -0,0 +1,110 @@
+"""
+Production serving for server.py.
+
+gunicorn with the threaded (gthread) worker, embedded so `python server.py` keeps running the
+startup checks first. There is exactly ONE worker process on purpose: the `jobs` table, the
+job counter and the job threads live in that process, so every request (submit, status poll,
+UI) sees the same scheduler. Concurrency comes from GUNICORN_THREADS request threads.
+
+The worker is forked from the gunicorn master, and CUDA cannot be re-initialised in a forked
+child: nothing that runs before serve() (i.e. in the master) may touch torch.cuda beyond
+importing torch. Startup checks that need the GPU go in on_worker_start, which runs inside
+the worker after the fork.
+
+  SERVER_MODE=gunicorn      gunicorn (default; falls back to the Flask dev server if not installed) | dev
+  GUNICORN_THREADS=16       concurrent requests
+  GUNICORN_KEEPALIVE=75     seconds an idle keep-alive connection stays open (orchestrators poll every few s)
+  GUNICORN_TIMEOUT=120      worker heartbeat timeout
+  DRAIN_SECONDS=1800        on SIGTERM keep serving status/results until running jobs finish, up to this long
+
+Graceful drain: SIGTERM puts the server into draining mode (new submissions get 503, status
+polls keep working), waits for the running jobs, then lets gunicorn finish the in-flight
+requests and exit. POST /drain does the same without stopping the process.
+"""
+import os
+import sys
+import signal
+import threading
+from typing import Callable, Optional
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except Exception:
+        return default
+
+
+SERVER_MODE = (os.environ.get('SERVER_MODE') or 'gunicorn').strip().lower()
+THREADS = _env_int('GUNICORN_THREADS', 16)
+KEEPALIVE = _env_int('GUNICORN_KEEPALIVE', 75)
+TIMEOUT = _env_int('GUNICORN_TIMEOUT', 120)
+DRAIN_SECONDS = _env_int('DRAIN_SECONDS', 1800)
+
+
+def serve(app, host: str, port: int, drain: Callable[[float], bool],
+          on_worker_start: Optional[Callable[[], bool]] = None) -> None:
+    """
+    Serve app until SIGTERM/SIGINT; drain(timeout) must stop new jobs and wait for running ones.
+    on_worker_start() runs in the serving process before the first request (after the fork
+    under gunicorn); returning False aborts startup.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+    if SERVER_MODE == 'dev' or BaseApplication is None:
+        if SERVER_MODE != 'dev':
+            print("⚠️ gunicorn is not installed; using the Flask development server")
+        if on_worker_start is not None and on_worker_start() is False:
+            sys.exit(1)
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+
+    def post_worker_init(worker):
+        if on_worker_start is not None and on_worker_start() is False:
+            # Boot-error exit code: the master halts instead of respawning the worker
+            from gunicorn.arbiter import Arbiter
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
+        default_handler = signal.getsignal(signal.SIGTERM)
+
+        def _finish(signum, frame):
+            drained = drain(DRAIN_SECONDS)
+            print(f"Drain {'complete' if drained else 'timed out'}; stopping worker")
+            if callable(default_handler):
+                default_handler(signum, frame)
+            else:
+                worker.alive = False
+
+        def _on_term(signum, frame):
+            # Keep accepting status polls while jobs finish; stop only after the drain
+            threading.Thread(target=_finish, args=(signum, frame), name="drain", daemon=True).start()
+
+        signal.signal(signal.SIGTERM, _on_term)
+
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': 1,
+        'worker_class': 'gthread',
+        'threads': THREADS,
+        'keepalive': KEEPALIVE,
+        'timeout': TIMEOUT,
+        # The master SIGKILLs a worker that is still alive after graceful_timeout
+        'graceful_timeout': DRAIN_SECONDS + 60,
+        'accesslog': os.environ.get('GUNICORN_ACCESS_LOG') or None,
+        'errorlog': '-',
+        'post_worker_init': post_worker_init,
+    }
+
+    class _Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    print(f"Serving with gunicorn: 1 process x {THREADS} threads on {host}:{port} "
+          f"(keepalive={KEEPALIVE}s, timeout={TIMEOUT}s, drain={DRAIN_SECONDS}s)")
+    _Server().run()
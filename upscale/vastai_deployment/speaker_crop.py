@@ -0,0 +1,146 @@
+"""
+Speaker-centered resize for cut jobs, diarized once per source video.
+
+clipsai.resize() does not write a video: it runs pyannote diarization, scene and face
+detection and returns crop windows (x, y per time segment, one crop size). Those windows are
+computed once on the source video, cached (memory + JSON on disk, keyed by a content
+fingerprint so a re-downloaded source hits too), then sliced per clip by the clip's fragment
+timestamps and applied in one ffmpeg pass with time-dependent crop expressions.
+
+  RESIZE_CACHE_DIR   where crop JSON is kept (default: <tmp>/aporto_speaker_crops)
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Callable, Dict, List, Tuple
+
+import encoders
+
+CACHE_DIR = os.environ.get('RESIZE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'aporto_speaker_crops')
+_FINGERPRINT_BYTES = 1024 * 1024
+
+_memory: Dict[str, dict] = {}
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _fingerprint(path: str, aspect_ratio: Tuple[int, int]) -> str:
+    """sha1 of size + first/last MiB + aspect ratio (cheap, stable across re-downloads)."""
+    size = os.path.getsize(path)
+    h = hashlib.sha1(f"{size}:{aspect_ratio[0]}x{aspect_ratio[1]}".encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(_FINGERPRINT_BYTES))
+        if size > _FINGERPRINT_BYTES:
+            f.seek(max(_FINGERPRINT_BYTES, size - _FINGERPRINT_BYTES))
+            h.update(f.read(_FINGERPRINT_BYTES))
+    return h.hexdigest()
+
+
+def _crops_dict(crops) -> dict:
+    if isinstance(crops, dict):
+        return crops
+    if hasattr(crops, 'to_dict'):
+        return crops.to_dict()
+    return {
+        "crop_width": crops.crop_width,
+        "crop_height": crops.crop_height,
+        "segments": [s if isinstance(s, dict) else s.to_dict() for s in crops.segments],
+    }
+
+
+def speaker_crops(video_path: str, token: str, aspect_ratio: Tuple[int, int], resize_fn: Callable) -> dict:
+    """Crop windows for the whole source ({crop_width, crop_height, segments}), computed at most once."""
+    key = _fingerprint(video_path, aspect_ratio)
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if key in _memory:
+            return _memory[key]
+        cache_path = os.path.join(CACHE_DIR, f"{key}.json")
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                _memory[key] = json.load(f)
+            print(f"[resize] Using cached speaker crops for {os.path.basename(video_path)}")
+            return _memory[key]
+        except (OSError, ValueError):
+            pass
+        print(f"[resize] Diarizing {os.path.basename(video_path)} once for all clips")
+        crops = _crops_dict(resize_fn(video_file_path=os.path.abspath(video_path),
+                                      pyannote_auth_token=token, aspect_ratio=tuple(aspect_ratio)))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(crops, f)
+        os.replace(tmp, cache_path)
+        _memory[key] = crops
+        return crops
+
+
+def _seconds(ts) -> float:
+    """'HH:MM:SS.mmm' / 'MM:SS' / number -> seconds."""
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    total = 0.0
+    for part in str(ts).strip().split(':'):
+        total = total * 60 + float(part or 0)
+    return total
+
+
+def clip_segments(crops: dict, fragments: list) -> List[Tuple[float, float, int, int]]:
+    """
+    Crop windows in clip time: fragments are concatenated in order (as the cut does), so a source
+    segment overlapping fragment j is shifted by the length of the fragments before it.
+    """
+    out = []
+    offset = 0.0
+    for fr in fragments:
+        fs, fe = _seconds(fr.get('start', 0)), _seconds(fr.get('end', 0))
+        if fe <= fs:
+            continue
+        for seg in crops.get('segments') or []:
+            s, e = max(float(seg['start_time']), fs), min(float(seg['end_time']), fe)
+            if e > s:
+                out.append((offset + s - fs, offset + e - fs, int(seg['x']), int(seg['y'])))
+        offset += fe - fs
+    out.sort()
+    merged = []
+    for seg in out:
+        if merged and merged[-1][2:] == seg[2:]:
+            merged[-1] = (merged[-1][0], seg[1], seg[2], seg[3])
+        else:
+            merged.append(seg)
+    return merged
+
+
+def crop_filter(width: int, height: int, segments: List[Tuple[float, float, int, int]]) -> str:
+    """ffmpeg crop with x/y switching at segment ends (gaps take the next window, the tail the last)."""
+    width -= width % 2
+    height -= height % 2
+    if not segments:
+        return f"crop={width}:{height}"
+
+    def expr(idx: int) -> str:
+        value = str(segments[-1][idx])
+        if all(seg[idx] == segments[-1][idx] for seg in segments):
+            return value
+        for seg in reversed(segments[:-1]):
+            value = f"if(lt(t,{seg[1]:.3f}),{seg[idx]},{value})"
+        return value
+
+    return f"crop=w={width}:h={height}:x='{expr(2)}':y='{expr(3)}'"
+
+
+def render_clip(src: str, out_path: str, crops: dict, fragments: list, crf: int = 18) -> str:
+    """Apply the clip's crop windows to src in one encode; returns out_path."""
+    vf = crop_filter(int(crops['crop_width']), int(crops['crop_height']), clip_segments(crops, fragments))
+    r = encoders.encode(lambda v: [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-i', src, '-vf', vf,
+        *v, '-c:a', 'copy', '-movflags', '+faststart',
+        out_path,
+    ], crf=crf, label='ffmpeg_speaker_crop', capture_output=True, text=True)
+    if r.returncode != 0 or not os.path.exists(out_path):
+        raise RuntimeError(f"speaker crop failed for {os.path.basename(src)}: {(r.stderr or '').strip()[-300:]}")
+    return out_path
@@ -5,8 +5,10 @@ A simplified application for video upscaling using realesr-general-x4v3 model.
 """
 
 import os
+import re
 import sys
 import time
+import struct
 import subprocess
 import cv2
 import tempfile
@@ -20,10 +22,107 @@ import warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='multiprocessing.resource_tracker')
 os.environ.setdefault('PYTHONWARNINGS', 'ignore::UserWarning:multiprocessing.resource_tracker')
 
+# Optional metrics (present when running under server.py)
+try:
+    import metrics as _metrics
+except Exception:
+    _metrics = None
+
+
+def _observe_fps(phase, frames, seconds):
+    if _metrics is not None:
+        _metrics.observe_fps(phase, frames, seconds)
+
+
+# Optional per-job call profiling (present when running under server.py)
+try:
+    import profiling as _profiling
+except Exception:
+    _profiling = None
+
+
+def _run(cmd, label, **kwargs):
+    if _profiling is not None:
+        return _profiling.run(cmd, label=label, **kwargs)
+    return subprocess.run(cmd, **kwargs)
+
+
+# Optional encoder ladder (NVENC -> libx264 -> ...); without it frames go through OpenCV's mp4v writer
+try:
+    import encoders as _encoders
+except Exception:
+    _encoders = None
+
+# Upscaled frames in the output dir (Real-ESRGAN may add a suffix, e.g. frame_000001_out.png)
+_OUTPUT_FRAME_RE = re.compile(r'^frame_\d+.*\.(png|jpe?g)$', re.IGNORECASE)
+
+# Optional near-duplicate frame skipping (see frame_dedup.py)
+try:
+    import frame_dedup as _dedup
+except Exception:
+    _dedup = None
+
+
+def _encode_frames_ffmpeg(frames_dir, frame_files, fps, size, output_video_path, audio_source=None):
+    """
+    Pipe frames as rawvideo (bgr24) into ffmpeg and encode them with the selected
+    H.264/H.265 encoder, muxing the audio of audio_source in the same pass.
+    Returns the number of frames written, or 0 on failure.
+    """
+    if _encoders is None or not frame_files:
+        return 0
+    width, height = size
+    fed = {'frames': 0}
+
+    def feed(stdin):
+        written = fed['frames'] = 0
+        for frame_file in frame_files:
+            frame = cv2.imread(os.path.join(frames_dir, frame_file))
+            if frame is None:
+                continue
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            stdin.write(frame.tobytes())
+            written += 1
+            fed['frames'] = written
+        return written
+
+    def build(with_audio):
+        def cmd(v):
+            argv = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+                    '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}',
+                    '-framerate', f'{fps:.6f}', '-i', '-']
+            if with_audio:
+                # "?" keeps sources without an audio stream working
+                argv += ['-i', audio_source, '-map', '0:v:0', '-map', '1:a:0?',
+                         '-c:a', 'aac', '-b:a', '192k', '-shortest']
+            return argv + [*v, '-pix_fmt', 'yuv420p', '-movflags', '+faststart', output_video_path]
+        return cmd
+
+    with_audio = bool(UPSCALE_AUDIO and audio_source)
+    r = _encoders.encode_pipe(build(with_audio), feed, crf=UPSCALE_CRF, label='ffmpeg_encode_frames', codec=UPSCALE_CODEC)
+    if r.returncode != 0 and with_audio:
+        # A source ffmpeg cannot demux must not cost us the upscaled video
+        print(f"ffmpeg encode with audio failed, retrying video-only: {(r.stderr or '').strip()[-300:]}")
+        r = _encoders.encode_pipe(build(False), feed, crf=UPSCALE_CRF, label='ffmpeg_encode_frames', codec=UPSCALE_CODEC)
+    if r.returncode != 0:
+        print(f"ffmpeg frame encode failed, falling back to OpenCV mp4v: {(r.stderr or '').strip()[-300:]}")
+        return 0
+    print(f"Encoded with {getattr(r, 'encoder', '?')}{' + source audio' if with_audio else ''}")
+    # Unreadable frames are skipped by feed(), so report what the encoder actually got
+    return fed['frames']
+
+
 # Configuration
 DENOISE_STRENGTH = 0.5
 UPSCALE_FACTOR = 4
 FACE_ENHANCEMENT = True
+# Reconstruction: 'ffmpeg' (rawvideo pipe -> H.264/H.265 + source audio) or 'mp4v' (OpenCV, video only)
+UPSCALE_WRITER = os.environ.get('UPSCALE_WRITER', 'ffmpeg').strip().lower()
+UPSCALE_CODEC = os.environ.get('UPSCALE_CODEC', 'h264').strip().lower()
+UPSCALE_CRF = int(os.environ.get('UPSCALE_CRF', '18'))
+UPSCALE_AUDIO = str(os.environ.get('UPSCALE_AUDIO', '1')).strip().lower() in ('1', 'true', 'yes')
+UPSCALE_DEDUP = _dedup is not None and _dedup.DEDUP
 
 def install_upscale_dependencies():
     """Install dependencies for video upscaling."""
@@ -68,297 +167,483 @@ def download_realesrgan_model():
         print(f"Failed to download Real-ESRGAN model: {e}")
         return False
 
-def upscale_video_with_realesrgan(input_video_path, output_video_path):
+class UpscaleUnit:
+    """One video prepared for Real-ESRGAN: its extracted frames and where the upscaled frames go."""
+
+    def __init__(self, input_video_path, output_video_path):
+        self.input_video_path = input_video_path
+        self.output_video_path = output_video_path
+        self.temp_dir = tempfile.mkdtemp()
+        self.frames_dir = os.path.join(self.temp_dir, "frames")
+        self.output_frames_dir = os.path.join(self.temp_dir, "output_frames")
+        os.makedirs(self.frames_dir, exist_ok=True)
+        os.makedirs(self.output_frames_dir, exist_ok=True)
+        self.fps = 0.0
+        self.frames = 0
+        self.size = None  # (width, height) of the input frames
+        self.dedup = None  # frame_dedup plan when near-duplicate frames were taken out
+        self.dedup_stats = None
+        self.tile_plan = None  # what Real-ESRGAN chose for tiling (vendor script only)
+
+    def cleanup(self):
+        if self.temp_dir and os.path.exists(self.temp_dir):
+            try:
+                shutil.rmtree(self.temp_dir)
+            except Exception as cleanup_error:
+                print(f"Warning: Failed to cleanup temp directory: {cleanup_error}")
+
+
+def _png_size(path):
+    """(width, height) from the PNG IHDR chunk, without decoding the image."""
+    with open(path, 'rb') as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != b'\x89PNG\r\n\x1a\n':
+        return None
+    return struct.unpack('>II', head[16:24])
+
+
+def prepare_upscale(input_video_path, output_video_path):
     """
-    Upscale video using Real-ESRGAN with specified settings.
-    
-    Args:
-        input_video_path (str): Path to input video file
-        output_video_path (str): Path to output upscaled video file
-    
-    Returns:
-        bool: True if successful, False otherwise
+    CPU half before the GPU: extract the frames of input_video_path into a new UpscaleUnit.
+    Raises on failure (the unit's temp dir is removed).
     """
-    temp_dir = None
+    unit = UpscaleUnit(input_video_path, output_video_path)
     try:
-        print(f"Upscaling video: {input_video_path}")
-        print(f"Settings: Denoise={DENOISE_STRENGTH}, Upscale={UPSCALE_FACTOR}x, FaceEnhance={FACE_ENHANCEMENT}")
-        
-        # Create temporary directory for frame processing
-        temp_dir = tempfile.mkdtemp()
-        frames_dir = os.path.join(temp_dir, "frames")
-        output_frames_dir = os.path.join(temp_dir, "output_frames")
-        os.makedirs(frames_dir, exist_ok=True)
-        os.makedirs(output_frames_dir, exist_ok=True)
-        
-        # Validate input file
-        if not os.path.exists(input_video_path) or os.path.getsize(input_video_path) == 0:
-            raise Exception(f"Input video not found or empty: {input_video_path}")
+        _extract_frames(unit)
+        if UPSCALE_DEDUP:
+            _skip_duplicate_frames(unit)
+        return unit
+    except Exception:
+        unit.cleanup()
+        raise
+
+
+def _extract_frames(unit):
+    input_video_path = unit.input_video_path
+    temp_dir = unit.temp_dir
+    frames_dir = unit.frames_dir
+
+    # Validate input file
+    if not os.path.exists(input_video_path) or os.path.getsize(input_video_path) == 0:
+        raise Exception(f"Input video not found or empty: {input_video_path}")
+    try:
+        in_size = os.path.getsize(input_video_path)
+        print(f"Input file: {input_video_path} (size={in_size} bytes)")
+    except Exception:
+        print(f"Input file: {input_video_path} (size=unknown)")
+
+    # Extract frames from video (OpenCV first, then robust ffmpeg fallback)
+    print("Extracting video frames...")
+
+    def _ffprobe_fps(path: str) -> float:
         try:
-            in_size = os.path.getsize(input_video_path)
-            print(f"Input file: {input_video_path} (size={in_size} bytes)")
+            probe = _run([
+                'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                '-show_entries', 'stream=avg_frame_rate',
+                '-of', 'default=nokey=1:noprint_wrappers=1', path
+            ], 'ffprobe_fps', capture_output=True, text=True)
+            if probe.returncode == 0 and probe.stdout.strip():
+                val = probe.stdout.strip()
+                if '/' in val:
+                    num, den = val.split('/')
+                    num = float(num or 0.0)
+                    den = float(den or 1.0)
+                    return num / den if den else 0.0
+                return float(val)
         except Exception:
-            print(f"Input file: {input_video_path} (size=unknown)")
-
-        # Extract frames from video (OpenCV first, then robust ffmpeg fallback)
-        print("Extracting video frames...")
+            pass
+        return 0.0
 
-        def _ffprobe_fps(path: str) -> float:
-            try:
-                probe = subprocess.run([
-                    'ffprobe', '-v', 'error', '-select_streams', 'v:0',
-                    '-show_entries', 'stream=avg_frame_rate',
-                    '-of', 'default=nokey=1:noprint_wrappers=1', path
-                ], capture_output=True, text=True)
-                if probe.returncode == 0 and probe.stdout.strip():
-                    val = probe.stdout.strip()
-                    if '/' in val:
-                        num, den = val.split('/')
-                        num = float(num or 0.0)
-                        den = float(den or 1.0)
-                        return num / den if den else 0.0
-                    return float(val)
-            except Exception:
-                pass
-            return 0.0
-
-        def _extract_with_ffmpeg(path: str, out_dir: str) -> int:
-            # Try to extract frames with ffmpeg (more robust for malformed moov)
-            try:
-                cmd = [
+    def _extract_with_ffmpeg(path: str, out_dir: str) -> int:
+        # Try to extract frames with ffmpeg (more robust for malformed moov)
+        try:
+            cmd = [
+                'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+                '-i', path, '-vsync', '0', os.path.join(out_dir, 'frame_%06d.png')
+            ]
+            r = _run(cmd, 'ffmpeg_extract', capture_output=True, text=True)
+            if r.returncode != 0:
+                if r.stderr:
+                    print("ffmpeg decode error:\n" + r.stderr)
+                # Attempt a faststart remux and retry once
+                fixed = os.path.join(temp_dir, 'fixed_faststart.mp4')
+                r1 = _run([
                     'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
-                    '-i', path, '-vsync', '0', os.path.join(out_dir, 'frame_%06d.png')
-                ]
-                r = subprocess.run(cmd, capture_output=True, text=True)
-                if r.returncode != 0:
-                    if r.stderr:
-                        print("ffmpeg decode error:\n" + r.stderr)
-                    # Attempt a faststart remux and retry once
-                    fixed = os.path.join(temp_dir, 'fixed_faststart.mp4')
-                    r1 = subprocess.run([
+                    '-i', path, '-c', 'copy', '-movflags', '+faststart', fixed
+                ], 'ffmpeg_faststart', capture_output=True, text=True)
+                if r1.returncode == 0:
+                    r2 = _run([
                         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
-                        '-i', path, '-c', 'copy', '-movflags', '+faststart', fixed
-                    ], capture_output=True, text=True)
-                    if r1.returncode == 0:
-                        r2 = subprocess.run([
-                            'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
-                            '-i', fixed, '-vsync', '0', os.path.join(out_dir, 'frame_%06d.png')
-                        ], capture_output=True, text=True)
-                        if r2.returncode != 0:
-                            if r2.stderr:
-                                print("ffmpeg retry after faststart failed:\n" + r2.stderr)
-                            return 0
-                    else:
-                        if r1.stderr:
-                            print("ffmpeg faststart remux failed:\n" + r1.stderr)
+                        '-i', fixed, '-vsync', '0', os.path.join(out_dir, 'frame_%06d.png')
+                    ], 'ffmpeg_extract', capture_output=True, text=True)
+                    if r2.returncode != 0:
+                        if r2.stderr:
+                            print("ffmpeg retry after faststart failed:\n" + r2.stderr)
                         return 0
-                # Count frames
-                return sum(1 for f in os.listdir(out_dir) if f.lower().endswith('.png'))
-            except Exception as e:
-                print(f"ffmpeg exception: {e}")
-                return 0
-
-        # Try OpenCV first
-        fps = 0.0
-        frame_idx = 0
-        cap = cv2.VideoCapture(input_video_path)
-        try:
-            if cap.isOpened():
-                fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
-                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-                print(f"Video FPS (cv2): {fps}, Total frames (cv2): {frame_count}")
-
-                while True:
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-                    frame_path = os.path.join(frames_dir, f"frame_{frame_idx:06d}.png")
-                    cv2.imwrite(frame_path, frame)
-                    frame_idx += 1
-        finally:
-            cap.release()
-
-        # Fallback to ffmpeg if cv2 failed or extracted nothing
-        if frame_idx == 0:
-            print("OpenCV extraction failed or yielded 0 frames; falling back to ffmpeg...")
-            # Probe to expose detailed demuxer errors
-            try:
-                probe = subprocess.run(['ffmpeg', '-v', 'error', '-hide_banner', '-i', input_video_path, '-f', 'null', '-'], capture_output=True, text=True)
-                if probe.stderr:
-                    print("ffmpeg probe:\n" + probe.stderr)
-            except Exception:
-                pass
-            frame_idx = _extract_with_ffmpeg(input_video_path, frames_dir)
-            if fps <= 0.0:
-                fps = _ffprobe_fps(input_video_path)
-
-        if frame_idx == 0:
-            raise Exception("Failed to extract frames from input video (cv2 and ffmpeg)")
+                else:
+                    if r1.stderr:
+                        print("ffmpeg faststart remux failed:\n" + r1.stderr)
+                    return 0
+            # Count frames
+            return sum(1 for f in os.listdir(out_dir) if f.lower().endswith('.png'))
+        except Exception as e:
+            print(f"ffmpeg exception: {e}")
+            return 0
+
+    # Try OpenCV first
+    fps = 0.0
+    frame_idx = 0
+    extract_t0 = time.time()
+    cap = cv2.VideoCapture(input_video_path)
+    try:
+        if cap.isOpened():
+            fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            print(f"Video FPS (cv2): {fps}, Total frames (cv2): {frame_count}")
+
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frame_path = os.path.join(frames_dir, f"frame_{frame_idx:06d}.png")
+                cv2.imwrite(frame_path, frame)
+                frame_idx += 1
+    finally:
+        cap.release()
 
+    # Fallback to ffmpeg if cv2 failed or extracted nothing
+    if frame_idx == 0:
+        print("OpenCV extraction failed or yielded 0 frames; falling back to ffmpeg...")
+        # Probe to expose detailed demuxer errors
+        try:
+            probe = subprocess.run(['ffmpeg', '-v', 'error', '-hide_banner', '-i', input_video_path, '-f', 'null', '-'], capture_output=True, text=True)
+            if probe.stderr:
+                print("ffmpeg probe:\n" + probe.stderr)
+        except Exception:
+            pass
+        frame_idx = _extract_with_ffmpeg(input_video_path, frames_dir)
         if fps <= 0.0:
-            # Default to 30 FPS if probing failed; we'll still produce a playable video
-            fps = 30.0
+            fps = _ffprobe_fps(input_video_path)
+
+    if frame_idx == 0:
+        raise Exception("Failed to extract frames from input video (cv2 and ffmpeg)")
+
+    if fps <= 0.0:
+        # Default to 30 FPS if probing failed; we'll still produce a playable video
+        fps = 30.0
+
+    print(f"Extracted {frame_idx} frames (fps={fps})")
+    _observe_fps("extract", frame_idx, time.time() - extract_t0)
+
+    # Sanity check: ensure frames exist before invoking ESRGAN
+    frame_files = sorted(fn for fn in os.listdir(frames_dir) if fn.lower().endswith(('.png', '.jpg', '.jpeg')))
+    if not frame_files:
+        raise Exception(f"No frames found to enhance in: {frames_dir}")
+    unit.fps = fps
+    unit.frames = frame_idx
+    unit.size = _png_size(os.path.join(frames_dir, frame_files[0]))
+
+
+def _skip_duplicate_frames(unit):
+    """Leave only the frames (or changed regions) that need ESRGAN in the unit's frames dir."""
+    t0 = time.time()
+    unit.dedup = _dedup.plan(unit.frames_dir, roi=_dedup.roi_enabled(FACE_ENHANCEMENT))
+    unit.dedup_stats = _dedup.apply(unit.frames_dir, unit.dedup)
+    unit.frames = unit.dedup_stats["esrgan_inputs"]
+    st = unit.dedup_stats
+    print(f"Dedup: {st['full']} full, {st['roi']} ROI, {st['duplicate']} duplicate of {st['frames']} frames "
+          f"({st['esrgan_pixel_share'] * 100:.0f}% of pixels to ESRGAN, {time.time() - t0:.1f}s)")
+
+
+# Build Real-ESRGAN command with fallbacks depending on installed version
+def _realesrgan_cmd_base() -> list[str]:
+    # Use explicit venv python if provided, otherwise sys.executable
+    python_exe = os.environ.get('VENV_PYTHON') or sys.executable
+    try:
+        if importlib.util.find_spec('realesrgan.inference_realesrgan') is not None:
+            return [python_exe, '-m', 'realesrgan.inference_realesrgan']
+    except Exception:
+        pass
+    try:
+        if importlib.util.find_spec('realesrgan') is not None and importlib.util.find_spec('realesrgan.__main__') is not None:
+            return [python_exe, '-m', 'realesrgan']
+    except Exception:
+        pass
+    exe = shutil.which('realesrgan')
+    if exe:
+        return [exe]
+    try:
+        from pathlib import Path as _P
+        sibling = _P(sys.executable).with_name('realesrgan')
+        if sibling.exists():
+            return [str(sibling)]
+    except Exception:
+        pass
+    # Final fallback: vendor script in repo
+    try:
+        python_exe = os.environ.get('VENV_PYTHON') or sys.executable
+        from pathlib import Path as _P2
+        here = _P2(__file__).resolve()
+        root = None
+        for p in [here.parent, *here.parents]:
+            if (p / 'sitecustomize.py').exists():
+                root = p
+                break
+        if root is None:
+            root = here.parent
+        vendor = os.path.join(str(root), 'vendor', 'realesrgan_infer.py')
+        if os.path.isfile(vendor):
+            return [python_exe, vendor]
+    except Exception:
+        pass
+    raise RuntimeError("Real-ESRGAN CLI not found. Ensure 'realesrgan' package or vendor script is available.")
+
+
+def _tile_plan_path(output_frames_dir):
+    """Next to (not inside) the output frames dir, which must hold frames only."""
+    return os.path.normpath(output_frames_dir) + ".tile_plan.json"
+
+
+def _read_tile_plan(output_frames_dir):
+    try:
+        with open(_tile_plan_path(output_frames_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _esrgan_cmd(frames_dir, output_frames_dir):
+    base = _realesrgan_cmd_base()
+    cmd = base + [
+        '-i', frames_dir,
+        '-o', output_frames_dir,
+        '-n', 'realesr-general-x4v3',
+        '--outscale', str(UPSCALE_FACTOR)
+    ]
+
+    # Add denoise strength
+    if DENOISE_STRENGTH != 0.5:  # 0.5 is default
+        cmd.extend(['--denoise_strength', str(DENOISE_STRENGTH)])
+
+    # Add face enhancement
+    if FACE_ENHANCEMENT:
+        cmd.append('--face_enhance')
+
+    # Add model path if exists
+    model_path = os.path.join('models', 'realesr-general-x4v3.pth')
+    if os.path.exists(model_path):
+        cmd.extend(['--model_path', model_path])
+
+    # The vendor script sizes tiles to the free memory (REALESRGAN_TILE) and reports its plan
+    if base[-1].endswith('realesrgan_infer.py'):
+        cmd.extend(['--tile_plan', _tile_plan_path(output_frames_dir)])
+    return cmd
+
+
+def _esrgan_env():
+    # Ensure our sitecustomize.py is imported in the subprocess
+    def _find_patch_root() -> str:
+        here = Path(__file__).resolve()
+        for p in [here.parent, *here.parents]:
+            if (p / 'sitecustomize.py').exists():
+                return str(p)
+        return str(here.parent)
+
+    env = os.environ.copy()
+    patch_root = _find_patch_root()
+    existing_pp = env.get('PYTHONPATH', '')
+    env['PYTHONPATH'] = (patch_root if not existing_pp else patch_root + os.pathsep + existing_pp)
+
+    # Ensure model paths are passed to subprocess
+    if 'REALESRGAN_MODEL_PATH' in os.environ:
+        env['REALESRGAN_MODEL_PATH'] = os.environ['REALESRGAN_MODEL_PATH']
+    if 'GFPGAN_MODEL_PATH' in os.environ:
+        env['GFPGAN_MODEL_PATH'] = os.environ['GFPGAN_MODEL_PATH']
+    return env
+
+
+def _has_frames(path):
+    return os.path.isdir(path) and any(fn.lower().endswith(('.png', '.jpg', '.jpeg')) for fn in os.listdir(path))
+
+
+def _run_esrgan(frames_dir, output_frames_dir, frames):
+    """One Real-ESRGAN process over frames_dir; True if it produced frames."""
+    cmd = _esrgan_cmd(frames_dir, output_frames_dir)
+    print("Running Real-ESRGAN upscaling...")
+    print(f"Command: {' '.join(cmd)}")
+
+    # Run Real-ESRGAN with patched PYTHONPATH so sitecustomize is auto-imported
+    try:
+        esrgan_t0 = time.time()
+        result = _run(cmd, 'esrgan', capture_output=True, text=True, env=_esrgan_env())
+        _observe_fps("esrgan", frames, time.time() - esrgan_t0)
+    except Exception as e:
+        print(f"Failed to execute Real-ESRGAN command: {e}")
+        print(f"Tried command: {' '.join(cmd)}")
+        return False
 
-        print(f"Extracted {frame_idx} frames (fps={fps})")
+    produced_any = _has_frames(output_frames_dir)
+    if result.returncode != 0 and not produced_any:
+        print(f"Real-ESRGAN failed: {result.stderr or result.stdout}")
+        print(f"Command was: {' '.join(cmd)}")
+        return False
 
-        # Sanity check: ensure frames exist before invoking ESRGAN
-        if not any(fn.lower().endswith(('.png', '.jpg', '.jpeg')) for fn in os.listdir(frames_dir)):
-            print(f"No frames found to enhance in: {frames_dir}")
-            return False
-        
-        # Build Real-ESRGAN command with fallbacks depending on installed version
-        def _realesrgan_cmd_base() -> list[str]:
-            # Use explicit venv python if provided, otherwise sys.executable
-            python_exe = os.environ.get('VENV_PYTHON') or sys.executable
-            try:
-                if importlib.util.find_spec('realesrgan.inference_realesrgan') is not None:
-                    return [python_exe, '-m', 'realesrgan.inference_realesrgan']
-            except Exception:
-                pass
-            try:
-                if importlib.util.find_spec('realesrgan') is not None and importlib.util.find_spec('realesrgan.__main__') is not None:
-                    return [python_exe, '-m', 'realesrgan']
-            except Exception:
-                pass
-            exe = shutil.which('realesrgan')
-            if exe:
-                return [exe]
-            try:
-                from pathlib import Path as _P
-                sibling = _P(sys.executable).with_name('realesrgan')
-                if sibling.exists():
-                    return [str(sibling)]
-            except Exception:
-                pass
-            # Final fallback: vendor script in repo
-            try:
-                python_exe = os.environ.get('VENV_PYTHON') or sys.executable
-                from pathlib import Path as _P2
-                here = _P2(__file__).resolve()
-                root = None
-                for p in [here.parent, *here.parents]:
-                    if (p / 'sitecustomize.py').exists():
-                        root = p
-                        break
-                if root is None:
-                    root = here.parent
-                vendor = os.path.join(str(root), 'vendor', 'realesrgan_infer.py')
-                if os.path.isfile(vendor):
-                    return [python_exe, vendor]
-            except Exception:
-                pass
-            raise RuntimeError("Real-ESRGAN CLI not found. Ensure 'realesrgan' package or vendor script is available.")
-
-        cmd = _realesrgan_cmd_base() + [
-            '-i', frames_dir,
-            '-o', output_frames_dir,
-            '-n', 'realesr-general-x4v3',
-            '--outscale', str(UPSCALE_FACTOR)
-        ]
-
-        # Add denoise strength
-        if DENOISE_STRENGTH != 0.5:  # 0.5 is default
-            cmd.extend(['--denoise_strength', str(DENOISE_STRENGTH)])
-
-        # Add face enhancement
-        if FACE_ENHANCEMENT:
-            cmd.append('--face_enhance')
-
-        # Add model path if exists
-        model_path = os.path.join('models', 'realesr-general-x4v3.pth')
-        if os.path.exists(model_path):
-            cmd.extend(['--model_path', model_path])
-
-        # Ensure our sitecustomize.py is imported in the subprocess
-        def _find_patch_root() -> str:
-            here = Path(__file__).resolve()
-            for p in [here.parent, *here.parents]:
-                if (p / 'sitecustomize.py').exists():
-                    return str(p)
-            return str(here.parent)
-
-        env = os.environ.copy()
-        patch_root = _find_patch_root()
-        existing_pp = env.get('PYTHONPATH', '')
-        env['PYTHONPATH'] = (patch_root if not existing_pp else patch_root + os.pathsep + existing_pp)
-        
-        # Ensure model paths are passed to subprocess
-        if 'REALESRGAN_MODEL_PATH' in os.environ:
-            env['REALESRGAN_MODEL_PATH'] = os.environ['REALESRGAN_MODEL_PATH']
-        if 'GFPGAN_MODEL_PATH' in os.environ:
-            env['GFPGAN_MODEL_PATH'] = os.environ['GFPGAN_MODEL_PATH']
+    # Verify outputs exist
+    if not produced_any:
+        print("Real-ESRGAN finished without producing frames.")
+        if result.stdout:
+            print("STDOUT:\n" + result.stdout)
+        if result.stderr:
+            print("STDERR:\n" + result.stderr)
+        return False
+    return True
 
-        print("Running Real-ESRGAN upscaling...")
-        print(f"Command: {' '.join(cmd)}")
 
-        # Run Real-ESRGAN with patched PYTHONPATH so sitecustomize is auto-imported
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, env=env)
-        except Exception as e:
-            print(f"Failed to execute Real-ESRGAN command: {e}")
-            print(f"Tried command: {' '.join(cmd)}")
-            return False
+def _link(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
 
-        produced_any = os.path.isdir(output_frames_dir) and any(
-            fn.lower().endswith(('.png', '.jpg', '.jpeg')) for fn in os.listdir(output_frames_dir)
-        )
-        if result.returncode != 0 and not produced_any:
-            print(f"Real-ESRGAN failed: {result.stderr or result.stdout}")
-            print(f"Command was: {' '.join(cmd)}")
-            return False
 
-        # Verify outputs exist
-        if not produced_any:
-            print("Real-ESRGAN finished without producing frames.")
-            if result.stdout:
-                print("STDOUT:\n" + result.stdout)
-            if result.stderr:
-                print("STDERR:\n" + result.stderr)
-            return False
+def run_esrgan_batch(units):
+    """
+    GPU half: upscale the frames of several units with ONE Real-ESRGAN process (the model is
+    loaded once). Frames are hard-linked into a shared dir under a per-unit prefix and the
+    outputs are split back by that prefix. A unit that did not get all its frames back is
+    retried on its own, so a bad clip only fails itself. Returns one bool per unit.
+    """
+    if len(units) == 1:
+        unit = units[0]
+        ok = _run_esrgan(unit.frames_dir, unit.output_frames_dir, unit.frames)
+        unit.tile_plan = _read_tile_plan(unit.output_frames_dir)
+        return [ok]
 
-        print("Upscaling completed")
-        
-        # Reconstruct video from upscaled frames
-        print("Reconstructing upscaled video...")
-        
-        # Get dimensions of first upscaled frame
-        output_frame_files = sorted(os.listdir(output_frames_dir))
-        
-            
-        first_frame_path = os.path.join(output_frames_dir, output_frame_files[0])
-        first_frame = cv2.imread(first_frame_path)
-        height, width = first_frame.shape[:2]
-        
+    batch_dir = tempfile.mkdtemp(prefix="esrgan_batch_")
+    try:
+        in_dir = os.path.join(batch_dir, "frames")
+        out_dir = os.path.join(batch_dir, "output_frames")
+        os.makedirs(in_dir)
+        os.makedirs(out_dir)
+        for k, unit in enumerate(units):
+            for fn in os.listdir(unit.frames_dir):
+                _link(os.path.join(unit.frames_dir, fn), os.path.join(in_dir, f"u{k:03d}__{fn}"))
+        print(f"Batching {len(units)} videos ({sum(u.frames for u in units)} frames) into one Real-ESRGAN run")
+        _run_esrgan(in_dir, out_dir, sum(u.frames for u in units))
+        plan = _read_tile_plan(out_dir)
+        for unit in units:
+            unit.tile_plan = plan
+        for fn in os.listdir(out_dir):
+            prefix, sep, rest = fn.partition("__")
+            if not sep or not prefix.startswith("u"):
+                continue
+            try:
+                unit = units[int(prefix[1:])]
+            except (ValueError, IndexError):
+                continue
+            os.replace(os.path.join(out_dir, fn), os.path.join(unit.output_frames_dir, rest))
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+    results = []
+    for unit in units:
+        done = sum(1 for fn in os.listdir(unit.output_frames_dir) if fn.lower().endswith(('.png', '.jpg', '.jpeg')))
+        if done >= unit.frames:
+            results.append(True)
+            continue
+        # The batch stopped before finishing this unit (e.g. another clip crashed it): redo it alone
+        print(f"Batch produced {done}/{unit.frames} frames for {unit.input_video_path}; retrying it alone")
+        shutil.rmtree(unit.output_frames_dir, ignore_errors=True)
+        os.makedirs(unit.output_frames_dir, exist_ok=True)
+        results.append(_run_esrgan(unit.frames_dir, unit.output_frames_dir, unit.frames))
+        unit.tile_plan = _read_tile_plan(unit.output_frames_dir)
+    return results
+
+
+def finish_upscale(unit):
+    """CPU half after the GPU: encode the unit's upscaled frames into its output video."""
+    output_video_path = unit.output_video_path
+    output_frames_dir = unit.output_frames_dir
+    fps = unit.fps
+    print("Upscaling completed")
+    if unit.dedup:
+        _dedup.reconstruct(output_frames_dir, unit.dedup)
+
+    # Reconstruct video from upscaled frames
+    print("Reconstructing upscaled video...")
+
+    # Get dimensions of first upscaled frame
+    output_frame_files = sorted(fn for fn in os.listdir(output_frames_dir) if _OUTPUT_FRAME_RE.match(fn))
+    if not output_frame_files:
+        raise Exception(f"No upscaled frames in {output_frames_dir}")
+
+    first_frame_path = os.path.join(output_frames_dir, output_frame_files[0])
+    first_frame = cv2.imread(first_frame_path)
+    height, width = first_frame.shape[:2]
+
+    encode_t0 = time.time()
+    written = 0
+    if UPSCALE_WRITER != 'mp4v':
+        written = _encode_frames_ffmpeg(output_frames_dir, output_frame_files, fps, (width, height),
+                                        output_video_path, audio_source=unit.input_video_path)
+    if not written:
         # Initialize video writer
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
-        
+
         if not out.isOpened():
             raise Exception("Error initializing video writer")
-        
+
+        written = 0
         try:
             # Write frames to video
-            for frame_file in sorted(os.listdir(output_frames_dir)):
+            for frame_file in output_frame_files:
                 frame_path = os.path.join(output_frames_dir, frame_file)
                 frame = cv2.imread(frame_path)
+                if frame is None:
+                    continue
                 out.write(frame)
+                written += 1
         finally:
             out.release()
-        
-        print(f"Upscaled video saved to: {output_video_path}")
-        
-        return True
-        
+    encode_seconds = time.time() - encode_t0
+    _observe_fps("encode", written, encode_seconds)
+    print(f"Encoded {written} frames in {encode_seconds:.1f}s ({written / max(encode_seconds, 1e-6):.1f} fps)")
+
+    print(f"Upscaled video saved to: {output_video_path}")
+    return True
+
+
+def upscale_video_with_realesrgan(input_video_path, output_video_path, esrgan=None):
+    """
+    Upscale video using Real-ESRGAN with specified settings.
+    
+    Args:
+        input_video_path (str): Path to input video file
+        output_video_path (str): Path to output upscaled video file
+        esrgan (callable): optional unit -> bool that runs the GPU step (e.g. a shared batching
+            queue); defaults to a dedicated Real-ESRGAN run
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    unit = None
+    try:
+        print(f"Upscaling video: {input_video_path}")
+        print(f"Settings: Denoise={DENOISE_STRENGTH}, Upscale={UPSCALE_FACTOR}x, FaceEnhance={FACE_ENHANCEMENT}")
+        unit = prepare_upscale(input_video_path, output_video_path)
+        ok = esrgan(unit) if esrgan else run_esrgan_batch([unit])[0]
+        if not ok:
+            return False
+        return finish_upscale(unit)
     except Exception as e:
         print(f"Error during video upscaling: {e}")
         return False
     finally:
         # Always clean up temporary directory
-        if temp_dir and os.path.exists(temp_dir):
-            try:
-                shutil.rmtree(temp_dir)
-            except Exception as cleanup_error:
-                print(f"Warning: Failed to cleanup temp directory: {cleanup_error}")
+        if unit is not None:
+            unit.cleanup()
+
 
 def receive_video_via_ssh(ssh_user, ssh_host, remote_video_path, local_video_path):
     """
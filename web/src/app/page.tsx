@@ -4,6 +4,7 @@ import React from 'react'
 /// <reference types="react" />
 import { useEffect, useState } from 'react'
 import { createTask, listTasks, retryTask, deleteTask, clearTasks, listDownloads, deleteDownload, getTaskClips, updateClip, API_BASE, type Task, type DownloadedItem, type Clip } from '@/lib/api'
+import { useLiveEvents, applyDelta } from '@/lib/events'
 import { useUpscaleTasks, triggerUpscaleScan, retryUpscale, getUpscaleSettings, saveUpscaleSettings, ensureUpscaleInstance, deleteUpscale, clearUpscale, clearGpuQueue, getGpuQueueStatus, listUpscaleTasks, type UpscaleTask } from '@/lib/upscale'
 
 function StageChip({ stage }: { stage?: string | null }) {
@@ -215,6 +216,8 @@ function VideosLinks({ t, onShowClips }: { t: Task; onShowClips: () => void }) {
 
 type Tab = 'cut' | 'upscale' | 'downloads' | 'clips'
 
+const CLIPS_PAGE_SIZE = 200
+
 function UpscaleSection() {
   const { tasks, refresh } = useUpscaleTasks()
   const [showSettings, setShowSettings] = useState(false)
@@ -402,6 +405,38 @@ export default function Page() {
   const [statusDropdownOpen, setStatusDropdownOpen] = useState(false)
   const [channelDropdownOpen, setChannelDropdownOpen] = useState(false)
 
+  const [clipsNextAfter, setClipsNextAfter] = useState<number | null>(null)
+
+  // Status/channel filters are applied server-side so paging covers the whole library
+  function clipsQueryUrl(afterId?: number) {
+    const params = new URLSearchParams({ limit: String(CLIPS_PAGE_SIZE) })
+    if (!statusFilter.includes('all')) params.set('status', statusFilter.join(','))
+    if (!channelFilter.includes('all')) params.set('channel', channelFilter.join(','))
+    if (afterId) params.set('after_id', String(afterId))
+    return `${API_BASE}/api/clips?${params.toString()}`
+  }
+
+  // Client-side twin of the /api/clips status/channel filters, for clips arriving as events
+  function clipMatchesFilters(clip: Clip) {
+    const matches = (selected: string[], value?: string | null) =>
+      selected.includes('all') || (value ? selected.includes(value) : selected.includes('Empty'))
+    return matches(statusFilter, clip.status) && matches(channelFilter, clip.channel)
+  }
+
+  async function loadMoreClips() {
+    if (clipsNextAfter === null) return
+    try {
+      const response = await fetch(clipsQueryUrl(clipsNextAfter), { cache: 'no-store', mode: 'cors' })
+      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`)
+      const page: Clip[] = await response.json()
+      const next = response.headers.get('X-Next-After-Id')
+      setClips(prev => [...prev, ...page.filter(c => !prev.some(p => p.id === c.id))])
+      setClipsNextAfter(next ? Number(next) : null)
+    } catch (e) {
+      console.error('Error loading more clips:', e)
+    }
+  }
+
   async function refresh() {
     console.log('=== Starting refresh ===')
     console.log('Current tab:', tab)
@@ -420,15 +455,23 @@ export default function Page() {
 
       if (tab === 'clips') {
         try {
-          console.log('Fetching clips from:', `${API_BASE}/api/clips`)
-          const response = await fetch(`${API_BASE}/api/clips`, { cache: 'no-store', mode: 'cors' })
+          const url = clipsQueryUrl()
+          console.log('Fetching clips from:', url)
+          const response = await fetch(url, { cache: 'no-store', mode: 'cors' })
           console.log('Clips response status:', response.status)
           if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`)
           }
-          const clipsData = await response.json()
+          const clipsData: Clip[] = await response.json()
           console.log('Clips fetched:', clipsData.length)
-          setClips(clipsData)
+          const next = response.headers.get('X-Next-After-Id')
+          // Refresh the first page only; keep older pages the user already loaded
+          setClips(prev => {
+            if (!next || clipsData.length === 0) return clipsData
+            const oldest = clipsData[clipsData.length - 1].id
+            return [...clipsData, ...prev.filter(c => c.id < oldest)]
+          })
+          setClipsNextAfter(prev => (!next ? null : (prev !== null && prev < Number(next) ? prev : Number(next))))
         } catch (clipsError) {
           console.error('Error fetching clips:', clipsError)
         }
@@ -437,26 +480,12 @@ export default function Page() {
       try {
         console.log('Fetching upscale tasks...')
         const ups = await listUpscaleTasks()
-        const queued = ups.filter(u => (u.status || '').toLowerCase() === 'queued').length
-        const processing = ups.filter(u => (u.status || '').toLowerCase() === 'processing').length
-        console.log(`Upscale tasks - Queued: ${queued}, Processing: ${processing}`)
-        setUpQueued(queued)
-        setUpProcessing(processing)
+        console.log(`Upscale tasks fetched: ${ups.length}`)
+        setUpTasks(ups)
       } catch (upscaleError) {
         console.error('Error fetching upscale tasks:', upscaleError)
       }
 
-      const cq = data.filter(t => {
-        const s = (t.status || '').toLowerCase()
-        return s === 'queued_download' || s === 'queued_process'
-      }).length
-
-      const cp = data.filter(t => (t.status || '').toLowerCase() === 'processing').length
-      console.log(`Tasks - Queued: ${cq}, Processing: ${cp}`)
-
-      setCutQueued(cq)
-      setCutProcessing(cp)
-
     } catch (error) {
       console.error('Error in refresh:', error)
     } finally {
@@ -464,18 +493,55 @@ export default function Page() {
     }
   }
 
+  const [upTasks, setUpTasks] = useState<UpscaleTask[] | null>(null)
+
+  const live = useLiveEvents((ev) => {
+    if (ev.type === 'task') {
+      setTasks(prev => applyDelta(prev, ev))
+    } else if (ev.type === 'upscale') {
+      setUpTasks(prev => prev ? applyDelta(prev, ev) : prev)
+    } else if (ev.type === 'clip') {
+      setClips(prev => applyDelta(prev, ev, { defaults: { fragments: [] }, accept: clipMatchesFilters }))
+    } else if (ev.type === 'hello' || ev.type === 'reset') {
+      // (Re)subscribed or too far behind: take a fresh snapshot, deltas follow from here
+      refresh()
+    }
+  })
+
+  // Counters follow the live lists instead of being recomputed on every poll
+  useEffect(() => {
+    setCutQueued(tasks.filter(t => {
+      const s = (t.status || '').toLowerCase()
+      return s === 'queued_download' || s === 'queued_process'
+    }).length)
+    setCutProcessing(tasks.filter(t => (t.status || '').toLowerCase() === 'processing').length)
+  }, [tasks])
+
   useEffect(() => {
-    console.log('Component mounted, starting refresh interval...')
+    if (!upTasks) return
+    setUpQueued(upTasks.filter(u => (u.status || '').toLowerCase() === 'queued').length)
+    setUpProcessing(upTasks.filter(u => (u.status || '').toLowerCase() === 'processing').length)
+  }, [upTasks])
+
+  useEffect(() => {
+    console.log('Component mounted, starting refresh interval...', live ? '(live events)' : '(polling)')
     refresh()
+    // With /api/events connected only a slow reconcile is needed; otherwise fall back to polling
     const id = setInterval(() => {
       console.log('Auto-refreshing...')
       refresh()
-    }, 3000)
+    }, live ? 60000 : 3000)
     return () => {
       console.log('Component unmounting, cleaning up...')
       clearInterval(id)
     }
-  }, [tab])
+  }, [tab, live, statusFilter, channelFilter])
+
+  useEffect(() => {
+    // New filter: start again from the first page
+    setClips([])
+    setClipsNextAfter(null)
+  }, [statusFilter, channelFilter])
 
   async function onSubmit(e: React.FormEvent<HTMLFormElement>) {
     e.preventDefault()
@@ -1071,6 +1137,11 @@ export default function Page() {
                   ))}
               </tbody>
             </table>
+            {clipsNextAfter !== null && (
+              <div style={{ textAlign: 'center', marginTop: 12 }}>
+                <button onClick={loadMoreClips} style={{ padding: '6px 10px', borderRadius: 8, border: '1px solid #223046', background: '#162033', color: '#e6eaf2' }}>Показать ещё</button>
+              </div>
+            )}
           </div>
         </section>
       )}
@@ -0,0 +1,94 @@
+import { useEffect, useRef, useState } from 'react'
+
+const API_BASE = process.env.NEXT_PUBLIC_API_BASE_URL || 'http://127.0.0.1:8000'
+
+export type LiveEvent = {
+  id: number | null
+  type: 'task' | 'upscale' | 'clip' | 'hello' | 'reset'
+  op: 'upsert' | 'patch' | 'deleted' | 'snapshot' | 'expired' | 'overflow'
+  data: any
+}
+
+type Listener = (ev: LiveEvent) => void
+type StatusListener = (live: boolean) => void
+
+// One EventSource per browser tab, shared by every component that subscribes
+let source: EventSource | null = null
+let live = false
+const listeners = new Set<Listener>()
+const statusListeners = new Set<StatusListener>()
+
+function setLive(v: boolean) {
+  if (live === v) return
+  live = v
+  statusListeners.forEach(l => l(v))
+}
+
+function connect() {
+  if (source || typeof window === 'undefined' || typeof EventSource === 'undefined') return
+  // EventSource reconnects on its own and sends Last-Event-ID, so the server resumes the stream
+  source = new EventSource(`${API_BASE}/api/events`)
+  source.onopen = () => setLive(true)
+  source.onerror = () => setLive(false)
+  source.onmessage = (msg) => {
+    try {
+      const ev = JSON.parse(msg.data) as LiveEvent
+      listeners.forEach(l => l(ev))
+    } catch (e) {
+      console.error('events: bad message', e)
+    }
+  }
+}
+
+function disconnectIfUnused() {
+  if (listeners.size === 0 && statusListeners.size === 0 && source) {
+    source.close()
+    source = null
+    live = false
+  }
+}
+
+export function useLiveEvents(onEvent: Listener): boolean {
+  const [isLive, setIsLive] = useState(live)
+  const handler = useRef(onEvent)
+  handler.current = onEvent
+
+  useEffect(() => {
+    const l: Listener = (ev) => handler.current(ev)
+    listeners.add(l)
+    statusListeners.add(setIsLive)
+    connect()
+    setIsLive(live)
+    return () => {
+      listeners.delete(l)
+      statusListeners.delete(setIsLive)
+      disconnectIfUnused()
+    }
+  }, [])
+
+  return isLive
+}
+
+export type DeltaOptions<T> = {
+  // Fields a row inserted from an event starts with (deltas may omit them, e.g. clip fragments)
+  defaults?: Partial<T>
+  // Rows the current view shows (its filters); a row that stops matching is dropped
+  accept?: (row: T) => boolean
+}
+
+// Apply an upsert/patch/deleted delta to a list of rows keyed by id (newest first)
+export function applyDelta<T extends { id: number }>(rows: T[], ev: LiveEvent, opts: DeltaOptions<T> = {}): T[] {
+  const id = ev.data?.id
+  if (id == null) return rows
+  if (ev.op === 'deleted') return rows.filter(r => r.id !== id)
+  const idx = rows.findIndex(r => r.id === id)
+  if (idx < 0 && ev.op === 'patch') return rows
+  const row = (idx < 0 ? { ...opts.defaults, ...ev.data } : { ...rows[idx], ...ev.data }) as T
+  if (opts.accept && !opts.accept(row)) {
+    return idx < 0 ? rows : rows.filter(r => r.id !== id)
+  }
+  if (idx < 0) return [row, ...rows]
+  const next = rows.slice()
+  next[idx] = row
+  return next
+}
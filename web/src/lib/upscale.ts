@@ -1,4 +1,5 @@
 import { useEffect, useState } from 'react'
+import { useLiveEvents, applyDelta } from './events'
 
 export type UpscaleTask = {
   id: number
@@ -135,11 +136,17 @@ export function useUpscaleTasks() {
     setTasks(data)
   }
 
+  const live = useLiveEvents((ev) => {
+    if (ev.type === 'upscale') setTasks(prev => applyDelta(prev, ev))
+    else if (ev.type === 'hello' || ev.type === 'reset') refresh()
+  })
+
   useEffect(() => {
     refresh()
-    const id = setInterval(refresh, 4000)
+    // Deltas arrive over /api/events; poll only as a fallback, plus a slow reconcile while live
+    const id = setInterval(refresh, live ? 60000 : 4000)
     return () => clearInterval(id)
-  }, [])
+  }, [live])
 
   return { tasks, loading, refresh }
 }